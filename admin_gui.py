@@ -3,51 +3,27 @@
 #            điều chỉnh thumbnail trong bảng cho phù hợp.
 import os
 import sys
-import csv
-import sqlite3
-from datetime import datetime
+import threading
 
-from PyQt6.QtCore import Qt, QSize, QDate, QTimer, QPoint
-from PyQt6.QtGui import QPixmap, QFont, QAction, QKeySequence
+from PyQt6.QtCore import Qt, QDate, QTimer, QPoint, QThread, pyqtSignal
+from PyQt6.QtGui import QFont, QAction, QKeySequence
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
-    QPushButton, QComboBox, QTableWidget, QTableWidgetItem, QHeaderView,
-    QFileDialog, QMessageBox, QDateEdit, QInputDialog, QGroupBox, QSizePolicy,
-    QSpacerItem, QMenu
+    QPushButton, QComboBox, QTableView, QAbstractItemView, QHeaderView,
+    QFileDialog, QMessageBox, QDateEdit, QInputDialog, QGroupBox,
+    QMenu, QCheckBox, QProgressDialog
 )
 
-# Try import project's db helper; fallback if missing
-try:
-    from db import DB_PATH, init_db
-except Exception:
-    DB_PATH = os.path.join(os.getcwd(), "events.db")
-    def init_db():
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                plate_text TEXT,
-                status TEXT,
-                time_in TEXT,
-                time_out TEXT,
-                face_image_path TEXT,
-                plate_image_path TEXT
-            )
-        """)
-        conn.commit()
-        conn.close()
-
-# Column mapping (Thời gian Vào / Ra)
-COLUMNS = [
-    ("id", "ID"),
-    ("plate_text", "Biển"),
-    ("status", "Trạng thái"),
-    ("time_in", "Thời gian Vào"),
-    ("time_out", "Thời gian Ra"),
-    ("face_image_path", "Ảnh mặt"),
-    ("plate_image_path", "Ảnh biển"),
-]
+import db
+from db import init_db
+from event_table import COLUMNS, IMAGE_COLUMNS, EventTableModel, ThumbnailDelegate
+from thumbnails import thumbnail_cache
+from export import export_events, ExportCancelled, HAS_PYARROW
+from image_store import remove_image_files
+
+# Hết thời gian hoàn tác thì xoá hẳn event đã xoá và file ảnh không còn event nào dùng
+UNDO_WINDOW_MS = 5000
+PURGE_IMAGES_ON_DELETE = True
 
 # Thumbnail size used inside table cells
 THUMB_W = 160
@@ -63,15 +39,52 @@ QGroupBox {{ border: 1px solid #2b2d31; border-radius: 8px; padding: 8px; backgr
 QPushButton {{ background-color: #2d8cff; color: white; border-radius: 6px; padding: 6px 10px; }}
 QPushButton[secondary="true"] {{ background-color: transparent; border: 1px solid #3b3e44; color: #cfe8ff; }}
 QLineEdit, QDateEdit, QComboBox {{ background-color: #121314; border: 1px solid #2b2d31; border-radius: 6px; padding: 6px; color:#e6eef3; }}
-QTableWidget {{ background-color: #151617; gridline-color: #2b2d31; border: 1px solid #2b2d31; }}
+QCheckBox {{ color:#cfe8ff; spacing: 6px; }}
+QTableView {{ background-color: #151617; gridline-color: #2b2d31; border: 1px solid #2b2d31; }}
 QHeaderView::section {{ background-color: #202225; color: #dbeefd; padding: 8px; border: 1px solid #2b2d31; }}
-QTableWidget::item:selected {{ background-color: #2d8cff; color: white; }}
+QTableView::item:selected {{ background-color: #2d8cff; color: white; }}
 /* Make in-table image labels look nicer */
 QLabel {{
     color: #e6eef3;
 }}
 """
 
+def _purge_job(ids, remove_images):
+    """Xoá hẳn các event đã xoá mềm + ảnh mồ côi (chạy trên thread nền)."""
+    try:
+        n, paths = db.purge_deleted(ids)
+        removed = remove_image_files(paths) if remove_images and paths else 0
+        print(f"Purged {n} events, {removed} images")
+    except Exception as e:
+        print("Purge failed:", e)
+    finally:
+        db.POOL.release()
+
+
+class ExportThread(QThread):
+    """Chạy export.export_events trên thread nền; done(ok, số dòng, path, lỗi) — ok=False, lỗi rỗng: đã huỷ."""
+    progress = pyqtSignal(int, int)
+    done = pyqtSignal(bool, int, str, str)
+
+    def __init__(self, path, filters, header, parent=None):
+        super().__init__(parent)
+        self.path = path; self.filters = filters; self.header = header
+        self._cancel = False
+
+    def cancel(self):
+        self._cancel = True
+
+    def run(self):
+        try:
+            n = export_events(self.path, self.filters, self.header,
+                              progress=self.progress.emit, is_cancelled=lambda: self._cancel)
+            self.done.emit(True, n, self.path, "")
+        except ExportCancelled:
+            self.done.emit(False, 0, self.path, "")
+        except Exception as e:
+            self.done.emit(False, 0, self.path, str(e))
+
+
 class AdminWindow(QWidget):
     def __init__(self):
         super().__init__()
@@ -87,6 +100,8 @@ class AdminWindow(QWidget):
         self.search_timer.timeout.connect(self.on_search)
 
         self._login_window_ref = None
+        self._export_thread = None
+        self._export_progress = None
 
         self._init_ui()
         self._add_shortcuts()
@@ -120,6 +135,7 @@ class AdminWindow(QWidget):
         lbl_find = QLabel("Tìm:"); lbl_find.setFixedWidth(40)
         filters.addWidget(lbl_find)
         self.search_edit = QLineEdit(); self.search_edit.setPlaceholderText("Nhập biển số xe"); self.search_edit.textChanged.connect(self._on_search_text_changed); filters.addWidget(self.search_edit)
+        self.fuzzy_check = QCheckBox("Gần đúng"); self.fuzzy_check.setToolTip("Coi các ký tự OCR hay nhầm là một (0/D/O, 8/B, 5/S, ...)"); self.fuzzy_check.toggled.connect(self._on_filter_changed); filters.addWidget(self.fuzzy_check)
         lbl_status = QLabel("Trạng thái:"); lbl_status.setFixedWidth(84)
         filters.addWidget(lbl_status)
         self.status_combo = QComboBox(); self.status_combo.addItems(["Tất cả","Vào","Ra"]); self.status_combo.currentTextChanged.connect(self._on_filter_changed); filters.addWidget(self.status_combo)
@@ -130,20 +146,36 @@ class AdminWindow(QWidget):
         filters.addStretch()
         tg_layout.addLayout(filters)
 
-        # table
-        self.table = QTableWidget(0, len(COLUMNS))
-        self.table.setHorizontalHeaderLabels([c[1] for c in COLUMNS])
+        # table: model nạp theo trang, thumbnail do delegate vẽ cho các hàng đang hiển thị
+        self.model = EventTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         hdr = self.table.horizontalHeader()
         hdr.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
         hdr.setStretchLastSection(True)
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-        self.table.cellDoubleClicked.connect(self.on_cell_double)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.thumbs = thumbnail_cache()
+        self.thumb_delegate = ThumbnailDelegate(THUMB_W, THUMB_H, self.table, self.thumbs)
+        for c, (col_key, _) in enumerate(COLUMNS):
+            if col_key in IMAGE_COLUMNS:
+                self.table.setItemDelegateForColumn(c, self.thumb_delegate)
+        self.table.doubleClicked.connect(self.on_cell_double)
         self.table.selectionModel().selectionChanged.connect(self.on_table_selection_changed)
         self.table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self._on_table_context_menu)
         # make vertical header row height default bigger to fit thumbnails
         self.table.verticalHeader().setDefaultSectionSize(THUMB_H + 12)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        # Resize columns (make textual columns longer)
+        self.table.setColumnWidth(0,60)
+        self.table.setColumnWidth(1,320)   # Biển (wider)
+        self.table.setColumnWidth(2,100)
+        self.table.setColumnWidth(3,260)   # Thời gian Vào (wider)
+        self.table.setColumnWidth(4,260)   # Thời gian Ra (wider)
+        self.table.setColumnWidth(5,THUMB_W + 20)  # face thumb column
+        self.table.setColumnWidth(6,THUMB_W + 20)  # plate thumb column
         tg_layout.addWidget(self.table)
 
         # main layout with preview to the right
@@ -192,193 +224,152 @@ class AdminWindow(QWidget):
         act_del = QAction("Xóa", self); act_del.setShortcut(QKeySequence(Qt.Key.Key_Delete)); act_del.triggered.connect(self.delete_selected); self.addAction(act_del)
 
     # DB helpers and UI behaviors (status values 'Vào'/'Ra' used consistently)
-    def _build_query(self, search_text="", status_filter="Tất cả", date_from=None, date_to=None):
-        sql = "SELECT id, plate_text, status, time_in, time_out, face_image_path, plate_image_path FROM events"
-        clauses = []; params = []
-        if search_text:
-            clauses.append("LOWER(plate_text) LIKE ?"); params.append(f"%{search_text.lower()}%")
-        if status_filter in ("Vào","Ra"):
-            clauses.append("status = ?"); params.append(status_filter)
-        if date_from:
-            d0 = date_from.toString("yyyy-MM-dd")
-            clauses.append("(time_in >= ? OR time_out >= ? OR (time_in IS NULL AND time_out >= ?))")
-            params += [d0+" 00:00:00", d0+" 00:00:00", d0+" 00:00:00"]
-        if date_to:
-            d1 = date_to.toString("yyyy-MM-dd")
-            clauses.append("(time_in <= ? OR time_out <= ? OR (time_in IS NULL AND time_out <= ?))")
-            params += [d1+" 23:59:59", d1+" 23:59:59", d1+" 23:59:59"]
-        if clauses: sql += " WHERE " + " AND ".join(clauses)
-        sql += " ORDER BY id DESC"
-        return sql, params
-
     def load_events(self):
         try:
-            conn = sqlite3.connect(DB_PATH); cur = conn.cursor()
-            cur.execute("SELECT id, plate_text, status, time_in, time_out, face_image_path, plate_image_path FROM events ORDER BY id DESC")
-            rows = cur.fetchall()
-            conn.close()
+            self.model.set_filter()
         except Exception as e:
-            QMessageBox.critical(self, "Lỗi DB", f"Không đọc được DB: {e}"); rows = []
-        if not rows:
-            self.table.setRowCount(0); self._show_status("Chưa có dữ liệu nào trong hệ thống.", timeout=4000); return
-        self._populate_table(rows)
-        self._show_status(f"Đã tải {len(rows)} sự kiện")
-
-    def _populate_table(self, rows):
-        self.table.setRowCount(0)
-        for r, row in enumerate(rows):
-            self.table.insertRow(r)
-            for c, val in enumerate(row):
-                col_name = COLUMNS[c][0]
-                if col_name in ("face_image_path","plate_image_path"):
-                    label = QLabel()
-                    label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                    label.setStyleSheet("background: #0f1112; border-radius:6px;")
-                    # fix size so table cell renders at consistent thumbnail size
-                    label.setFixedSize(THUMB_W, THUMB_H)
-                    if val and os.path.exists(val):
-                        try:
-                            pix = QPixmap(val).scaled(THUMB_W, THUMB_H, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-                            label.setPixmap(pix)
-                        except Exception:
-                            label.setText("lỗi")
-                    else:
-                        label.setText("-")
-                    self.table.setCellWidget(r, c, label)
-                else:
-                    item = QTableWidgetItem(str(val) if val is not None else "")
-                    if col_name in ("id","status"):
-                        item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                    self.table.setItem(r, c, item)
-            # ensure row height fits the thumbnail
-            self.table.setRowHeight(r, THUMB_H + 12)
+            QMessageBox.critical(self, "Lỗi DB", f"Không đọc được DB: {e}"); return
+        if self.model.rowCount() == 0:
+            self._show_status("Chưa có dữ liệu nào trong hệ thống.", timeout=4000); return
+        self._show_status(f"Đã tải {self._loaded_text()} sự kiện")
 
-        # Resize columns (make textual columns longer)
-        self.table.setColumnWidth(0,60)
-        self.table.setColumnWidth(1,320)   # Biển (wider)
-        self.table.setColumnWidth(2,100)
-        self.table.setColumnWidth(3,260)   # Thời gian Vào (wider)
-        self.table.setColumnWidth(4,260)   # Thời gian Ra (wider)
-        self.table.setColumnWidth(5,THUMB_W + 20)  # face thumb column
-        self.table.setColumnWidth(6,THUMB_W + 20)  # plate thumb column
+    def _loaded_text(self):
+        n = self.model.rowCount()
+        return f"{n}+" if self.model.has_more() else str(n)
+
+    def _reload(self):
+        """Chạy lại bộ lọc đang hiển thị (sau khi xoá / sửa / hoàn tác)."""
+        try:
+            self.model.refresh()
+        except Exception as e:
+            QMessageBox.critical(self, "Lỗi DB", f"Không đọc được DB: {e}")
+
+    def _selected_ids(self):
+        ids = []
+        for idx in self.table.selectionModel().selectedRows():
+            ev_id = self.model.id_at(idx.row())
+            if ev_id is not None: ids.append(ev_id)
+        return ids
+
+    def _event_at_row(self, row):
+        """Dòng đang hiển thị; đọc lại từ DB để có dữ liệu mới nhất."""
+        ev_id = self.model.id_at(row)
+        return self.get_event_by_id(ev_id) if ev_id is not None else None
 
     # Search / filter
     def _on_search_text_changed(self, text): self.search_timer.start()
     def _on_filter_changed(self, _=None): self.search_timer.start()
 
     def on_search(self):
-        sql, params = self._build_query(self.search_edit.text().strip(), self.status_combo.currentText(), self.date_from.date(), self.date_to.date())
         try:
-            conn = sqlite3.connect(DB_PATH); cur = conn.cursor(); cur.execute(sql, params); rows = cur.fetchall(); conn.close()
+            self.model.set_filter(self.search_edit.text().strip(), self.status_combo.currentText(),
+                                  self.date_from.date().toString("yyyy-MM-dd"), self.date_to.date().toString("yyyy-MM-dd"),
+                                  fuzzy=self.fuzzy_check.isChecked())
         except Exception as e:
-            QMessageBox.critical(self, "Lỗi DB", f"Không thể truy vấn DB: {e}"); rows = []
-        if not rows:
-            self.table.setRowCount(0); self._show_status("Không tìm thấy dữ liệu.", timeout=3000); return
-        self._populate_table(rows); self._show_status(f"Đã lọc: {len(rows)} hàng")
+            QMessageBox.critical(self, "Lỗi DB", f"Không thể truy vấn DB: {e}"); return
+        if self.model.rowCount() == 0:
+            self._show_status("Không tìm thấy dữ liệu.", timeout=3000); return
+        self._show_status(f"Đã lọc: {self._loaded_text()} hàng")
 
     def on_clear(self):
-        self.search_edit.clear(); self.status_combo.setCurrentIndex(0)
+        self.search_edit.clear(); self.status_combo.setCurrentIndex(0); self.fuzzy_check.setChecked(False)
         self.date_from.setDate(QDate.currentDate().addMonths(-1)); self.date_to.setDate(QDate.currentDate())
         self.load_events()
 
     # Export / edit / delete / preview
     def export_csv(self):
-        path, _ = QFileDialog.getSaveFileName(self, "Lưu CSV", os.getcwd(), "CSV files (*.csv)")
+        if self._export_thread is not None:
+            self._show_status("Đang xuất dữ liệu, vui lòng chờ.", timeout=2000); return
+        file_filter = "CSV (*.csv);;CSV nén (*.csv.gz)" + (";;Parquet (*.parquet)" if HAS_PYARROW else "")
+        path, chosen = QFileDialog.getSaveFileName(self, "Lưu CSV", os.getcwd(), file_filter)
         if not path: return
-        rows = []
-        for r in range(self.table.rowCount()):
-            row_data = []
-            for c, (col_key, _) in enumerate(COLUMNS):
-                if col_key in ("face_image_path","plate_image_path"):
-                    try:
-                        id_item = self.table.item(r, 0)
-                        if id_item:
-                            ev = self.get_event_by_id(int(id_item.text())); txt = ev.get(col_key) or ""
-                        else: txt = ""
-                    except Exception: txt = ""
-                    row_data.append(txt)
-                else:
-                    it = self.table.item(r, c); row_data.append(it.text() if it else "")
-            rows.append(row_data)
-        try:
-            with open(path, "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f); writer.writerow([h for _, h in COLUMNS]); writer.writerows(rows)
-            self._show_status(f"Đã xuất {len(rows)} dòng sang {path}")
-        except Exception as e:
-            QMessageBox.critical(self, "Lỗi xuất", f"Không thể xuất CSV: {e}")
+        if "*.csv.gz" in chosen and not path.lower().endswith(".csv.gz"): path += ".gz" if path.lower().endswith(".csv") else ".csv.gz"
+        elif "*.parquet" in chosen and not path.lower().endswith(".parquet"): path += ".parquet"
+        # xuất toàn bộ kết quả của bộ lọc đang hiển thị (kể cả các trang chưa cuộn tới), trên thread nền
+        self._export_thread = ExportThread(path, self.model.filter(), [h for _, h in COLUMNS], self)
+        self._export_thread.progress.connect(self._on_export_progress)
+        self._export_thread.done.connect(self._on_export_done)
+        self._export_progress = QProgressDialog("Đang xuất dữ liệu...", "Huỷ", 0, 0, self)
+        self._export_progress.setWindowTitle("Xuất dữ liệu")
+        self._export_progress.setMinimumDuration(300)
+        self._export_progress.canceled.connect(self._export_thread.cancel)
+        self.export_btn.setEnabled(False)
+        self._export_thread.start()
+
+    def _on_export_progress(self, done, total):
+        if self._export_progress is None: return
+        self._export_progress.setMaximum(max(total, 1)); self._export_progress.setValue(min(done, max(total, 1)))
+        self._export_progress.setLabelText(f"Đang xuất {done}/{total} dòng...")
+
+    def _on_export_done(self, ok, n, path, err):
+        if self._export_progress is not None:
+            self._export_progress.reset(); self._export_progress.deleteLater(); self._export_progress = None
+        if self._export_thread is not None:
+            self._export_thread.wait(); self._export_thread.deleteLater(); self._export_thread = None
+        self.export_btn.setEnabled(True)
+        if ok: self._show_status(f"Đã xuất {n} dòng sang {path}")
+        elif err: QMessageBox.critical(self, "Lỗi xuất", f"Không thể xuất CSV: {err}")
+        else: self._show_status("Đã huỷ xuất dữ liệu.", timeout=3000)
 
     def get_event_by_id(self, ev_id):
-        conn = sqlite3.connect(DB_PATH); cur = conn.cursor()
-        cur.execute("SELECT id, plate_text, status, time_in, time_out, face_image_path, plate_image_path FROM events WHERE id = ?", (ev_id,))
-        row = cur.fetchone(); conn.close()
-        if not row: return None
-        return dict(zip([c[0] for c in COLUMNS], row))
+        return db.get_event_by_id(ev_id)
 
     def delete_selected(self):
         sel = self.table.selectionModel().selectedRows()
         if not sel: self._show_status("Chọn hàng để xóa.", timeout=2000); return
-        ids = []
-        for idx in sel:
-            it = self.table.item(idx.row(), 0)
-            if it:
-                try: ids.append(int(it.text()))
-                except Exception: pass
+        ids = self._selected_ids()
         if not ids: self._show_status("Không có ID hợp lệ.", timeout=2000); return
         ok = QMessageBox.question(self, "Xác nhận", f"Xóa {len(ids)} hàng?", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if ok != QMessageBox.StandardButton.Yes: return
+        # lần xoá trước không còn hoàn tác được nữa
+        self._purge_in_background(self._last_deleted)
         self._last_deleted = []
         try:
-            conn = sqlite3.connect(DB_PATH); cur = conn.cursor()
-            for i in ids:
-                cur.execute("SELECT plate_text, status, time_in, time_out, face_image_path, plate_image_path FROM events WHERE id = ?", (i,))
-                row = cur.fetchone()
-                if row:
-                    self._last_deleted.append({"plate_text":row[0],"status":row[1],"time_in":row[2],"time_out":row[3],"face_image_path":row[4],"plate_image_path":row[5]})
-            cur.executemany("DELETE FROM events WHERE id = ?", [(i,) for i in ids])
-            conn.commit(); conn.close()
+            self._last_deleted = db.delete_events(ids)
         except Exception as e:
             QMessageBox.critical(self, "Lỗi DB", f"Không thể xóa: {e}"); return
-        self.load_events()
+        self._reload()
         self.undo_btn.setEnabled(True)
         if self._undo_timer: self._undo_timer.stop()
-        self._undo_timer = QTimer(self); self._undo_timer.setSingleShot(True); self._undo_timer.timeout.connect(self._clear_undo_buffer); self._undo_timer.start(5000)
+        self._undo_timer = QTimer(self); self._undo_timer.setSingleShot(True); self._undo_timer.timeout.connect(self._clear_undo_buffer); self._undo_timer.start(UNDO_WINDOW_MS)
         self._show_status("Đã xóa. Có 5s để hoàn tác (Ctrl+Z).", timeout=4000)
 
     def _undo_delete(self):
         if not self._last_deleted: self._show_status("Không có thao tác để hoàn tác.", timeout=2000); return
         try:
-            conn = sqlite3.connect(DB_PATH); cur = conn.cursor()
-            for ev in self._last_deleted:
-                cur.execute("INSERT INTO events (plate_text, status, time_in, time_out, face_image_path, plate_image_path) VALUES (?, ?, ?, ?, ?, ?)",
-                            (ev["plate_text"], ev["status"], ev["time_in"], ev["time_out"], ev["face_image_path"], ev["plate_image_path"]))
-            conn.commit(); conn.close()
+            db.restore_events(self._last_deleted)
             self._last_deleted = []; self.undo_btn.setEnabled(False)
             if self._undo_timer: self._undo_timer.stop()
-            self.load_events()
+            self._reload()
             self._show_status("Đã hoàn tác.", timeout=2500)
         except Exception as e:
             QMessageBox.critical(self, "Lỗi DB", f"Không thể hoàn tác: {e}")
 
     def _clear_undo_buffer(self):
+        self._purge_in_background(self._last_deleted)
         self._last_deleted = []; self.undo_btn.setEnabled(False)
 
+    def _purge_in_background(self, ids):
+        if not ids: return
+        threading.Thread(target=_purge_job, args=(list(ids), PURGE_IMAGES_ON_DELETE), name="purge-deleted", daemon=True).start()
+
     def edit_selected_plate(self):
         sel = self.table.selectionModel().selectedRows();
         if not sel: self._show_status("Chọn một hàng để sửa.", timeout=2000); return
         if len(sel)>1: self._show_status("Chỉ chọn một hàng để sửa.", timeout=2000); return
-        row_idx = sel[0].row(); id_item = self.table.item(row_idx,0); plate_item = self.table.item(row_idx,1)
-        if not id_item or not plate_item: self._show_status("Không có dữ liệu để sửa.", timeout=2000); return
-        ev_id = int(id_item.text()); curr_plate = plate_item.text()
+        ev = self.model.event_at(sel[0].row())
+        if not ev: self._show_status("Không có dữ liệu để sửa.", timeout=2000); return
+        ev_id = ev["id"]; curr_plate = ev["plate_text"] or ""
         new_plate, ok = QInputDialog.getText(self, "Sửa biển", "Biển mới:", text=curr_plate)
         if not ok: return
         new_plate = new_plate.strip()
         if not new_plate: self._show_status("Biển trống, huỷ.", timeout=2000); return
         try:
-            conn = sqlite3.connect(DB_PATH); cur = conn.cursor(); cur.execute("UPDATE events SET plate_text = ? WHERE id = ?", (new_plate, ev_id)); conn.commit(); conn.close()
+            db.update_plate(ev_id, new_plate)
             self._show_status("Đã cập nhật.", timeout=2000)
         except Exception as e:
             QMessageBox.critical(self, "Lỗi DB", f"Không thể cập nhật: {e}")
-        self.load_events()
+        self._reload()
 
     def open_selected_image(self):
         col_choice, ok = QInputDialog.getItem(self, "Chọn ảnh", "Mở ảnh nào?", ["Ảnh mặt","Ảnh biển"], 0, False)
@@ -388,9 +379,7 @@ class AdminWindow(QWidget):
         if not sel: self._show_status("Chọn hàng để mở ảnh.", timeout=2000); return
         opened = 0
         for idx in sel:
-            id_item = self.table.item(idx.row(), 0)
-            if not id_item: continue
-            ev = self.get_event_by_id(int(id_item.text()))
+            ev = self._event_at_row(idx.row())
             if not ev: continue
             path = ev.get(col_key)
             if path and os.path.exists(path):
@@ -402,12 +391,10 @@ class AdminWindow(QWidget):
                 except Exception: pass
         self._show_status(f"Đã cố mở {opened} ảnh.", timeout=2500)
 
-    def on_cell_double(self, row, col):
-        col_key = COLUMNS[col][0]
-        if col_key not in ("face_image_path","plate_image_path"): return
-        id_item = self.table.item(row,0)
-        if not id_item: return
-        ev = self.get_event_by_id(int(id_item.text()));
+    def on_cell_double(self, index):
+        col_key = COLUMNS[index.column()][0]
+        if col_key not in IMAGE_COLUMNS: return
+        ev = self._event_at_row(index.row())
         if not ev: return
         path = ev.get(col_key)
         if path and os.path.exists(path):
@@ -424,39 +411,22 @@ class AdminWindow(QWidget):
     def on_table_selection_changed(self, selected, deselected):
         sel_rows = self.table.selectionModel().selectedRows()
         if not sel_rows: self._clear_preview(); return
-        row = sel_rows[0].row(); id_item = self.table.item(row,0)
-        if not id_item: self._clear_preview(); return
-        try: ev_id = int(id_item.text())
-        except Exception: self._clear_preview(); return
+        ev_id = self.model.id_at(sel_rows[0].row())
+        if ev_id is None: self._clear_preview(); return
         self._display_preview_for_id(ev_id)
 
     def _display_preview_for_id(self, ev_id):
         ev = self.get_event_by_id(ev_id)
         if not ev: self._clear_preview(); return
         plate_path = ev.get("plate_image_path") or ""; face_path = ev.get("face_image_path") or ""
-        if plate_path and os.path.exists(plate_path):
-            try:
-                pix = QPixmap(plate_path).scaled(self.preview_plate.width(), self.preview_plate.height(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-                self.preview_plate.setPixmap(pix); self.preview_plate.setText("")
-            except Exception:
-                self.preview_plate.setPixmap(QPixmap()); self.preview_plate.setText("Lỗi ảnh biển")
-        else:
-            self.preview_plate.setPixmap(QPixmap()); self.preview_plate.setText("Không có ảnh biển")
-        if face_path and os.path.exists(face_path):
-            try:
-                pix = QPixmap(face_path).scaled(self.preview_face.width(), self.preview_face.height(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-                self.preview_face.setPixmap(pix); self.preview_face.setText("")
-            except Exception:
-                self.preview_face.setPixmap(QPixmap()); self.preview_face.setText("Lỗi ảnh mặt")
-        else:
-            self.preview_face.setPixmap(QPixmap()); self.preview_face.setText("Không có ảnh mặt")
+        # giải mã nền qua cache thumbnail, label tự cập nhật khi xong
+        self.thumbs.bind_label(self.preview_plate, plate_path, empty_text="Không có ảnh biển", error_text="Lỗi ảnh biển")
+        self.thumbs.bind_label(self.preview_face, face_path, empty_text="Không có ảnh mặt", error_text="Lỗi ảnh mặt")
 
     def _open_preview_image(self, kind):
         sel_rows = self.table.selectionModel().selectedRows()
         if not sel_rows: self._show_status("Chọn hàng trước khi mở ảnh.", timeout=2000); return
-        row = sel_rows[0].row(); id_item = self.table.item(row,0)
-        if not id_item: return
-        ev = self.get_event_by_id(int(id_item.text()))
+        ev = self._event_at_row(sel_rows[0].row())
         if not ev: return
         key = "plate_image_path" if kind=="plate" else "face_image_path"; path = ev.get(key)
         if path and os.path.exists(path):
@@ -470,8 +440,8 @@ class AdminWindow(QWidget):
             QMessageBox.information(self, "Mở ảnh", "Không có file.")
 
     def _clear_preview(self):
-        self.preview_plate.setPixmap(QPixmap()); self.preview_plate.setText("Chưa chọn ảnh biển")
-        self.preview_face.setPixmap(QPixmap()); self.preview_face.setText("Chưa chọn ảnh mặt")
+        self.thumbs.bind_label(self.preview_plate, None, empty_text="Chưa chọn ảnh biển")
+        self.thumbs.bind_label(self.preview_face, None, empty_text="Chưa chọn ảnh mặt")
 
     # context menu
     def _on_table_context_menu(self, pos: QPoint):
@@ -485,9 +455,7 @@ class AdminWindow(QWidget):
 
     def _context_open(self, row, kind):
         if row<0: self._show_status("Không có hàng được chọn.", timeout=2000); return
-        id_item = self.table.item(row,0)
-        if not id_item: return
-        ev = self.get_event_by_id(int(id_item.text()))
+        ev = self._event_at_row(row)
         if not ev: return
         key = "plate_image_path" if kind=="plate" else "face_image_path"; path = ev.get(key)
         if path and os.path.exists(path):
@@ -526,6 +494,10 @@ class AdminWindow(QWidget):
         reply = QMessageBox.question(self, "Thoát", "Bạn có chắc muốn đóng cửa sổ quản trị?", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if reply != QMessageBox.StandardButton.Yes:
             event.ignore(); return
+        if self._export_thread is not None:
+            self._export_thread.cancel(); self._export_thread.wait(5000)
+        if self._undo_timer: self._undo_timer.stop()
+        self._clear_undo_buffer()
         if hasattr(self, "_login_window_ref") and self._login_window_ref:
             try: self._login_window_ref.show()
             except Exception: pass
@@ -0,0 +1,403 @@
+# benchmarks/pipeline_bench.py
+# Benchmark từng chặng của pipeline trên một bộ khung hình cố định, kết quả JSON so sánh được giữa các commit.
+#
+#   python benchmarks/pipeline_bench.py                                  # fixture mặc định / tổng hợp
+#   python benchmarks/pipeline_bench.py --frames replay:videos/gate1.mp4 --crops result/plate
+#   python benchmarks/pipeline_bench.py --json bench/$(git rev-parse --short HEAD).json
+#   python benchmarks/pipeline_bench.py --compare bench/base.json --stages det nms deskew
+#   python benchmarks/pipeline_bench.py --record benchmarks/fixtures     # lưu fixture đang dùng
+#
+# Chặng (chặng thiếu model/thư viện được bỏ qua, ghi rõ lý do):
+#   det.preprocess / det.infer / det.decode / nms   detector ONNX (lp_onix); det.infer dùng torch nếu không có ONNX
+#   deskew.ccX_ctY                                   4 biến thể deskew trên crop biển
+#   ocr / plate.recognize                            OCR từng crop, pipeline biển đầy đủ (torch)
+#   face.detect_embed / face.match                   InsightFace; so khớp cosine với face DB giả lập
+#   db.insert                                        db.record_event (đường ghi lúc chụp) vào DB tạm
+#   image.save / image.write                         ImageStore: thời gian GUI bị chặn / ghi xong ra đĩa
+# Mỗi chặng báo p50/p95/p99 (ms), thông lượng (lần/giây) và RSS đỉnh của process sau chặng đó.
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import datetime
+import subprocess
+import importlib.util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cv2
+import numpy as np
+
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+DET_ONNX_PATH = os.path.join(ROOT, "model", "LP_detector_nano_61.onnx")
+SEED = 1234
+SYNTH_FRAMES = 24
+SYNTH_SIZE = (720, 1280)  # h, w giống camera cổng
+FACE_DB_SIZE = 500
+
+
+# ------------------- fixtures -------------------
+def synth_frames(n=SYNTH_FRAMES, seed=SEED):
+    """Khung giả lập cố định theo seed: nền nhiễu + biển trắng chữ đen, nghiêng nhẹ."""
+    rng = np.random.default_rng(seed)
+    h, w = SYNTH_SIZE
+    frames = []
+    for i in range(n):
+        frame = rng.integers(40, 120, size=(h, w, 3), dtype=np.uint8)
+        plate = np.full((110, 330, 3), 235, dtype=np.uint8)
+        cv2.rectangle(plate, (3, 3), (326, 106), (20, 20, 20), 3)
+        cv2.putText(plate, f"51A-{rng.integers(100, 999)}", (14, 48), cv2.FONT_HERSHEY_SIMPLEX, 1.4, (10, 10, 10), 3)
+        cv2.putText(plate, f"{rng.integers(10, 99)}.{rng.integers(10, 99)}", (70, 98), cv2.FONT_HERSHEY_SIMPLEX, 1.4, (10, 10, 10), 3)
+        angle = float(rng.uniform(-12, 12))
+        m = cv2.getRotationMatrix2D((165, 55), angle, 1.0)
+        plate = cv2.warpAffine(plate, m, (330, 110), borderValue=(90, 90, 90))
+        y, x = int(rng.integers(h // 3, h - 150)), int(rng.integers(50, w - 400))
+        frame[y:y + 110, x:x + 330] = plate
+        frames.append(frame)
+    return frames
+
+
+def load_frames(source, limit):
+    """Khung từ video / thư mục ảnh / glob (cú pháp replay_source, có hoặc không có tiền tố replay:)."""
+    from replay_source import ReplaySource
+    path = source[len("replay:"):] if source.startswith("replay:") else source
+    src = ReplaySource(path, speed=0, loop=False)
+    frames = []
+    try:
+        while len(frames) < limit:
+            ok, frame = src.read()
+            if not ok:
+                break
+            frames.append(frame)
+    finally:
+        src.release()
+    return frames
+
+
+def load_crops(folder, limit):
+    names = sorted(n for n in os.listdir(folder) if n.lower().endswith((".jpg", ".jpeg", ".png")))
+    crops = [cv2.imread(os.path.join(folder, n)) for n in names[:limit]]
+    return [c for c in crops if c is not None]
+
+
+def crops_from_frames(frames):
+    """Crop quanh vùng sáng nhất (biển giả lập) khi không có bộ crop thật."""
+    crops = []
+    for f in frames:
+        gray = cv2.cvtColor(f, cv2.COLOR_BGR2GRAY)
+        _, mask = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY)
+        pts = cv2.findNonZero(mask)
+        if pts is None:
+            continue
+        x, y, w, h = cv2.boundingRect(pts)
+        crops.append(f[max(0, y - 8):y + h + 8, max(0, x - 8):x + w + 8].copy())
+    return crops
+
+
+def record_fixtures(folder, frames, crops):
+    for sub, items in (("frames", frames), ("plates", crops)):
+        d = os.path.join(folder, sub)
+        os.makedirs(d, exist_ok=True)
+        for i, img in enumerate(items):
+            cv2.imwrite(os.path.join(d, f"{i:04d}.png"), img)  # png: không đổi pixel giữa các lần đọc
+
+
+# ------------------- đo -------------------
+def peak_rss_mb():
+    try:
+        import resource
+        kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(kb / 1024.0 / (1024.0 if sys.platform == "darwin" else 1.0), 1)
+    except ImportError:
+        pass
+    if importlib.util.find_spec("psutil") is not None:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024.0 * 1024.0), 1)
+    return None
+
+
+def _pct(sorted_vals, q):
+    return sorted_vals[min(len(sorted_vals) - 1, int(round(q * (len(sorted_vals) - 1))))]
+
+
+def summarize(samples, backend=None):
+    vals = sorted(samples)
+    total = sum(vals)
+    return {"n": len(vals),
+            "p50_ms": round(_pct(vals, 0.50) * 1000, 3),
+            "p95_ms": round(_pct(vals, 0.95) * 1000, 3),
+            "p99_ms": round(_pct(vals, 0.99) * 1000, 3),
+            "mean_ms": round(total / len(vals) * 1000, 3),
+            "throughput_per_s": round(len(vals) / total, 1) if total > 0 else None,
+            "peak_rss_mb": peak_rss_mb(),
+            "backend": backend}
+
+
+class Bench:
+    def __init__(self, repeat=3, warmup=2, only=None):
+        self.repeat = max(1, int(repeat))
+        self.warmup = max(0, int(warmup))
+        self.only = only
+        self.stages = {}
+        self.skipped = {}
+
+    def wanted(self, name):
+        return not self.only or any(name.startswith(p) for p in self.only)
+
+    def run(self, name, fn, items, backend=None, repeat=None):
+        """Gọi fn(item) cho mỗi item, lặp repeat lần; warm-up không tính."""
+        if not self.wanted(name) or not items:
+            return
+        for item in items[:self.warmup]:
+            fn(item)
+        samples = []
+        for _ in range(repeat or self.repeat):
+            for item in items:
+                t0 = time.perf_counter()
+                fn(item)
+                samples.append(time.perf_counter() - t0)
+        self.stages[name] = summarize(samples, backend)
+        s = self.stages[name]
+        print(f"{name:22s} n={s['n']:5d}  p50 {s['p50_ms']:9.3f}  p95 {s['p95_ms']:9.3f}  "
+              f"p99 {s['p99_ms']:9.3f} ms  {s['throughput_per_s'] or 0:9.1f}/s  rss {s['peak_rss_mb']} MB"
+              + (f"  [{backend}]" if backend else ""), flush=True)
+
+    def skip(self, name, reason):
+        if self.wanted(name):
+            self.skipped[name] = reason
+            print(f"{name:22s} bỏ qua: {reason}", flush=True)
+
+
+# ------------------- các chặng -------------------
+def bench_detector(bench, frames, torch_models):
+    import lp_onix
+    bench.run("det.preprocess", lp_onix.onnx_preprocess, frames)
+
+    outputs = None
+    if importlib.util.find_spec("onnxruntime") is not None and os.path.exists(DET_ONNX_PATH):
+        import onnxruntime as ort
+        sess = ort.InferenceSession(DET_ONNX_PATH, providers=["CPUExecutionProvider"])
+        name = sess.get_inputs()[0].name
+        blobs = [lp_onix.onnx_preprocess(f) for f in frames]
+        bench.run("det.infer", lambda b: sess.run(None, {name: b}), blobs, backend="onnxruntime")
+        outputs = [sess.run(None, {name: b})[0][0] for b in blobs]
+    elif torch_models is not None:
+        det = torch_models[0]
+        bench.run("det.infer", lambda f: det(f, size=640), frames, backend="torch (gồm pre/post)")
+    else:
+        bench.skip("det.infer", "không có onnxruntime + model .onnx, cũng không có torch")
+
+    backend = "onnx output" if outputs else "output giả lập"
+    if not outputs:
+        # output giả lập cùng kích thước detector YOLOv5 640: hầu hết conf thấp, vài cụm box chồng nhau
+        rng = np.random.default_rng(SEED)
+        outputs = []
+        for _ in range(len(frames)):
+            out = np.zeros((25200, 6), dtype=np.float32)
+            out[:, 4] = rng.uniform(0, 0.3, 25200)
+            for _ in range(rng.integers(1, 4)):
+                cx, cy = rng.uniform(100, 540, 2)
+                idx = rng.integers(0, 25200, 12)
+                out[idx, 0] = cx - 60 + rng.normal(0, 3, 12)
+                out[idx, 1] = cy - 20 + rng.normal(0, 3, 12)
+                out[idx, 2] = cx + 60 + rng.normal(0, 3, 12)
+                out[idx, 3] = cy + 20 + rng.normal(0, 3, 12)
+                out[idx, 4] = rng.uniform(0.5, 0.95, 12)
+            outputs.append(out)
+    h0, w0 = frames[0].shape[:2]
+    bench.run("det.decode", lambda o: lp_onix.onnx_decode(o, w0, h0, conf_thres=0.3), outputs, backend=backend)
+    decoded = [lp_onix.onnx_decode(o, w0, h0, conf_thres=0.3) for o in outputs]
+    bench.run("nms", lambda bc: lp_onix.non_max_suppression(*bc), decoded, backend=backend)
+
+
+def bench_deskew(bench, crops):
+    import plate_reader
+    if not plate_reader.HELPER_OK:
+        bench.skip("deskew", "helper/utils_rotate not found")
+        return
+    for cc in range(2):
+        for ct in range(2):
+            bench.run(f"deskew.cc{cc}_ct{ct}", lambda c, cc=cc, ct=ct: plate_reader.utils_rotate.deskew(c, cc, ct), crops)
+
+
+def bench_plate_models(bench, frames, crops, torch_models):
+    import plate_reader
+    if torch_models is None:
+        bench.skip("ocr", "không có torch / model YOLO")
+        bench.skip("plate.recognize", "không có torch / model YOLO")
+        return
+    det, ocr = torch_models
+    bench.run("ocr", lambda c: plate_reader.helper.read_plate(ocr, c), crops, backend="torch")
+    bench.run("plate.recognize", lambda f: plate_reader.recognize(det, ocr, f), frames, backend="torch")
+
+
+def bench_face(bench, frames, db_size):
+    from face_worker import cosine
+    rng = np.random.default_rng(SEED)
+    embs = rng.normal(size=(db_size, 512)).astype(np.float32)
+    embs /= np.linalg.norm(embs, axis=1, keepdims=True)
+    probes = list(rng.normal(size=(32, 512)).astype(np.float32))
+
+    def match(emb):
+        # cùng vòng lặp với face_worker.face_process_main
+        best_score = 0.0
+        for semb in embs:
+            s = cosine(emb, semb)
+            if s > best_score:
+                best_score = s
+        return best_score
+
+    if bench.wanted("face.detect_embed"):
+        if importlib.util.find_spec("insightface") is None:
+            bench.skip("face.detect_embed", "không có insightface")
+        else:
+            from insightface.app import FaceAnalysis
+            app = FaceAnalysis(name="buffalo_s", providers=["CPUExecutionProvider"])
+            app.prepare(ctx_id=0, det_size=(320, 320))
+            small = [cv2.resize(f, (f.shape[1] // 2, f.shape[0] // 2)) for f in frames]
+            bench.run("face.detect_embed", app.get, small, backend="insightface buffalo_s")
+    bench.run("face.match", match, probes, backend=f"{db_size} embedding")
+
+
+def bench_db(bench, n):
+    import db
+    tmp = tempfile.mkdtemp(prefix="spms-bench-db-")
+    old_path = db.DB_PATH
+    db.DB_PATH = os.path.join(tmp, "bench.db")
+    try:
+        db.init_db()
+        plates = [f"51A{i:05d}" for i in range(n)]
+
+        def insert(plate):
+            db.record_event(plate, "face.jpg", "plate.jpg", "2026-01-01 08:00:00")
+
+        bench.run("db.insert", insert, plates, repeat=1)
+    finally:
+        db.POOL.close_all()
+        db.DB_PATH = old_path
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_image_store(bench, frames):
+    from image_store import ImageStore
+    tmp = tempfile.mkdtemp(prefix="spms-bench-img-")
+    try:
+        store = ImageStore(tmp, max_workers=2)
+        bench.run("image.save", lambda f: store.save(f, prefix="plate"), frames)
+        store.flush()
+
+        def save_and_wait(f):
+            store.save(f, prefix="plate")
+            store.flush()
+
+        bench.run("image.write", save_and_wait, frames)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def load_torch_models():
+    import plate_reader
+    if importlib.util.find_spec("torch") is None or not plate_reader.HELPER_OK:
+        return None
+    try:
+        return plate_reader.load_models()
+    except Exception as e:
+        print("[WARN] không nạp được YOLO:", e)
+        return None
+
+
+# ------------------- meta / so sánh -------------------
+def git_meta():
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, timeout=10).stdout.strip()
+        except Exception:
+            return ""
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def compare(stages, base_path):
+    with open(base_path, encoding="utf-8") as f:
+        base = json.load(f)["stages"]
+    print(f"\nSo với {base_path} (âm = nhanh hơn):")
+    for name, s in stages.items():
+        b = base.get(name)
+        if not b:
+            print(f"{name:22s} (không có trong bản gốc)")
+            continue
+        parts = []
+        for key in ("p50_ms", "p95_ms"):
+            delta = (s[key] - b[key]) / b[key] * 100 if b[key] else 0.0
+            parts.append(f"{key[:3]} {b[key]:.3f} -> {s[key]:.3f} ({delta:+.1f}%)")
+        print(f"{name:22s} " + "  ".join(parts))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline theo từng chặng")
+    parser.add_argument("--frames", default=None, help="video / thư mục ảnh / glob (mặc định benchmarks/fixtures/frames)")
+    parser.add_argument("--crops", default=None, help="thư mục crop biển (mặc định benchmarks/fixtures/plates)")
+    parser.add_argument("--limit", type=int, default=48, help="số khung / crop tối đa")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--db-inserts", type=int, default=2000)
+    parser.add_argument("--face-db-size", type=int, default=FACE_DB_SIZE)
+    parser.add_argument("--stages", nargs="*", default=None, help="chỉ chạy các chặng có tiền tố này")
+    parser.add_argument("--json", default=None, help="ghi kết quả ra file JSON")
+    parser.add_argument("--compare", default=None, help="so với file JSON của lần chạy trước")
+    parser.add_argument("--record", default=None, help="lưu fixture đang dùng vào thư mục này rồi thoát")
+    args = parser.parse_args(argv)
+
+    frames_src = args.frames or (os.path.join(FIXTURE_DIR, "frames") if os.path.isdir(os.path.join(FIXTURE_DIR, "frames")) else None)
+    crops_src = args.crops or (os.path.join(FIXTURE_DIR, "plates") if os.path.isdir(os.path.join(FIXTURE_DIR, "plates")) else None)
+    frames = load_frames(frames_src, args.limit) if frames_src else synth_frames(min(args.limit, SYNTH_FRAMES))
+    crops = load_crops(crops_src, args.limit) if crops_src else crops_from_frames(frames)
+    if not frames:
+        print("Không đọc được khung hình nào từ", frames_src)
+        return 1
+    if args.record:
+        record_fixtures(args.record, frames, crops)
+        print(f"Đã lưu {len(frames)} khung + {len(crops)} crop vào {args.record}")
+        return 0
+
+    print(f"fixture: {len(frames)} khung ({frames_src or 'tổng hợp, seed %d' % SEED}), "
+          f"{len(crops)} crop ({crops_src or 'cắt từ khung'})")
+    bench = Bench(repeat=args.repeat, warmup=args.warmup, only=args.stages)
+    torch_models = load_torch_models() if any(bench.wanted(s) for s in ("det.infer", "ocr", "plate.")) else None
+
+    bench_detector(bench, frames, torch_models)
+    bench_deskew(bench, crops)
+    bench_plate_models(bench, frames, crops, torch_models)
+    bench_face(bench, frames, args.face_db_size)
+    bench_db(bench, args.db_inserts)
+    bench_image_store(bench, frames)
+
+    report = {
+        "meta": dict(git_meta(),
+                     timestamp=datetime.datetime.now().isoformat(timespec="seconds"),
+                     python=platform.python_version(), platform=platform.platform(),
+                     machine=platform.machine(), cpu_count=os.cpu_count(),
+                     opencv=cv2.__version__, numpy=np.__version__,
+                     frames=frames_src or f"synthetic:{SEED}", crops=crops_src or "from-frames",
+                     n_frames=len(frames), n_crops=len(crops), repeat=args.repeat),
+        "stages": bench.stages,
+        "skipped": bench.skipped,
+    }
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print("Đã ghi", args.json)
+    if args.compare:
+        compare(bench.stages, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+# benchmarks/skew_bench.py
+# So sánh ước lượng góc nghiêng biển số: Hough (cách cũ) và projection profile (utils_rotate.SKEW_METHOD).
+#
+#   python benchmarks/skew_bench.py                         # biển giả lập, góc đã biết
+#   python benchmarks/skew_bench.py --crops result/plate     # thêm crop thật (không có góc chuẩn: so độ lệch 2 cách)
+#   python benchmarks/skew_bench.py --json bench/skew.json
+#
+# Báo cáo:
+#   compute_skew   ms / lần (p50, p95) và sai số góc (trung bình, p95, tỉ lệ lệch < 1°) trên biển giả lập
+#   deskew x4      cả vòng 4 biến thể (cc, ct) trên 1 crop: cách cũ (Hough, CLAHE full-size, luôn warpAffine)
+#                  và cách mới (plate_reader: đo góc trên crop thu nhỏ, bỏ qua góc ~0, không xoay lại góc trùng)
+
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cv2
+import numpy as np
+
+import utils_rotate
+from plate_reader import DESKEW_VARIANTS, _angle_key
+
+SEED = 1234
+SYNTH_PLATES = 200
+MAX_SYNTH_ANGLE = 15.0
+
+
+# ------------------- dữ liệu -------------------
+def synth_plates(n=SYNTH_PLATES, seed=SEED):
+    """[(crop, góc chuẩn)] biển 1 dòng / 2 dòng xoay ngẫu nhiên, nền và nhiễu giống crop từ detector."""
+    rng = np.random.default_rng(seed)
+    items = []
+    for i in range(n):
+        if i % 2 == 0:
+            plate = np.full((110, 330, 3), 235, dtype=np.uint8)
+            cv2.putText(plate, f"51A-{rng.integers(100, 999)}", (14, 48), cv2.FONT_HERSHEY_SIMPLEX, 1.4, (10, 10, 10), 3)
+            cv2.putText(plate, f"{rng.integers(10, 99)}.{rng.integers(10, 99)}", (70, 98),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.4, (10, 10, 10), 3)
+        else:
+            plate = np.full((70, 400, 3), 235, dtype=np.uint8)
+            cv2.putText(plate, f"30A-{rng.integers(100, 999)}.{rng.integers(10, 99)}", (14, 52),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.5, (10, 10, 10), 3)
+        h, w = plate.shape[:2]
+        cv2.rectangle(plate, (3, 3), (w - 4, h - 4), (20, 20, 20), 3)
+        # 1/4 số biển gần như thẳng (trường hợp phổ biến ở cổng)
+        angle = float(rng.uniform(-0.2, 0.2)) if i % 4 == 3 else float(rng.uniform(-MAX_SYNTH_ANGLE, MAX_SYNTH_ANGLE))
+        m = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        crop = cv2.warpAffine(plate, m, (w, h), borderValue=(90, 90, 90))
+        crop = cv2.add(crop, rng.integers(0, 30, crop.shape, dtype=np.uint8))
+        # xoay ngược chiều kim đồng hồ `angle` độ -> dòng chữ có góc -angle trong toạ độ ảnh
+        items.append((crop, -angle))
+    return items
+
+
+def load_crops(folder, limit):
+    names = sorted(n for n in os.listdir(folder) if n.lower().endswith((".jpg", ".jpeg", ".png")))
+    crops = [cv2.imread(os.path.join(folder, n)) for n in names[:limit]]
+    return [c for c in crops if c is not None]
+
+
+# ------------------- các cách ước lượng -------------------
+def skew_hough(crop):
+    return utils_rotate.compute_skew_hough(crop, 0)
+
+
+def skew_projection(crop):
+    return utils_rotate.compute_skew_projection(crop, 0)
+
+
+def deskew_all_hough(crop):
+    """Vòng 4 biến thể như trước: Hough trên crop gốc (CLAHE full-size), luôn warpAffine."""
+    out = []
+    for cc, ct in DESKEW_VARIANTS:
+        src = utils_rotate.changeContrast(crop) if cc == 1 else crop
+        out.append(utils_rotate.rotate_image(crop, utils_rotate.compute_skew_hough(src, ct)))
+    return out
+
+
+def deskew_all_current(crop):
+    """Vòng 4 biến thể như plate_reader.read_plate_crop hiện tại (không tính OCR)."""
+    out, tried = [], set()
+    for cc, ct in DESKEW_VARIANTS:
+        angle = utils_rotate.skew_angle(crop, cc, ct)
+        key = _angle_key(angle)
+        if key in tried:
+            continue
+        tried.add(key)
+        out.append(crop if key == 0.0 else utils_rotate.rotate_image(crop, angle))
+    return out
+
+
+# ------------------- đo -------------------
+def _pct(sorted_vals, q):
+    return sorted_vals[min(len(sorted_vals) - 1, int(round(q * (len(sorted_vals) - 1))))]
+
+
+def time_fn(fn, items, repeat):
+    samples = []
+    for item in items:
+        fn(item)  # warm-up cache của OpenCV / numpy
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn(item)
+            samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return {"n": len(samples), "p50_ms": round(_pct(samples, 0.50) * 1000, 3),
+            "p95_ms": round(_pct(samples, 0.95) * 1000, 3),
+            "mean_ms": round(sum(samples) / len(samples) * 1000, 3)}
+
+
+def angle_errors(fn, items):
+    errs = sorted(abs(fn(crop) - truth) for crop, truth in items)
+    return {"mean_deg": round(sum(errs) / len(errs), 3), "p95_deg": round(_pct(errs, 0.95), 3),
+            "within_1deg": round(sum(e < 1.0 for e in errs) / len(errs), 3)}
+
+
+def run(crops_dir=None, limit=200, repeat=5):
+    synth = synth_plates(limit)
+    synth_crops = [c for c, _ in synth]
+    report = {"synthetic": {"n": len(synth)}, "methods": {}, "deskew_x4": {}}
+    for name, fn in (("hough", skew_hough), ("projection", skew_projection)):
+        report["methods"][name] = {"time": time_fn(fn, synth_crops, repeat), "error": angle_errors(fn, synth)}
+    report["deskew_x4"]["hough"] = time_fn(deskew_all_hough, synth_crops, repeat)
+    report["deskew_x4"]["current"] = time_fn(deskew_all_current, synth_crops, repeat)
+    report["deskew_x4"]["current"]["ocr_calls_mean"] = round(
+        sum(len(deskew_all_current(c)) for c in synth_crops) / len(synth_crops), 2)
+
+    if crops_dir:
+        real = load_crops(crops_dir, limit)
+        if real:
+            diffs = sorted(abs(skew_hough(c) - skew_projection(c)) for c in real)
+            report["real"] = {"dir": crops_dir, "n": len(real),
+                              "hough": time_fn(skew_hough, real, repeat),
+                              "projection": time_fn(skew_projection, real, repeat),
+                              "diff_mean_deg": round(sum(diffs) / len(diffs), 3),
+                              "diff_p95_deg": round(_pct(diffs, 0.95), 3),
+                              "deskew_x4_hough": time_fn(deskew_all_hough, real, repeat),
+                              "deskew_x4_current": time_fn(deskew_all_current, real, repeat)}
+    return report
+
+
+def print_report(report):
+    print(f"Biển giả lập: {report['synthetic']['n']} (góc chuẩn trong ±{MAX_SYNTH_ANGLE:.0f}°)")
+    print(f"{'compute_skew':14s} {'p50 ms':>8s} {'p95 ms':>8s} {'sai số TB':>10s} {'p95 sai số':>11s} {'< 1°':>7s}")
+    for name, m in report["methods"].items():
+        t, e = m["time"], m["error"]
+        print(f"{name:14s} {t['p50_ms']:8.3f} {t['p95_ms']:8.3f} {e['mean_deg']:9.2f}° {e['p95_deg']:10.2f}°"
+              f" {e['within_1deg']:7.1%}")
+    old, new = report["deskew_x4"]["hough"], report["deskew_x4"]["current"]
+    print(f"deskew x4      cũ p50 {old['p50_ms']:.3f} ms  ->  mới p50 {new['p50_ms']:.3f} ms"
+          f"  (x{old['p50_ms'] / max(new['p50_ms'], 1e-9):.1f}; ảnh cần OCR TB {new['ocr_calls_mean']:.2f}/4)")
+    real = report.get("real")
+    if real:
+        print(f"\nCrop thật: {real['n']} ({real['dir']})")
+        print(f"compute_skew   hough p50 {real['hough']['p50_ms']:.3f} ms  projection p50 "
+              f"{real['projection']['p50_ms']:.3f} ms  lệch giữa 2 cách TB {real['diff_mean_deg']:.2f}°"
+              f" p95 {real['diff_p95_deg']:.2f}°")
+        print(f"deskew x4      cũ p50 {real['deskew_x4_hough']['p50_ms']:.3f} ms  ->  mới p50 "
+              f"{real['deskew_x4_current']['p50_ms']:.3f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark + độ chính xác ước lượng góc nghiêng biển số")
+    parser.add_argument("--crops", default=None, help="thư mục crop biển thật (tuỳ chọn)")
+    parser.add_argument("--limit", type=int, default=SYNTH_PLATES, help="số biển giả lập / crop thật tối đa")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", default=None, help="ghi kết quả ra file JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args.crops, args.limit, args.repeat)
+    print_report(report)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print("\nĐã ghi", args.json)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
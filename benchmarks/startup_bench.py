@@ -0,0 +1,162 @@
+# benchmarks/startup_bench.py
+# Đo thời gian khởi động nguội của màn đăng nhập và chi phí import từng module.
+#
+#   python benchmarks/startup_bench.py                    # 5 lần, báo median / max
+#   python benchmarks/startup_bench.py --budget-ms 1500   # exit 1 nếu median vượt ngân sách
+#   python benchmarks/startup_bench.py --imports login_modern admin_gui login_user_gui --top 15
+#
+# Mỗi lần đo là 1 process mới (giống máy trạm khởi động lại):
+#   interactive = từ lúc tạo process tới khi cửa sổ đăng nhập đã hiện và event loop chạy vòng đầu
+#   gui_ready   = tới khi model_registry import xong module GUI và khởi động xong các pool (chạy nền)
+# Báo cáo import dùng `python -X importtime`, sắp theo thời gian cộng dồn.
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET_MS = 1500
+DEFAULT_IMPORTS = ("login_modern", "admin_gui", "login_user_gui")
+
+
+def _child(args):
+    """Chạy trong process con: dựng màn đăng nhập như login.run_gui rồi in mốc thời gian (JSON)."""
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    marks = {}
+    t = time.time()
+    from PyQt6.QtCore import QTimer
+    from PyQt6.QtWidgets import QApplication
+    from login_modern import ModernLoginWindow
+    import model_registry
+    marks["import"] = time.time() - t
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    win = ModernLoginWindow()
+    win.show()
+
+    def interactive():
+        marks["interactive_ts"] = time.time()
+        if not args.models:
+            app.quit()
+            return
+        reg = model_registry.registry()
+        deadline = time.time() + args.models_timeout
+
+        def poll():
+            st = reg.status()
+            if st.get("gui") != model_registry.LOADING and (reg.is_settled() or time.time() > deadline):
+                marks["gui_ready_ts"] = time.time()
+                marks["status"] = {k: st.get(k) for k in ("gui", "plate", "face")}
+                app.quit()
+            else:
+                QTimer.singleShot(20, poll)
+        poll()
+
+    QTimer.singleShot(0, interactive)
+    app.exec()
+    model_registry.registry().shutdown()
+    print(json.dumps(marks), flush=True)
+
+
+def run_once(args):
+    env = dict(os.environ)
+    if args.offscreen:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    cmd = [sys.executable, os.path.abspath(__file__), "--child"]
+    if args.models:
+        cmd += ["--models", "--models-timeout", str(args.models_timeout)]
+    t0 = time.time()
+    proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, timeout=args.timeout)
+    lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"process con lỗi (code {proc.returncode}):\n{proc.stderr[-2000:]}")
+    marks = json.loads(lines[-1])
+    res = {"interactive_ms": (marks["interactive_ts"] - t0) * 1000, "import_ms": marks["import"] * 1000}
+    if "gui_ready_ts" in marks:
+        res["gui_ready_ms"] = (marks["gui_ready_ts"] - t0) * 1000
+        res["status"] = marks.get("status")
+    return res
+
+
+def import_report(module, top=15):
+    """[(cumulative_ms, self_ms, depth, name)] của `import module`, sắp giảm dần theo cumulative."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import lỗi")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len("import time:"):].split("|")
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(cum_us) / 1000.0, int(self_us) / 1000.0, depth, name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark khởi động màn đăng nhập")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="ngân sách median cho interactive (ms); 0 = không kiểm tra")
+    parser.add_argument("--models", action="store_true",
+                        help="đo thêm thời gian tới khi module GUI + pool model đã khởi động nền")
+    parser.add_argument("--models-timeout", type=float, default=60.0)
+    parser.add_argument("--no-offscreen", dest="offscreen", action="store_false",
+                        help="hiện cửa sổ thật thay vì QT_QPA_PLATFORM=offscreen")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--imports", nargs="*", default=None,
+                        help=f"báo cáo chi phí import (mặc định: {' '.join(DEFAULT_IMPORTS)})")
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args)
+        return 0
+
+    if args.imports is not None:
+        for module in args.imports or DEFAULT_IMPORTS:
+            try:
+                rows = import_report(module, args.top)
+            except Exception as e:
+                print(f"== import {module}: lỗi: {e}")
+                continue
+            total = next((r[0] for r in rows if r[3] == module), rows[0][0] if rows else 0.0)
+            print(f"== import {module}: {total:.1f} ms")
+            print(f"{'cumulative':>11} {'self':>8}  module")
+            for cum, own, depth, name in rows:
+                print(f"{cum:9.1f}ms {own:6.1f}ms  {'  ' * min(depth, 6)}{name}")
+            print()
+        return 0
+
+    results = []
+    for i in range(args.runs):
+        r = run_once(args)
+        results.append(r)
+        extra = f"  gui_ready {r['gui_ready_ms']:.0f} ms {r.get('status')}" if "gui_ready_ms" in r else ""
+        print(f"lần {i + 1}: interactive {r['interactive_ms']:.0f} ms (import {r['import_ms']:.0f} ms){extra}")
+
+    inter = [r["interactive_ms"] for r in results]
+    med = statistics.median(inter)
+    print(f"interactive: median {med:.0f} ms, max {max(inter):.0f} ms")
+    ready = [r["gui_ready_ms"] for r in results if "gui_ready_ms" in r]
+    if ready:
+        print(f"gui_ready:   median {statistics.median(ready):.0f} ms, max {max(ready):.0f} ms")
+    if args.budget_ms and med > args.budget_ms:
+        print(f"VƯỢT NGÂN SÁCH: {med:.0f} ms > {args.budget_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,36 @@
 import sqlite3
 import os
+import sys
+import time
+import argparse
+import threading
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+
+import metrics
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "parking.db")
 
-def init_db():
+# Phiên bản schema hiện tại, lưu trong PRAGMA user_version của file DB
+SCHEMA_VERSION = 5
+
+
+def connect(path=None, **kwargs):
     """
-    Tạo hoặc cập nhật schema DB. Nếu database cũ dùng 'IN'/'OUT', migrate sang 'Vào'/'Ra'.
+    Mở kết nối SQLite với các pragma chuẩn của dự án:
+    WAL (đọc không chặn ghi), synchronous=NORMAL (an toàn với WAL, ít fsync), cache ~8MB.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+    conn = sqlite3.connect(path or DB_PATH, timeout=10, **kwargs)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-8000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
 
-    # Nếu bảng chưa tồn tại thì tạo mới với CHECK trạng thái bằng tiếng Việt
+def _migrate_v1(cur):
+    """Bảng events gốc. Nếu database cũ dùng 'IN'/'OUT', migrate sang 'Vào'/'Ra'."""
     cur.execute("""
     CREATE TABLE IF NOT EXISTS events (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -23,21 +42,731 @@ def init_db():
         plate_image_path TEXT
     )
     """)
-    conn.commit()
+    cur.execute("UPDATE events SET status = 'Vào' WHERE status = 'IN'")
+    cur.execute("UPDATE events SET status = 'Ra' WHERE status = 'OUT'")
+
+
+def _migrate_v2(cur):
+    """Index cho tra cứu theo biển số, lọc trạng thái và lọc khoảng thời gian."""
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_plate_id ON events(plate_text, id)")
+    # lượt Vào/Ra mới nhất của một biển (đường nóng khi ghép cặp)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_plate_status_id ON events(plate_text, status, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_status_id ON events(status, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_time_in ON events(time_in)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_time_out ON events(time_out)")
+
+
+def _migrate_v3(cur):
+    """
+    Bảng sessions: mỗi phiên gửi xe ghép 1 lượt Vào với lượt Ra kế tiếp của cùng biển.
+    is_open = 1 khi xe còn trong bãi. Dựng sẵn từ lịch sử events hiện có.
+    """
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        plate_text TEXT NOT NULL,
+        entry_event_id INTEGER,
+        exit_event_id INTEGER,
+        time_in TEXT,
+        time_out TEXT,
+        duration_s INTEGER,
+        is_open INTEGER NOT NULL DEFAULT 1
+    )
+    """)
+    # partial index: chỉ chứa các phiên đang mở -> tra "xe có trong bãi?" theo số xe trong bãi
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sessions_open_plate ON sessions(plate_text) WHERE is_open = 1")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sessions_plate_id ON sessions(plate_text, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sessions_time_in ON sessions(time_in)")
+    _rebuild_sessions(cur)
+
+
+# ------------------- Plate search index -------------------
+# Ký tự phân cách bị bỏ khi chuẩn hoá biển ("51A-123.45" -> "51A12345")
+PLATE_SEPARATORS = " -."
+# Các cặp OCR hay nhầm, gộp về cùng 1 ký tự cho tìm kiếm gần đúng (D/0, B/8, ...)
+OCR_CONFUSIONS = {"O": "0", "D": "0", "Q": "0", "I": "1", "L": "1",
+                  "Z": "2", "S": "5", "G": "6", "B": "8"}
+FTS_MIN_QUERY = 3  # tokenizer trigram cần chuỗi tìm >= 3 ký tự
+
+
+def normalize_plate(text):
+    text = text or ""
+    for c in PLATE_SEPARATORS:
+        text = text.replace(c, "")
+    return text.upper()
+
+
+def fold_plate(text):
+    return "".join(OCR_CONFUSIONS.get(c, c) for c in normalize_plate(text))
+
+
+def _sql_normalize(col):
+    # cùng quy tắc với normalize_plate, viết bằng SQL để trigger chạy được ở mọi client
+    expr = col
+    for c in PLATE_SEPARATORS:
+        expr = f"REPLACE({expr}, '{c}', '')"
+    return f"UPPER({expr})"
+
+
+def _sql_fold(col):
+    expr = _sql_normalize(col)
+    for src, dst in OCR_CONFUSIONS.items():
+        expr = f"REPLACE({expr}, '{src}', '{dst}')"
+    return expr
+
+
+def _create_search_index(cur):
+    """
+    Bảng FTS5 trigram events_fts(rowid = events.id): plate_norm cho tìm chính xác,
+    plate_fold cho tìm gần đúng. Trigger giữ đồng bộ với events. Trả False nếu SQLite
+    không hỗ trợ FTS5/trigram (khi đó tìm kiếm dùng LIKE).
+    """
+    try:
+        cur.execute("CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(plate_norm, plate_fold, tokenize='trigram')")
+    except sqlite3.OperationalError as e:
+        print("[WARN] Không tạo được chỉ mục tìm kiếm FTS5:", e)
+        return False
+    norm_new, fold_new = _sql_normalize("new.plate_text"), _sql_fold("new.plate_text")
+    cur.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS events_fts_ai AFTER INSERT ON events BEGIN
+        INSERT INTO events_fts(rowid, plate_norm, plate_fold) VALUES (new.id, {norm_new}, {fold_new});
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS events_fts_ad AFTER DELETE ON events BEGIN
+        DELETE FROM events_fts WHERE rowid = old.id;
+    END
+    """)
+    cur.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS events_fts_au AFTER UPDATE OF plate_text ON events BEGIN
+        UPDATE events_fts SET plate_norm = {norm_new}, plate_fold = {fold_new} WHERE rowid = new.id;
+    END
+    """)
+    cur.execute("DELETE FROM events_fts")
+    cur.execute(f"""
+        INSERT INTO events_fts(rowid, plate_norm, plate_fold)
+        SELECT id, {_sql_normalize("plate_text")}, {_sql_fold("plate_text")} FROM events
+    """)
+    _fts_cache.clear()
+    return True
+
+
+def _migrate_v4(cur):
+    """Chỉ mục tìm kiếm biển số (FTS5 trigram) cho trang quản trị."""
+    _create_search_index(cur)
+
+
+def _migrate_v5(cur):
+    """Xoá mềm: deleted_at khác NULL = đã xoá (còn hoàn tác được cho tới khi purge)."""
+    cols = [r[1] for r in cur.execute("PRAGMA table_info(events)")]
+    if "deleted_at" not in cols:
+        cur.execute("ALTER TABLE events ADD COLUMN deleted_at TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_deleted_at ON events(deleted_at) WHERE deleted_at IS NOT NULL")
 
-    # Thêm/check constraint không bắt buộc (để giữ linh hoạt) nhưng đảm bảo giá trị trạng thái chuẩn
-    # Nếu có bản cũ với 'IN'/'OUT' thì migrate
+
+# (version, hàm migrate) — chỉ thêm vào cuối, không sửa migration đã phát hành
+MIGRATIONS = [
+    (1, _migrate_v1),
+    (2, _migrate_v2),
+    (3, _migrate_v3),
+    (4, _migrate_v4),
+    (5, _migrate_v5),
+]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def init_db():
+    """
+    Tạo hoặc nâng cấp schema DB theo MIGRATIONS. Mỗi bước chạy trong 1 transaction
+    và ghi lại phiên bản vào PRAGMA user_version.
+    """
+    conn = connect()
     try:
-        # Kiểm tra xem có tồn tại các giá trị IN/OUT cũ không
-        cur.execute("SELECT COUNT(*) FROM events WHERE status IN ('IN','OUT')")
-        cnt = cur.fetchone()[0]
-        if cnt > 0:
-            # Chuyển 'IN' -> 'Vào', 'OUT' -> 'Ra'
-            cur.execute("UPDATE events SET status = 'Vào' WHERE status = 'IN'")
-            cur.execute("UPDATE events SET status = 'Ra' WHERE status = 'OUT'")
-            conn.commit()
+        version = get_schema_version(conn)
+        for v, migrate in MIGRATIONS:
+            if v <= version:
+                continue
+            cur = conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                migrate(cur)
+                cur.execute(f"PRAGMA user_version = {int(v)}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            version = v
+        # cập nhật thống kê cho query planner sau khi thêm index
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+
+
+# DB_PATH -> có bảng events_fts hay không
+_fts_cache = {}
+
+
+SQL_HAS_FTS = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'events_fts'"
+
+
+def has_search_index(conn=None):
+    path = DB_PATH
+    if path not in _fts_cache:
+        if conn is not None:
+            row = conn.execute(SQL_HAS_FTS).fetchone()
+        else:
+            # kiểm tra 1 lần: kết nối ngắn hạn, không mở kết nối pool cho thread gọi (thread nền của export...)
+            with closing(connect(path)) as tmp:
+                row = tmp.execute(SQL_HAS_FTS).fetchone()
+        _fts_cache[path] = row is not None
+    return _fts_cache[path]
+
+
+def rebuild_search_index():
+    with transaction() as cur:
+        return _create_search_index(cur)
+
+
+# ------------------- Connection pool -------------------
+class ConnectionPool:
+    """
+    Mỗi thread giữ 1 kết nối mở suốt vòng đời (không connect/close cho từng câu lệnh).
+    sqlite3 cache prepared statement theo kết nối, nên các câu SQL hằng bên dưới
+    chỉ phải biên dịch 1 lần cho mỗi thread.
+    """
+
+    def __init__(self, path=None, cached_statements=256):
+        self.path = path
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conns = []
+
+    def get(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False chỉ để close_all() đóng được từ thread chính;
+            # mỗi kết nối vẫn chỉ được dùng bởi thread đã tạo ra nó
+            conn = connect(self.path, check_same_thread=False, cached_statements=self.cached_statements)
+            self._local.conn = conn
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def release(self):
+        """Đóng kết nối của thread hiện tại (thread nền sắp kết thúc)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            if conn in self._conns:
+                self._conns.remove(conn)
+        conn.close()
+
+    def close_all(self):
+        with self._lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+
+POOL = ConnectionPool()
+
+
+def get_conn():
+    return POOL.get()
+
+
+@contextmanager
+def transaction():
+    """with transaction() as cur: ... -> commit khi thành công, rollback khi lỗi."""
+    conn = get_conn()
+    try:
+        yield conn.cursor()
+        conn.commit()
     except Exception:
-        # Nếu bảng vừa tạo mới, các truy vấn trên sẽ ok; nếu có lỗi thì bỏ qua (môi trường khác)
-        pass
+        conn.rollback()
+        raise
+
+
+# ------------------- Events -------------------
+EVENT_COLUMNS = ["id", "plate_text", "status", "time_in", "time_out", "face_image_path", "plate_image_path"]
+_EVENT_SELECT = "SELECT id, plate_text, status, time_in, time_out, face_image_path, plate_image_path FROM events"
+
+SQL_INSERT_EVENT = """
+    INSERT INTO events
+    (plate_text, status, time_in, time_out, face_image_path, plate_image_path)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+SQL_LATEST_IN = """
+    SELECT time_in, face_image_path, plate_image_path
+    FROM events
+    WHERE plate_text = ? AND status = 'Vào' AND deleted_at IS NULL
+    ORDER BY id DESC LIMIT 1
+"""
+SQL_LATEST_OUT = """
+    SELECT time_out, face_image_path, plate_image_path
+    FROM events
+    WHERE plate_text = ? AND status = 'Ra' AND deleted_at IS NULL
+    ORDER BY id DESC LIMIT 1
+"""
+SQL_LATEST_FACE = """
+    SELECT face_image_path
+    FROM events
+    WHERE plate_text = ? AND face_image_path IS NOT NULL AND face_image_path != '' AND deleted_at IS NULL
+    ORDER BY id DESC LIMIT 1
+"""
+SQL_LAST_STATUS = "SELECT status FROM events WHERE plate_text = ? AND deleted_at IS NULL ORDER BY id DESC LIMIT 1"
+SQL_EVENT_BY_ID = _EVENT_SELECT + " WHERE id = ? AND deleted_at IS NULL"
+
+
+def _event_dict(row):
+    return dict(zip(EVENT_COLUMNS, row)) if row else None
+
+
+# ------------------- Sessions -------------------
+SESSION_COLUMNS = ["id", "plate_text", "entry_event_id", "exit_event_id", "time_in", "time_out", "duration_s", "is_open"]
+_SESSION_SELECT = "SELECT id, plate_text, entry_event_id, exit_event_id, time_in, time_out, duration_s, is_open FROM sessions"
+
+# mỗi biển có tối đa 1 phiên mở (_apply_session đóng phiên cũ trước khi mở phiên mới)
+# tăng mỗi khi sessions bị dựng lại ngoài đường ghi lúc chụp (sửa / xoá / hoàn tác event):
+# OccupancyCache so sánh cùng PRAGMA data_version (ghi từ kết nối / process khác) để biết cần nạp lại
+_sessions_revision = 0
+
+
+def sessions_revision():
+    return _sessions_revision
+
+
+def _sessions_changed():
+    global _sessions_revision
+    _sessions_revision += 1
+
+
+SQL_OPEN_SESSION_ID = "SELECT id FROM sessions WHERE plate_text = ? AND is_open = 1 LIMIT 1"
+SQL_OPEN_SESSION = _SESSION_SELECT + " WHERE plate_text = ? AND is_open = 1 LIMIT 1"
+SQL_CLOSE_SESSION_NO_EXIT = "UPDATE sessions SET is_open = 0 WHERE id = ?"
+SQL_OPEN_NEW_SESSION = "INSERT INTO sessions (plate_text, entry_event_id, time_in, is_open) VALUES (?, ?, ?, 1)"
+SQL_CLOSE_SESSION = """
+    UPDATE sessions
+    SET exit_event_id = ?, time_out = ?, is_open = 0,
+        duration_s = CAST(strftime('%s', ?) - strftime('%s', time_in) AS INTEGER)
+    WHERE id = ?
+"""
+SQL_EXIT_ONLY_SESSION = "INSERT INTO sessions (plate_text, exit_event_id, time_out, is_open) VALUES (?, ?, ?, 0)"
+
+
+def _apply_session(cur, plate_text, status, event_id, ts):
+    """Cập nhật sessions cho 1 event vừa ghi (chạy trong transaction của lệnh ghi)."""
+    row = cur.execute(SQL_OPEN_SESSION_ID, (plate_text,)).fetchone()
+    if status == "Vào":
+        if row:
+            # vào lại khi chưa ghi nhận lượt ra: đóng phiên cũ (không có exit)
+            cur.execute(SQL_CLOSE_SESSION_NO_EXIT, (row[0],))
+        cur.execute(SQL_OPEN_NEW_SESSION, (plate_text, event_id, ts))
+    elif row:
+        cur.execute(SQL_CLOSE_SESSION, (event_id, ts, ts, row[0]))
+    else:
+        # lượt Ra không có lượt Vào tương ứng (dữ liệu cũ / sửa tay)
+        cur.execute(SQL_EXIT_ONLY_SESSION, (plate_text, event_id, ts))
+
+
+def _rebuild_sessions(cur, plates=None):
+    """Dựng lại sessions từ events (toàn bộ, hoặc chỉ các biển trong plates). Trả số event đã duyệt."""
+    sql = "SELECT id, plate_text, status, time_in, time_out FROM events WHERE 1"
+    # migration v3 gọi hàm này khi events chưa có cột deleted_at (thêm ở v5)
+    if any(r[1] == "deleted_at" for r in cur.execute("PRAGMA table_info(events)")):
+        sql += " AND deleted_at IS NULL"
+    params = []
+    if plates is None:
+        cur.execute("DELETE FROM sessions")
+    else:
+        params = sorted({p for p in plates if p is not None})
+        if not params:
+            return 0
+        marks = ",".join("?" * len(params))
+        cur.execute(f"DELETE FROM sessions WHERE plate_text IN ({marks})", params)
+        sql += f" AND plate_text IN ({marks})"
+    rows = cur.execute(sql + " ORDER BY plate_text, id", params).fetchall()
+    for ev_id, plate_text, status, time_in, time_out in rows:
+        _apply_session(cur, plate_text, status, ev_id, time_in if status == "Vào" else time_out)
+    return len(rows)
+
+
+def rebuild_sessions(plates=None):
+    """Dựng lại sessions cho các biển (None = toàn bộ) trong 1 transaction."""
+    with transaction() as cur:
+        n = _rebuild_sessions(cur, plates)
+    _sessions_changed()
+    return n
+
+
+def backfill_sessions():
+    return rebuild_sessions(None)
+
+
+def _session_dict(row):
+    return dict(zip(SESSION_COLUMNS, row)) if row else None
+
+
+def get_open_session(plate_text):
+    """Phiên đang mở (xe còn trong bãi) của biển, hoặc None."""
+    return _session_dict(get_conn().execute(SQL_OPEN_SESSION, (plate_text,)).fetchone())
+
+
+def list_open_sessions():
+    return [_session_dict(r) for r in get_conn().execute(_SESSION_SELECT + " WHERE is_open = 1 ORDER BY id")]
+
+
+def count_open_sessions():
+    return get_conn().execute("SELECT COUNT(*) FROM sessions WHERE is_open = 1").fetchone()[0]
+
+
+def get_latest_in_out_for_plate(plate_text):
+    """((time_in, face, plate) của lượt Vào mới nhất, (time_out, face, plate) của lượt Ra mới nhất)"""
+    conn = get_conn()
+    row_in = conn.execute(SQL_LATEST_IN, (plate_text,)).fetchone()
+    row_out = conn.execute(SQL_LATEST_OUT, (plate_text,)).fetchone()
+    return tuple(row_in) if row_in else (None, None, None), tuple(row_out) if row_out else (None, None, None)
+
+
+def get_latest_face_for_plate(plate_text):
+    if not plate_text:
+        return None
+    row = get_conn().execute(SQL_LATEST_FACE, (plate_text,)).fetchone()
+    return row[0] if row else None
+
+
+def detect_in_out(plate_text):
+    """Predict next status for a plate: default Vào if none, else toggle between Vào <-> Ra"""
+    row = get_conn().execute(SQL_LAST_STATUS, (plate_text,)).fetchone()
+    if row is None:
+        return "Vào"
+    return "Ra" if row[0] == "Vào" else "Vào"
+
+
+# Trạng thái hiện tại của 1 biển trong 1 lần truy vấn (thay cho detect_in_out +
+# get_latest_in_out_for_plate + get_latest_face_for_plate)
+SQL_PLATE_CONTEXT = """
+    SELECT
+        (SELECT status FROM events WHERE plate_text = :p AND deleted_at IS NULL ORDER BY id DESC LIMIT 1),
+        e_in.time_in, e_in.face_image_path, e_in.plate_image_path,
+        e_out.time_out, e_out.face_image_path, e_out.plate_image_path,
+        (SELECT face_image_path FROM events
+         WHERE plate_text = :p AND face_image_path IS NOT NULL AND face_image_path != '' AND deleted_at IS NULL
+         ORDER BY id DESC LIMIT 1)
+    FROM (SELECT 1)
+    LEFT JOIN (SELECT time_in, face_image_path, plate_image_path FROM events
+               WHERE plate_text = :p AND status = 'Vào' AND deleted_at IS NULL ORDER BY id DESC LIMIT 1) AS e_in
+    LEFT JOIN (SELECT time_out, face_image_path, plate_image_path FROM events
+               WHERE plate_text = :p AND status = 'Ra' AND deleted_at IS NULL ORDER BY id DESC LIMIT 1) AS e_out
+"""
+
+
+def next_status(last_status):
+    return "Ra" if last_status == "Vào" else "Vào"
+
+
+def _plate_context(cur, plate_text):
+    row = cur.execute(SQL_PLATE_CONTEXT, {"p": plate_text}).fetchone()
+    return {
+        "plate": plate_text,
+        "last_status": row[0],
+        "next_status": next_status(row[0]),
+        "entry": (row[1], row[2], row[3]),  # (time_in, face, plate) lượt Vào mới nhất
+        "exit": (row[4], row[5], row[6]),   # (time_out, face, plate) lượt Ra mới nhất
+        "last_face": row[7],
+    }
+
+
+def get_plate_context(plate_text):
+    """
+    {"plate", "last_status", "next_status", "entry", "exit", "last_face"} của một biển,
+    lấy trong 1 câu truy vấn.
+    """
+    return _plate_context(get_conn().cursor(), plate_text)
+
+
+def record_event(plate_text, face_path, plate_path, now, status=None):
+    """
+    Ghi lượt Vào/Ra và trả (event_id, status, context sau khi ghi).
+    status=None -> tự xác định theo lượt cuối của biển, đọc và ghi trong cùng 1 transaction
+    (BEGIN IMMEDIATE) nên hai làn ghi cùng biển không thể cùng thấy một trạng thái cũ.
+    """
+    t0 = time.perf_counter()
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        ctx = _plate_context(cur, plate_text)
+        status = status or ctx["next_status"]
+        time_in = now if status == "Vào" else None
+        time_out = now if status == "Ra" else None
+        cur.execute(SQL_INSERT_EVENT, (plate_text, status, time_in, time_out, face_path, plate_path))
+        event_id = cur.lastrowid
+        _apply_session(cur, plate_text, status, event_id, now)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    metrics.observe("db_insert", time.perf_counter() - t0)
+    # trạng thái sau khi ghi suy ra trực tiếp từ dòng vừa thêm, không cần đọc lại
+    ctx["last_status"] = status
+    ctx["next_status"] = next_status(status)
+    if status == "Vào":
+        ctx["entry"] = (now, face_path, plate_path)
+    else:
+        ctx["exit"] = (now, face_path, plate_path)
+    if face_path:
+        ctx["last_face"] = face_path
+    return event_id, status, ctx
+
+
+def get_event_by_id(ev_id):
+    return _event_dict(get_conn().execute(SQL_EVENT_BY_ID, (ev_id,)).fetchone())
+
+
+_EVENT_SELECT_E = ("SELECT e.id, e.plate_text, e.status, e.time_in, e.time_out, "
+                   "e.face_image_path, e.plate_image_path")
+
+
+PAGE_SIZE = 200
+
+
+def _search_key(search_text, fuzzy):
+    return fold_plate(search_text) if fuzzy else normalize_plate(search_text)
+
+
+def is_ranked_search(search_text, fuzzy=False):
+    """True nếu tìm kiếm dùng chỉ mục FTS (kết quả xếp theo độ khớp, không theo id)."""
+    return len(_search_key(search_text, fuzzy)) >= FTS_MIN_QUERY and has_search_index()
+
+
+def build_event_query(search_text="", status_filter=None, date_from=None, date_to=None, fuzzy=False,
+                      before_id=None, limit=None, select=_EVENT_SELECT_E):
+    """
+    SQL + params cho danh sách lịch sử có lọc.
+    date_from / date_to: chuỗi 'YYYY-mm-dd' (bao gồm cả ngày).
+    search_text khớp một phần biển số (bỏ dấu cách/gạch, không phân biệt hoa thường);
+    fuzzy=True coi các ký tự OCR hay nhầm là một (0/D/O, 8/B, ...).
+    Có search_text: dùng chỉ mục FTS5, xếp khớp đúng cả biển -> khớp đầu biển -> bm25 -> mới nhất.
+    before_id / limit: phân trang keyset theo id giảm dần (chỉ dùng khi không xếp theo độ khớp).
+    """
+    clauses = ["e.deleted_at IS NULL"]; params = []; order = "e.id DESC"
+    sql = select + " FROM events AS e"
+    key = _search_key(search_text, fuzzy)
+    if key:
+        col = "plate_fold" if fuzzy else "plate_norm"
+        if len(key) >= FTS_MIN_QUERY and has_search_index():
+            sql = select + " FROM events_fts AS f JOIN events AS e ON e.id = f.rowid"
+            clauses.append("events_fts MATCH ?")
+            params.append(f'{col} : "' + key.replace('"', '""') + '"')
+            order = f"(f.{col} = ?) DESC, (substr(f.{col}, 1, ?) = ?) DESC, f.rank, e.id DESC"
+            order_params = [key, len(key), key]
+        else:
+            # chuỗi quá ngắn cho trigram (hoặc SQLite không có FTS5) -> quét LIKE
+            expr = _sql_fold("e.plate_text") if fuzzy else _sql_normalize("e.plate_text")
+            clauses.append(f"{expr} LIKE ?"); params.append(f"%{key}%")
+            order_params = []
+    else:
+        order_params = []
+    if status_filter in ("Vào", "Ra"):
+        clauses.append("e.status = ?"); params.append(status_filter)
+    if date_from:
+        d0 = date_from + " 00:00:00"
+        clauses.append("(e.time_in >= ? OR e.time_out >= ? OR (e.time_in IS NULL AND e.time_out >= ?))")
+        params += [d0, d0, d0]
+    if date_to:
+        d1 = date_to + " 23:59:59"
+        clauses.append("(e.time_in <= ? OR e.time_out <= ? OR (e.time_in IS NULL AND e.time_out <= ?))")
+        params += [d1, d1, d1]
+    if before_id is not None:
+        clauses.append("e.id < ?"); params.append(int(before_id))
+    if clauses: sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY " + order
+    params += order_params
+    if limit is not None:
+        sql += " LIMIT ?"; params.append(int(limit))
+    return sql, params
+
+
+def query_events(search_text="", status_filter=None, date_from=None, date_to=None, fuzzy=False):
+    sql, params = build_event_query(search_text, status_filter, date_from, date_to, fuzzy)
+    return get_conn().execute(sql, params).fetchall()
+
+
+def page_events(search_text="", status_filter=None, date_from=None, date_to=None, fuzzy=False,
+                before_id=None, limit=PAGE_SIZE):
+    """1 trang kết quả (id giảm dần) sau before_id — không dùng OFFSET nên trang sâu vẫn nhanh."""
+    sql, params = build_event_query(search_text, status_filter, date_from, date_to, fuzzy,
+                                    before_id=before_id, limit=limit)
+    return get_conn().execute(sql, params).fetchall()
+
+
+def query_event_ids(search_text="", status_filter=None, date_from=None, date_to=None, fuzzy=False):
+    """Chỉ id của kết quả, đúng thứ tự xếp hạng; dùng cho tìm kiếm FTS rồi nạp dòng theo trang."""
+    sql, params = build_event_query(search_text, status_filter, date_from, date_to, fuzzy, select="SELECT e.id")
+    return [r[0] for r in get_conn().execute(sql, params)]
+
+
+def get_events_by_ids(ids):
+    """Các dòng events theo danh sách id, giữ nguyên thứ tự của ids."""
+    ids = [int(i) for i in ids]
+    if not ids:
+        return []
+    marks = ",".join("?" * len(ids))
+    rows = {r[0]: r for r in get_conn().execute(_EVENT_SELECT + f" WHERE id IN ({marks}) AND deleted_at IS NULL", ids)}
+    return [rows[i] for i in ids if i in rows]
+
+
+def load_events():
+    return get_conn().execute(_EVENT_SELECT + " WHERE deleted_at IS NULL ORDER BY id DESC").fetchall()
+
+
+def update_plate(ev_id, new_plate):
+    with transaction() as cur:
+        row = cur.execute("SELECT plate_text FROM events WHERE id = ?", (ev_id,)).fetchone()
+        cur.execute("UPDATE events SET plate_text = ? WHERE id = ?", (new_plate, ev_id))
+        # đổi biển làm lệch phiên của cả biển cũ và biển mới
+        _rebuild_sessions(cur, [new_plate] + ([row[0]] if row else []))
+    _sessions_changed()
+
+
+def _id_marks(ids):
+    ids = [int(i) for i in ids]
+    return ids, ",".join("?" * len(ids))
+
+
+def delete_events(ids, now=None):
+    """
+    Xoá mềm các id (1 câu UPDATE cho cả danh sách). Trả các id thực sự vừa bị xoá —
+    truyền lại cho restore_events để hoàn tác, id không đổi.
+    """
+    ids, marks = _id_marks(ids)
+    if not ids:
+        return []
+    now = now or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with transaction() as cur:
+        rows = cur.execute(f"SELECT id, plate_text FROM events WHERE id IN ({marks}) AND deleted_at IS NULL", ids).fetchall()
+        if not rows:
+            return []
+        deleted, dmarks = _id_marks([r[0] for r in rows])
+        cur.execute(f"UPDATE events SET deleted_at = ? WHERE id IN ({dmarks})", [now] + deleted)
+        _rebuild_sessions(cur, [r[1] for r in rows])
+    _sessions_changed()
+    return deleted
+
+
+def restore_events(ids):
+    """Hoàn tác delete_events: bỏ cờ xoá mềm, giữ nguyên id."""
+    ids, marks = _id_marks(ids)
+    if not ids:
+        return 0
+    with transaction() as cur:
+        plates = [r[0] for r in cur.execute(
+            f"SELECT DISTINCT plate_text FROM events WHERE id IN ({marks}) AND deleted_at IS NOT NULL", ids)]
+        cur.execute(f"UPDATE events SET deleted_at = NULL WHERE id IN ({marks}) AND deleted_at IS NOT NULL", ids)
+        n = cur.rowcount
+        _rebuild_sessions(cur, plates)
+    _sessions_changed()
+    return n
+
+
+def purge_deleted(ids=None, older_than_s=None):
+    """
+    Xoá hẳn các event đã xoá mềm (theo ids, hoặc đã xoá quá older_than_s giây, hoặc tất cả).
+    Trả (số dòng, các đường dẫn ảnh không còn event nào tham chiếu) — gọi xoá file SAU khi
+    hàm này trả về (transaction đã commit), để lỗi DB không làm mất ảnh.
+    """
+    sql = "SELECT id, face_image_path, plate_image_path FROM events WHERE deleted_at IS NOT NULL"
+    params = []
+    if ids is not None:
+        ids, marks = _id_marks(ids)
+        if not ids:
+            return 0, []
+        sql += f" AND id IN ({marks})"; params += ids
+    if older_than_s is not None:
+        cutoff = (datetime.now() - timedelta(seconds=float(older_than_s))).strftime("%Y-%m-%d %H:%M:%S")
+        sql += " AND deleted_at <= ?"; params.append(cutoff)
+    with transaction() as cur:
+        rows = cur.execute(sql, params).fetchall()
+        if not rows:
+            return 0, []
+        purged, marks = _id_marks([r[0] for r in rows])
+        cur.execute(f"DELETE FROM events WHERE id IN ({marks})", purged)
+        paths = sorted({p for r in rows for p in r[1:] if p})
+        still_used = set()
+        for i in range(0, len(paths), 400):
+            chunk = paths[i:i + 400]
+            pm = ",".join("?" * len(chunk))
+            for face, plate in cur.execute(
+                    f"SELECT face_image_path, plate_image_path FROM events "
+                    f"WHERE face_image_path IN ({pm}) OR plate_image_path IN ({pm})", chunk + chunk):
+                still_used.update((face, plate))
+    return len(purged), [p for p in paths if p not in still_used]
+
+
+def referenced_images():
+    """Mọi đường dẫn ảnh còn được events tham chiếu (kể cả event đang chờ hoàn tác)."""
+    used = set()
+    for face, plate in get_conn().execute("SELECT face_image_path, plate_image_path FROM events"):
+        used.update((face, plate))
+    used.discard(None); used.discard("")
+    return used
+
+
+# ------------------- CLI -------------------
+def main(argv=None):
+    global DB_PATH
+    parser = argparse.ArgumentParser(description="Tiện ích CSDL bãi xe")
+    parser.add_argument("--db", default=None, help="đường dẫn file DB (mặc định parking.db)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_bf = sub.add_parser("backfill-sessions", help="dựng lại bảng sessions từ lịch sử events")
+    p_bf.add_argument("--plate", action="append", help="chỉ dựng lại cho biển này (có thể lặp lại)")
+    sub.add_parser("rebuild-search-index", help="tạo lại chỉ mục tìm kiếm biển số (FTS5)")
+    p_pd = sub.add_parser("purge-deleted", help="xoá hẳn các event đã xoá mềm và ảnh không còn dùng")
+    p_pd.add_argument("--older-than-days", type=float, default=1.0, help="chỉ các event đã xoá quá N ngày")
+    p_pd.add_argument("--keep-images", action="store_true", help="không xoá file ảnh")
+    p_po = sub.add_parser("purge-orphans", help="xoá file ảnh trong thư mục kết quả không thuộc event nào")
+    p_po.add_argument("--root", default=os.path.join(BASE_DIR, "result"))
+    p_po.add_argument("--min-age-hours", type=float, default=24.0, help="bỏ qua ảnh mới hơn N giờ (đang chờ ghép cặp)")
+    p_po.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        DB_PATH = args.db
+    init_db()
+    if args.cmd == "backfill-sessions":
+        n = rebuild_sessions(args.plate)
+        print(f"Đã duyệt {n} sự kiện, {count_open_sessions()} xe đang trong bãi.")
+    elif args.cmd == "rebuild-search-index":
+        print("Đã tạo lại chỉ mục tìm kiếm." if rebuild_search_index() else "SQLite không hỗ trợ FTS5 trigram.")
+    elif args.cmd == "purge-deleted":
+        n, paths = purge_deleted(older_than_s=args.older_than_days * 86400)
+        removed = 0
+        if paths and not args.keep_images:
+            from image_store import remove_image_files
+            removed = remove_image_files(paths)
+        print(f"Đã xoá hẳn {n} sự kiện, {removed} file ảnh.")
+    elif args.cmd == "purge-orphans":
+        from image_store import find_orphan_images, remove_image_files
+        orphans = find_orphan_images(args.root, referenced_images(), min_age_s=args.min_age_hours * 3600)
+        if args.dry_run:
+            for p in orphans:
+                print(p)
+            print(f"{len(orphans)} file ảnh không thuộc event nào.")
+        else:
+            print(f"Đã xoá {remove_image_files(orphans)} file ảnh không thuộc event nào.")
+    return 0
+
 
-    conn.close()
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
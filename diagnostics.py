@@ -0,0 +1,105 @@
+# diagnostics.py
+# Bảng chẩn đoán cho màn vận hành (F12): p50/p95/p99 từng chặng pipeline theo metrics.py,
+# cộng hàng đợi ghi ảnh / nhận diện biển. Làm mới mỗi giây, không chặn camera.
+# Nút "Xuất Prometheus…" ghi snapshot ra file text format (đọc bằng node_exporter hoặc gửi kèm báo lỗi).
+
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem,
+    QHeaderView, QFileDialog, QMessageBox
+)
+
+import metrics
+
+REFRESH_MS = 1000
+COLUMNS = ["Chặng", "Số lần", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Max (ms)"]
+FIELDS = ["count", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+
+
+class DiagnosticsDialog(QDialog):
+    """
+    Cửa sổ không modal; extra_stats() -> [(nhãn, giá trị)] do màn vận hành cung cấp
+    (hàng đợi ảnh, yêu cầu biển đang chờ...). on_profile: nút bắt đầu lấy mẫu profile.
+    """
+
+    def __init__(self, parent=None, extra_stats=None, on_profile=None):
+        super().__init__(parent)
+        self.setWindowTitle("Chẩn đoán hiệu năng")
+        self.resize(640, 460)
+        self._extra_stats = extra_stats
+
+        root = QVBoxLayout(self)
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        root.addWidget(self.table, stretch=1)
+
+        self.lb_extra = QLabel("")
+        self.lb_extra.setWordWrap(True)
+        root.addWidget(self.lb_extra)
+        if not metrics.METRICS.enabled:
+            root.addWidget(QLabel("Đo thời gian đang tắt (SPMS_METRICS=0)."))
+
+        buttons = QHBoxLayout()
+        btn_reset = QPushButton("Đặt lại")
+        btn_reset.setProperty("secondary", True)
+        btn_reset.clicked.connect(self._reset)
+        btn_export = QPushButton("Xuất Prometheus…")
+        btn_export.clicked.connect(self._export)
+        btn_close = QPushButton("Đóng")
+        btn_close.setProperty("secondary", True)
+        btn_close.clicked.connect(self.close)
+        buttons.addWidget(btn_reset)
+        buttons.addStretch(1)
+        if on_profile is not None:
+            btn_profile = QPushButton("Lấy profile")
+            btn_profile.setProperty("secondary", True)
+            btn_profile.clicked.connect(on_profile)
+            buttons.addWidget(btn_profile)
+        buttons.addWidget(btn_export)
+        buttons.addWidget(btn_close)
+        root.addLayout(buttons)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.timer.start(REFRESH_MS)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        rows = metrics.METRICS.snapshot()
+        self.table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            self.table.setItem(r, 0, QTableWidgetItem(row["stage"]))
+            for c, key in enumerate(FIELDS, start=1):
+                value = row[key]
+                item = QTableWidgetItem(str(value) if key == "count" else f"{value:.1f}")
+                item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(r, c, item)
+        if self._extra_stats is not None:
+            try:
+                self.lb_extra.setText(" · ".join(f"{k}: {v}" for k, v in self._extra_stats()))
+            except Exception as e:
+                self.lb_extra.setText(f"Lỗi đọc thống kê: {e}")
+
+    def _reset(self):
+        metrics.METRICS.reset()
+        self.refresh()
+
+    def _export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Xuất Prometheus", "spms_metrics.prom",
+                                              "Prometheus text (*.prom *.txt)")
+        if not path:
+            return
+        try:
+            metrics.METRICS.write_prometheus(path)
+        except OSError as e:
+            QMessageBox.warning(self, "Lỗi", f"Không ghi được file:\n{e}")
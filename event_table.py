@@ -0,0 +1,181 @@
+# event_table.py
+# Model/delegate cho bảng lịch sử trong AdminWindow.
+# - EventTableModel: nạp dần từng trang từ DB (keyset theo id, QTableView gọi fetchMore khi cuộn tới cuối)
+# - ThumbnailDelegate: vẽ thumbnail ảnh mặt/biển (thumbnails.py), chỉ cho các ô đang hiển thị
+
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QRect, QSize
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyle
+
+import db
+from thumbnails import thumbnail_cache
+
+# Column mapping (Thời gian Vào / Ra)
+COLUMNS = [
+    ("id", "ID"),
+    ("plate_text", "Biển"),
+    ("status", "Trạng thái"),
+    ("time_in", "Thời gian Vào"),
+    ("time_out", "Thời gian Ra"),
+    ("face_image_path", "Ảnh mặt"),
+    ("plate_image_path", "Ảnh biển"),
+]
+IMAGE_COLUMNS = ("face_image_path", "plate_image_path")
+PathRole = Qt.ItemDataRole.UserRole  # đường dẫn ảnh của ô thumbnail
+
+
+class EventTableModel(QAbstractTableModel):
+    """
+    Bảng events theo bộ lọc hiện tại, nạp theo trang page_size dòng.
+    Danh sách thường: keyset theo id giảm dần. Tìm kiếm FTS (xếp theo độ khớp): lấy trước
+    danh sách id đã xếp hạng rồi nạp dòng theo từng đoạn id.
+    """
+
+    def __init__(self, parent=None, page_size=db.PAGE_SIZE):
+        super().__init__(parent)
+        self.page_size = int(page_size)
+        self._filter = {}
+        self._rows = []
+        self._ranked_ids = None
+        self._exhausted = True
+
+    # ---------- query ----------
+    def set_filter(self, search_text="", status_filter=None, date_from=None, date_to=None, fuzzy=False):
+        self._filter = {"search_text": search_text, "status_filter": status_filter,
+                        "date_from": date_from, "date_to": date_to, "fuzzy": fuzzy}
+        self.refresh()
+
+    def filter(self):
+        return dict(self._filter)
+
+    def refresh(self):
+        """Chạy lại bộ lọc hiện tại từ đầu (sau khi xoá/sửa/thêm)."""
+        self.beginResetModel()
+        self._rows = []
+        self._ranked_ids = None
+        self._exhausted = False
+        f = self._filter
+        if db.is_ranked_search(f.get("search_text", ""), f.get("fuzzy", False)):
+            self._ranked_ids = db.query_event_ids(**f)
+        self._rows = self._next_page()
+        self.endResetModel()
+
+    def _next_page(self):
+        if self._ranked_ids is not None:
+            start = len(self._rows)
+            ids = self._ranked_ids[start:start + self.page_size]
+            rows = db.get_events_by_ids(ids)
+            if start + len(ids) >= len(self._ranked_ids):
+                self._exhausted = True
+            return rows
+        before_id = self._rows[-1][0] if self._rows else None
+        rows = db.page_events(before_id=before_id, limit=self.page_size, **self._filter)
+        if len(rows) < self.page_size:
+            self._exhausted = True
+        return rows
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        rows = self._next_page()
+        if not rows:
+            self._exhausted = True
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    def has_more(self):
+        return not self._exhausted
+
+    # ---------- access ----------
+    def event_at(self, row):
+        if 0 <= row < len(self._rows):
+            return dict(zip(db.EVENT_COLUMNS, self._rows[row]))
+        return None
+
+    def id_at(self, row):
+        if 0 <= row < len(self._rows):
+            return self._rows[row][0]
+        return None
+
+    # ---------- Qt model API ----------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return COLUMNS[section][1]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        val = self._rows[index.row()][index.column()]
+        col_name = COLUMNS[index.column()][0]
+        if col_name in IMAGE_COLUMNS:
+            if role == PathRole:
+                return val or ""
+            if role == Qt.ItemDataRole.ToolTipRole:
+                return val or None
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return str(val) if val is not None else ""
+        if role == Qt.ItemDataRole.TextAlignmentRole and col_name in ("id", "status"):
+            return Qt.AlignmentFlag.AlignCenter
+        return None
+
+
+class ThumbnailDelegate(QStyledItemDelegate):
+    """
+    Vẽ thumbnail cho cột ảnh; QTableView chỉ gọi paint cho ô đang hiển thị.
+    Ảnh lấy từ ThumbnailCache (giải mã nền) — chưa có thì vẽ chỗ trống, có rồi thì vẽ lại viewport.
+    """
+
+    def __init__(self, thumb_w, thumb_h, view, cache=None):
+        super().__init__(view)
+        self.thumb_w = thumb_w
+        self.thumb_h = thumb_h
+        self.view = view
+        self.cache = cache or thumbnail_cache()
+        self.cache.ready.connect(self._on_ready)
+
+    def _on_ready(self, path, w, h):
+        if (w, h) == (self.thumb_w, self.thumb_h):
+            self.view.viewport().update()
+
+    def paint(self, painter, option, index):
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        box = QRect(0, 0, self.thumb_w, self.thumb_h)
+        box.moveCenter(option.rect.center())
+        painter.save()
+        painter.fillRect(box, QColor("#0f1112"))
+        path = index.data(PathRole)
+        text = "-"
+        if path:
+            # file chưa / không tồn tại do job giải mã phát hiện, không stat trên GUI thread
+            img = self.cache.get(path, self.thumb_w, self.thumb_h)
+            if img is None:
+                text = "..."
+            elif not img.isNull():
+                target = QRect(0, 0, img.width(), img.height())
+                target.moveCenter(box.center())
+                painter.drawImage(target, img)
+                text = None
+            elif not self.cache.missing(path, self.thumb_w, self.thumb_h):
+                text = "lỗi"
+        if text:
+            painter.setPen(QColor("#9aa4ad"))
+            painter.drawText(box, Qt.AlignmentFlag.AlignCenter, text)
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        return QSize(self.thumb_w + 20, self.thumb_h + 12)
@@ -0,0 +1,142 @@
+# export.py
+# Xuất lịch sử Vào/Ra thẳng từ DB (đọc cursor theo lô, không nạp hết vào bộ nhớ).
+# Định dạng theo đuôi file: .csv, .csv.gz, .parquet (cần pyarrow).
+# Dùng trong AdminWindow (chạy trên QThread) hoặc từ dòng lệnh cho báo cáo tháng:
+#   python export.py bao_cao_10.csv.gz --from 2026-10-01 --to 2026-10-31
+
+import os
+import sys
+import csv
+import gzip
+import argparse
+import importlib.util
+
+import db
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+BATCH_SIZE = 2000
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def format_for_path(path):
+    p = path.lower()
+    if p.endswith(".csv.gz"):
+        return "csv.gz"
+    if p.endswith(".parquet"):
+        return "parquet"
+    return "csv"
+
+
+def count_events(conn, **filters):
+    sql, params = db.build_event_query(**filters)
+    return conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+
+
+def _iter_batches(cur, batch_size):
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def _write_csv(f, header, batches, on_batch):
+    writer = csv.writer(f)
+    writer.writerow(header)
+    for rows in batches:
+        writer.writerows([["" if v is None else v for v in row] for row in rows])
+        on_batch(len(rows))
+
+
+def _write_parquet(path, header, batches, on_batch):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    fields = [pa.field(name, pa.int64() if col == "id" else pa.string())
+              for name, col in zip(header, db.EVENT_COLUMNS)]
+    schema = pa.schema(fields)
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for rows in batches:
+            cols = list(zip(*rows))
+            writer.write_batch(pa.record_batch([pa.array(c, type=f.type) for c, f in zip(cols, fields)], schema=schema))
+            on_batch(len(rows))
+
+
+def export_events(path, filters=None, header=None, progress=None, is_cancelled=None, batch_size=BATCH_SIZE):
+    """
+    Ghi các event khớp filters (tham số của db.build_event_query) ra path.
+    progress(done, total) được gọi sau mỗi lô; is_cancelled() trả True -> dừng, xoá file dở
+    và ném ExportCancelled. Ghi ra file tạm rồi đổi tên nên không để lại file hỏng. Trả số dòng.
+    """
+    filters = dict(filters or {})
+    header = list(header or db.EVENT_COLUMNS)
+    fmt = format_for_path(path)
+    if fmt == "parquet" and not HAS_PYARROW:
+        raise RuntimeError("Xuất Parquet cần cài pyarrow")
+
+    # kết nối riêng: hàm này thường chạy trên thread nền
+    conn = db.connect()
+    tmp = path + ".part"
+    done = 0
+    try:
+        total = count_events(conn, **filters)
+        sql, params = db.build_event_query(**filters)
+        cur = conn.execute(sql, params)
+
+        def on_batch(n):
+            nonlocal done
+            done += n
+            if progress:
+                progress(done, total)
+            if is_cancelled and is_cancelled():
+                raise ExportCancelled()
+
+        if progress:
+            progress(0, total)
+        batches = _iter_batches(cur, batch_size)
+        if fmt == "parquet":
+            _write_parquet(tmp, header, batches, on_batch)
+        elif fmt == "csv.gz":
+            with gzip.open(tmp, "wt", newline="", encoding="utf-8") as f:
+                _write_csv(f, header, batches, on_batch)
+        else:
+            with open(tmp, "w", newline="", encoding="utf-8") as f:
+                _write_csv(f, header, batches, on_batch)
+        os.replace(tmp, path)
+        return done
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except Exception:
+            pass
+        raise
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Xuất lịch sử Vào/Ra (csv, csv.gz, parquet)")
+    parser.add_argument("output", help="file xuất; định dạng theo đuôi .csv / .csv.gz / .parquet")
+    parser.add_argument("--search", default="", help="lọc theo một phần biển số")
+    parser.add_argument("--fuzzy", action="store_true", help="tìm gần đúng (0/D, 8/B, ...)")
+    parser.add_argument("--status", choices=["Vào", "Ra"], default=None)
+    parser.add_argument("--from", dest="date_from", default=None, help="YYYY-mm-dd")
+    parser.add_argument("--to", dest="date_to", default=None, help="YYYY-mm-dd")
+    args = parser.parse_args(argv)
+
+    db.init_db()
+    filters = {"search_text": args.search, "status_filter": args.status, "fuzzy": args.fuzzy,
+               "date_from": args.date_from, "date_to": args.date_to}
+
+    def progress(done, total):
+        print(f"\r{done}/{total}", end="", flush=True)
+
+    n = export_events(args.output, filters, progress=progress)
+    print(f"\nĐã xuất {n} dòng sang {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+# face_worker.py
+# Pool process InsightFace dùng chung cho nhiều làn (lane) trên cùng một máy trạm.
+# - Mỗi worker nạp model đúng 1 lần, số worker tính theo số CPU
+# - Khung hình gửi vào được gắn lane_id để trả kết quả về đúng làn
+# - Mỗi làn chỉ có tối đa 1 khung đang xử lý (khung cũ bị bỏ qua, giống queue maxsize=1 trước đây)
+
+import os
+import time
+import queue
+import multiprocessing as mp
+
+import cv2
+import numpy as np
+
+import metrics
+import profiler
+
+# lane_id đặc biệt trong out_q: worker báo đã nạp model + warm-up xong
+READY_LANE = -1
+
+
+def cosine(a, b):
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-8))
+
+
+def load_face_db_embeddings(face_db_dir: str):
+    ids, embs = [], []
+    if not os.path.isdir(face_db_dir):
+        return ids, embs
+    for f in os.listdir(face_db_dir):
+        if f.endswith(".npy"):
+            try:
+                ids.append(f.replace(".npy", ""))
+                embs.append(np.load(os.path.join(face_db_dir, f)))
+            except Exception:
+                pass
+    return ids, embs
+
+
+def default_worker_count(n_lanes):
+    """Số worker mặc định: không quá số làn, không quá nửa số CPU (mỗi worker chạy 1 luồng)."""
+    cpus = os.cpu_count() or 2
+    return max(1, min(int(n_lanes), cpus // 2))
+
+
+# ------------------- Face Process (InsightFace isolated) -------------------
+def face_process_main(in_q: mp.Queue, out_q: mp.Queue,
+                      face_db_dir: str,
+                      det_size=(320, 320),
+                      det_scale=0.5,
+                      sim_threshold=0.5,
+                      profile_trigger=None):
+    """
+    Vòng lặp worker. Nhận (lane_id, seq, frame) từ in_q, trả (lane_id, result) vào out_q;
+    result["seq"] là seq của khung đã xử lý. None -> dừng worker.
+    Sau khi nạp model và chạy thử gửi (READY_LANE, {"ok": bool, "err": str, "load_s": float}).
+    """
+    profiler.watch(profile_trigger, "face")
+    t0 = time.perf_counter()
+    try:
+        from insightface.app import FaceAnalysis
+    except Exception as e:
+        err = f"insightface import fail: {e}"
+    else:
+        try:
+            app = FaceAnalysis(name="buffalo_s", providers=["CPUExecutionProvider"])
+            app.prepare(ctx_id=0, det_size=det_size)
+            err = None
+        except Exception as e:
+            err = f"insightface load fail: {e}"
+    if err is not None:
+        # báo READY lỗi để FacePool đánh dấu hỏng, rồi trả lỗi cho mọi khung tới khi bị dừng
+        out_q.put((READY_LANE, {"ok": False, "err": err, "load_s": time.perf_counter() - t0}))
+        while True:
+            item = in_q.get()
+            if item is None:
+                break
+            lane_id, seq, _ = item
+            out_q.put((lane_id, {"bbox": None, "label": None, "seq": seq, "err": err}))
+        return
+
+    ids, embs = load_face_db_embeddings(face_db_dir)
+    try:
+        # warm-up: khung giả cùng kích thước với khung thật sau khi thu nhỏ
+        app.get(np.zeros((int(480 * det_scale), int(640 * det_scale), 3), dtype=np.uint8))
+    except Exception:
+        pass
+    out_q.put((READY_LANE, {"ok": True, "err": None, "load_s": time.perf_counter() - t0}))
+
+    while True:
+        item = in_q.get()
+        if item is None:
+            break
+        lane_id, seq, frame = item
+        timings = {}
+        try:
+            h0, w0 = frame.shape[:2]
+            s = det_scale
+            if s <= 0 or s > 1:
+                s = 0.5
+            small = cv2.resize(frame, (int(w0 * s), int(h0 * s)), interpolation=cv2.INTER_LINEAR)
+            t0 = time.perf_counter()
+            faces = app.get(small)
+            metrics.add_timing(timings, "face_detect_embed", t0)
+            if not faces:
+                out_q.put((lane_id, {"bbox": None, "label": None, "seq": seq, "timings": timings}))
+                continue
+            face = max(faces, key=lambda f: (f.bbox[2]-f.bbox[0])*(f.bbox[3]-f.bbox[1]))
+            emb = face.normed_embedding
+            x1, y1, x2, y2 = face.bbox.astype(float)
+            inv = 1.0 / s
+            x1 = int(x1 * inv); y1 = int(y1 * inv); x2 = int(x2 * inv); y2 = int(y2 * inv)
+            x1 = max(0, min(w0 - 1, x1))
+            y1 = max(0, min(h0 - 1, y1))
+            x2 = max(0, min(w0, x2))
+            y2 = max(0, min(h0, y2))
+            bbox = (x1, y1, x2 - x1, y2 - y1)
+            label = "UNKNOWN"
+            t0 = time.perf_counter()
+            best_id, best_score = None, 0.0
+            for sid, semb in zip(ids, embs):
+                sscore = cosine(emb, semb)
+                if sscore > best_score:
+                    best_score, best_id = sscore, sid
+            metrics.add_timing(timings, "face_match", t0)
+            if best_id is not None and best_score >= sim_threshold:
+                label = f"ID {best_id}"
+            out_q.put((lane_id, {"bbox": bbox, "label": label, "seq": seq, "timings": timings}))
+        except Exception:
+            out_q.put((lane_id, {"bbox": None, "label": None, "seq": seq}))
+
+
+class FacePool:
+    """
+    Pool các process nhận diện mặt dùng chung cho N làn.
+
+    submit() không bao giờ chặn GUI: nếu làn đó còn khung đang xử lý hoặc hàng đợi đầy
+    thì khung mới bị bỏ qua. poll() gom kết quả mới nhất theo từng làn.
+    """
+
+    def __init__(self, face_db_dir, n_workers=1, det_size=(320, 320), det_scale=0.5,
+                 sim_threshold=0.5, stale_after=5.0, profile_trigger=None):
+        self.face_db_dir = face_db_dir
+        self.n_workers = max(1, int(n_workers))
+        self.det_size = det_size
+        self.det_scale = det_scale
+        self.sim_threshold = sim_threshold
+        # sau stale_after giây không có kết quả (worker chết/treo) thì cho phép gửi lại
+        self.stale_after = float(stale_after)
+        self.profile_trigger = profile_trigger
+        self._in_q = None
+        self._out_q = None
+        self._procs = []
+        self._inflight = {}  # lane_id -> thời điểm gửi
+        self.ready_count = 0
+        self.load_error = None
+        self.load_seconds = None
+
+    def start(self):
+        ctx = mp.get_context("spawn")
+        self._in_q = ctx.Queue(maxsize=self.n_workers * 2)
+        self._out_q = ctx.Queue()
+        for _ in range(self.n_workers):
+            p = ctx.Process(
+                target=face_process_main,
+                args=(self._in_q, self._out_q, self.face_db_dir, self.det_size,
+                      self.det_scale, self.sim_threshold, self.profile_trigger),
+                daemon=True
+            )
+            p.start()
+            self._procs.append(p)
+        return self
+
+    @property
+    def ready(self):
+        """True khi có ít nhất 1 worker đã nạp model và warm-up xong (cập nhật trong poll())."""
+        return self.ready_count > 0
+
+    @property
+    def failed(self):
+        return self.ready_count == 0 and self.load_error is not None
+
+    def submit(self, lane_id, frame, seq=None):
+        """Gửi khung của một làn (seq: số thứ tự khung trong bộ đệm). Trả False nếu khung bị bỏ qua."""
+        if self._in_q is None or frame is None:
+            return False
+        now = time.time()
+        sent = self._inflight.get(lane_id)
+        if sent is not None and now - sent < self.stale_after:
+            return False
+        try:
+            self._in_q.put_nowait((lane_id, seq, frame))
+        except queue.Full:
+            return False
+        except Exception:
+            return False
+        self._inflight[lane_id] = now
+        return True
+
+    def poll(self):
+        """Lấy hết kết quả đang chờ. Trả dict lane_id -> kết quả mới nhất."""
+        latest = {}
+        if self._out_q is None:
+            return latest
+        while True:
+            try:
+                lane_id, res = self._out_q.get_nowait()
+            except queue.Empty:
+                break
+            except Exception:
+                break
+            if lane_id == READY_LANE:
+                if res.get("ok"):
+                    self.ready_count += 1
+                    if self.load_seconds is None:
+                        self.load_seconds = res.get("load_s")
+                else:
+                    self.load_error = res.get("err")
+                continue
+            sent = self._inflight.pop(lane_id, None)
+            metrics.observe_many(res.get("timings"))
+            if sent is not None:
+                metrics.observe("face_roundtrip", time.time() - sent)
+            latest[lane_id] = res
+        return latest
+
+    def stop(self):
+        for _ in self._procs:
+            try:
+                self._in_q.put_nowait(None)
+            except Exception:
+                pass
+        for p in self._procs:
+            try:
+                p.join(0.5)
+                if p.is_alive():
+                    p.terminate()
+            except Exception:
+                pass
+        self._procs = []
+        self._inflight.clear()
@@ -0,0 +1,75 @@
+# frame_buffer.py
+# Bộ đệm vòng các khung hình gần nhất của 1 camera, kèm điểm độ nét.
+# Khi bấm chụp, lấy khung nét nhất trong ~1-2 giây vừa qua (ưu tiên khung mà
+# detector đã thấy mặt/biển) thay vì khung cuối cùng thường bị nhòe do chuyển động.
+
+import time
+from collections import deque
+
+import cv2
+
+SHARPNESS_WIDTH = 160  # tính độ nét trên ảnh thu nhỏ cho rẻ
+
+
+def sharpness(frame, width=SHARPNESS_WIDTH):
+    """Phương sai Laplacian trên bản xám thu nhỏ: càng lớn càng nét."""
+    if frame is None or frame.size == 0:
+        return 0.0
+    h, w = frame.shape[:2]
+    if w > width:
+        frame = cv2.resize(frame, (width, max(1, int(h * width / w))), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+class FrameRingBuffer:
+    """
+    Giữ tối đa max_frames khung trong cửa sổ seconds giây.
+    Mỗi entry: {"seq", "t", "frame", "score", "det"} — det là dict kết quả detector (hoặc None).
+    """
+
+    def __init__(self, seconds=1.5, max_frames=24):
+        self.seconds = float(seconds)
+        self._buf = deque(maxlen=max(1, int(max_frames)))
+        self._seq = 0
+
+    def push(self, frame, score, t=None):
+        """Thêm khung mới, trả seq để gắn kết quả detector về sau."""
+        self._seq += 1
+        self._buf.append({"seq": self._seq, "t": t if t is not None else time.time(),
+                          "frame": frame, "score": float(score), "det": None})
+        return self._seq
+
+    def latest(self):
+        return self._buf[-1] if self._buf else None
+
+    def mark_detection(self, seq, det):
+        """Gắn kết quả detector cho khung seq (nếu khung còn trong bộ đệm)."""
+        for entry in reversed(self._buf):
+            if entry["seq"] == seq:
+                entry["det"] = det
+                return True
+            if entry["seq"] < seq:
+                break
+        return False
+
+    def best(self, prefer_detection=True, now=None):
+        """
+        Khung nét nhất trong cửa sổ thời gian. Nếu prefer_detection và có khung đã
+        được detector xác nhận thì chỉ chọn trong các khung đó.
+        """
+        now = now if now is not None else time.time()
+        recent = [e for e in self._buf if now - e["t"] <= self.seconds]
+        if not recent:
+            return None
+        if prefer_detection:
+            detected = [e for e in recent if e["det"]]
+            if detected:
+                recent = detected
+        return max(recent, key=lambda e: e["score"])
+
+    def clear(self):
+        self._buf.clear()
+
+    def __len__(self):
+        return len(self._buf)
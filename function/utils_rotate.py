@@ -2,6 +2,15 @@ import numpy as np
 import math
 import cv2
 
+# "projection": ước lượng góc bằng projection profile trên mặt nạ ký tự của crop đã thu nhỏ (nhanh);
+# "hough": Canny + HoughLinesP trên crop gốc (cách cũ, giữ để so sánh: benchmarks/skew_bench.py)
+SKEW_METHOD = "projection"
+SKEW_MAX_WIDTH = 128       # crop rộng hơn được thu nhỏ về chiều rộng này trước khi ước lượng
+SKEW_MAX_ANGLE = 24.0      # độ, tìm góc trong [-SKEW_MAX_ANGLE, SKEW_MAX_ANGLE]
+SKEW_STEPS = (2.0, 0.5, 0.1)  # dò thô rồi tinh dần quanh góc tốt nhất của bước trước
+SKEW_MIN_ANGLE = 0.3       # |góc| nhỏ hơn -> deskew trả nguyên ảnh, không warpAffine
+SKEW_TOP_MARGIN = 0.1      # center_thres=1: bỏ phần sát mép trên (tỉ lệ chiều cao, viền biển), như bản Hough
+
 def changeContrast(img):
     lab= cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
     l_channel, a, b = cv2.split(lab)
@@ -17,7 +26,69 @@ def rotate_image(image, angle):
     result = cv2.warpAffine(image, rot_mat, image.shape[1::-1], flags=cv2.INTER_LINEAR)
     return result
 
+def _char_mask(mask):
+    # chỉ giữ thành phần liên thông cỡ ký tự: bỏ nền góc ảnh, viền biển, vết bẩn nhỏ
+    h, w = mask.shape[:2]
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    x, y, cw, ch, area = (stats[:, i] for i in range(5))
+    keep = ((ch >= 0.15 * h) & (ch <= 0.95 * h) & (cw <= 0.4 * w) & (area >= 8)
+            & (x > 0) & (y > 0) & (x + cw < w) & (y + ch < h))
+    keep[0] = False
+    return keep[labels], int(keep.sum())
+
+def _shrink(img):
+    h, w = img.shape[:2]
+    if w <= SKEW_MAX_WIDTH:
+        return img
+    scale = SKEW_MAX_WIDTH / float(w)
+    return cv2.resize(img, (SKEW_MAX_WIDTH, max(1, int(round(h * scale)))), interpolation=cv2.INTER_AREA)
+
+def _text_points(src_img, center_thres):
+    # toạ độ (x, y) các pixel ký tự trên ảnh thu nhỏ; thử cả chữ tối trên nền sáng lẫn chữ sáng
+    # trên nền tối (biển xanh), lấy cực tính cho nhiều thành phần cỡ ký tự hơn
+    gray = _shrink(src_img)
+    if gray.ndim == 3:
+        gray = cv2.cvtColor(gray, cv2.COLOR_BGR2GRAY)
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    chars, count = _char_mask(mask)
+    inv_chars, inv_count = _char_mask(cv2.bitwise_not(mask))
+    if inv_count > count:
+        chars = inv_chars
+    if center_thres == 1:
+        chars[:int(math.ceil(SKEW_TOP_MARGIN * chars.shape[0]))] = False
+    ys, xs = np.nonzero(chars)
+    return xs.astype(np.float32), ys.astype(np.float32)
+
+def _profile_scores(xs, ys, angles_deg):
+    # độ "sắc" của projection profile theo từng góc: tổng bình phương chênh lệch số pixel giữa 2 dòng
+    # liền kề sau khi xoay (mép dòng chữ rõ nhất ở góc đúng; không thiên về 0° như tổng bình phương
+    # thuần khi crop rộng và thấp). Tính cho mọi góc bằng 1 lần bincount.
+    rad = np.deg2rad(np.asarray(angles_deg, dtype=np.float32))
+    proj = ys[None, :] * np.cos(rad)[:, None] - xs[None, :] * np.sin(rad)[:, None]
+    rows = np.rint(proj).astype(np.int64)
+    rows -= rows.min()
+    span = int(rows.max()) + 1
+    rows += np.arange(len(rad), dtype=np.int64)[:, None] * span
+    hist = np.bincount(rows.ravel(), minlength=len(rad) * span).reshape(len(rad), span)
+    return (np.diff(hist.astype(np.float64), axis=1) ** 2).sum(axis=1)
+
+def compute_skew_projection(src_img, center_thres):
+    xs, ys = _text_points(src_img, center_thres)
+    if len(xs) < 20:
+        return 0.0
+    best, radius = 0.0, SKEW_MAX_ANGLE
+    for step in SKEW_STEPS:
+        angles = best + np.arange(-radius, radius + 1e-6, step)
+        best = float(angles[int(np.argmax(_profile_scores(xs, ys, angles)))])
+        radius = step
+    return round(best, 2)
+
 def compute_skew(src_img, center_thres):
+    if SKEW_METHOD == "hough":
+        return compute_skew_hough(src_img, center_thres)
+    return compute_skew_projection(src_img, center_thres)
+
+def compute_skew_hough(src_img, center_thres):
     if len(src_img.shape) == 3:
         h, w, _ = src_img.shape
     elif len(src_img.shape) == 2:
@@ -29,6 +100,8 @@ def compute_skew(src_img, center_thres):
     lines = cv2.HoughLinesP(edges, 1, math.pi/180, 30, minLineLength=w / 1.5, maxLineGap=h/3.0)
     if lines is None:
         return 1
+    # OpenCV mới trả (N, 4) thay vì (N, 1, 4)
+    lines = lines.reshape(-1, 1, 4)
 
     min_line = 100
     min_line_pos = 0
@@ -54,9 +127,20 @@ def compute_skew(src_img, center_thres):
         return 0.0
     return (angle / cnt)*180/math.pi
 
-def deskew(src_img, change_cons, center_thres):
+def skew_angle(src_img, change_cons, center_thres):
+    # góc deskew của biến thể (change_cons, center_thres); bản projection thu nhỏ crop trước rồi mới
+    # tăng tương phản (CLAHE trên ảnh nhỏ rẻ hơn nhiều, kết quả ước lượng không đổi đáng kể)
+    if SKEW_METHOD == "hough":
+        img = changeContrast(src_img) if change_cons == 1 else src_img
+        return compute_skew_hough(img, center_thres)
+    img = _shrink(src_img)
     if change_cons == 1:
-        return rotate_image(src_img, compute_skew(changeContrast(src_img), center_thres))
-    else:
-        return rotate_image(src_img, compute_skew(src_img, center_thres))
+        img = changeContrast(img)
+    return compute_skew_projection(img, center_thres)
+
+def deskew(src_img, change_cons, center_thres):
+    angle = skew_angle(src_img, change_cons, center_thres)
+    if abs(angle) < SKEW_MIN_ANGLE:
+        return src_img
+    return rotate_image(src_img, angle)
 
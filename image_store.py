@@ -0,0 +1,205 @@
+# image_store.py
+# Lưu ảnh chụp kiểu write-behind: save() trả đường dẫn cuối cùng ngay lập tức,
+# việc mã hoá JPEG + ghi đĩa chạy trên thread pool nền (thẻ SD chậm không làm đứng GUI).
+# - Ghi ra file tạm rồi os.replace -> không ai đọc được file ghi dở
+# - peek(path): lấy ảnh (numpy) khi file chưa kịp ghi xong, để GUI hiển thị ngay
+# - flush() khi tắt ứng dụng; stats() trả độ sâu hàng đợi và độ trễ ghi
+# - Ghi kèm thumbnail nhỏ vào thư mục thumbs/ cạnh ảnh gốc (xem thumbnails.py)
+
+import os
+import time
+import datetime
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import metrics
+
+# cv2 chỉ import khi mã hoá ảnh (trên thread ghi): màn quản trị chỉ cần đường dẫn/thumbnail
+# nên không phải trả chi phí nạp cv2 + numpy lúc khởi động.
+
+THUMB_DIR = "thumbs"
+THUMB_SIZE = (320, 240)  # khung tối đa của thumbnail lưu trên đĩa (giữ tỉ lệ)
+THUMB_QUALITY = 85
+
+
+def thumb_path_for(path):
+    """<thư mục ảnh>/thumbs/<tên ảnh> — thumbnail của một ảnh gốc."""
+    folder, name = os.path.split(path)
+    return os.path.join(folder, THUMB_DIR, name)
+
+
+def _write_atomic(path, buf):
+    tmp = path + ".part"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(buf)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except Exception:
+            pass
+        raise
+
+
+def write_thumbnail(path, img_bgr, size=THUMB_SIZE, quality=THUMB_QUALITY):
+    """Thu nhỏ img_bgr vào khung size và ghi thumbnail của path. Trả đường dẫn thumbnail."""
+    import cv2
+    h, w = img_bgr.shape[:2]
+    scale = min(1.0, size[0] / float(w), size[1] / float(h))
+    if scale < 1.0:
+        img_bgr = cv2.resize(img_bgr, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", img_bgr, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        raise ValueError("JPEG encode failed")
+    tpath = thumb_path_for(path)
+    os.makedirs(os.path.dirname(tpath), exist_ok=True)
+    _write_atomic(tpath, buf.tobytes())
+    return tpath
+
+
+def remove_image_files(paths):
+    """Xoá ảnh gốc + thumbnail. Trả số ảnh gốc đã xoá."""
+    removed = 0
+    for path in paths:
+        for p in (path, thumb_path_for(path)):
+            try:
+                os.remove(p)
+                if p == path:
+                    removed += 1
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print("Image remove failed:", p, e)
+    return removed
+
+
+def find_orphan_images(root_dir, referenced, min_age_s=86400):
+    """
+    Ảnh .jpg dưới root_dir không có trong referenced (tập đường dẫn từ DB) và cũ hơn min_age_s
+    (ảnh mới có thể đang chờ ghép cặp, chưa có event).
+    """
+    refs = {os.path.abspath(p) for p in referenced}
+    cutoff = time.time() - float(min_age_s)
+    orphans = []
+    for folder, dirs, files in os.walk(root_dir):
+        dirs[:] = [d for d in dirs if d != THUMB_DIR]
+        for name in files:
+            if not name.lower().endswith(".jpg"):
+                continue
+            path = os.path.join(folder, name)
+            try:
+                if os.path.abspath(path) not in refs and os.path.getmtime(path) < cutoff:
+                    orphans.append(path)
+            except OSError:
+                pass
+    return orphans
+
+
+def _subdir_for(prefix):
+    if prefix.startswith("plate"):
+        return "plate"
+    if prefix.startswith("face_full"):
+        return "fullface"
+    if prefix.startswith("face"):
+        return "face"
+    return "other"
+
+
+class ImageStore:
+    def __init__(self, root_dir, max_workers=2, jpeg_quality=95, latency_window=200, thumbnails=True):
+        self.root_dir = root_dir
+        self.jpeg_quality = int(jpeg_quality)
+        self.thumbnails = bool(thumbnails)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="image-store")
+        self._lock = threading.Lock()
+        self._pending = {}  # path -> (img, future)
+        self._dirs = set()
+        self._latencies = deque(maxlen=latency_window)  # giây, từ lúc save() tới lúc file sẵn sàng
+        self.written = 0
+        self.failed = 0
+
+    def path_for(self, prefix="capture"):
+        ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        save_dir = os.path.join(self.root_dir, _subdir_for(prefix))
+        if save_dir not in self._dirs:
+            os.makedirs(save_dir, exist_ok=True)
+            self._dirs.add(save_dir)
+        return os.path.join(save_dir, f"{prefix}_{ts}.jpg")
+
+    def save(self, img_bgr, prefix="capture"):
+        """Xếp ảnh vào hàng đợi ghi, trả ngay đường dẫn file sẽ được tạo."""
+        t0 = time.perf_counter()
+        path = self.path_for(prefix)
+        with self._lock:
+            fut = self._pool.submit(self._write, path, img_bgr, time.perf_counter())
+            self._pending[path] = (img_bgr, fut)
+        metrics.observe("image_save", time.perf_counter() - t0)
+        return path
+
+    def _write(self, path, img_bgr, t_submit):
+        import cv2
+        try:
+            t0 = time.perf_counter()
+            ok, buf = cv2.imencode(".jpg", img_bgr, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                raise ValueError("JPEG encode failed")
+            metrics.observe("image_encode", time.perf_counter() - t0)
+            # thumbnail ghi trước: khi ảnh gốc xuất hiện thì thumbnail đã sẵn sàng
+            if self.thumbnails:
+                try:
+                    with metrics.span("image_thumbnail"):
+                        write_thumbnail(path, img_bgr)
+                except Exception as e:
+                    print("Thumbnail write failed:", path, e)
+            with metrics.span("image_write"):
+                _write_atomic(path, buf.tobytes())
+            latency = time.perf_counter() - t_submit
+            metrics.observe("image_latency", latency)
+            with self._lock:
+                self.written += 1
+                self._latencies.append(latency)
+        except Exception as e:
+            print("Image write failed:", path, e)
+            with self._lock:
+                self.failed += 1
+        finally:
+            with self._lock:
+                self._pending.pop(path, None)
+
+    def peek(self, path):
+        """Ảnh numpy của file đang chờ ghi, hoặc None nếu đã ghi xong / không thuộc store."""
+        with self._lock:
+            item = self._pending.get(path)
+        return item[0] if item else None
+
+    def queue_depth(self):
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self):
+        with self._lock:
+            lat = sorted(self._latencies)
+            depth = len(self._pending)
+            written, failed = self.written, self.failed
+        res = {"queue_depth": depth, "written": written, "failed": failed,
+               "latency_avg_ms": None, "latency_p95_ms": None, "latency_max_ms": None}
+        if lat:
+            res["latency_avg_ms"] = 1000.0 * sum(lat) / len(lat)
+            res["latency_p95_ms"] = 1000.0 * lat[min(len(lat) - 1, int(0.95 * len(lat)))]
+            res["latency_max_ms"] = 1000.0 * lat[-1]
+        return res
+
+    def flush(self, timeout=None):
+        """Chờ tất cả ảnh đang xếp hàng được ghi. Trả True nếu đã ghi hết."""
+        with self._lock:
+            futures = [f for _, f in self._pending.values()]
+        if not futures:
+            return True
+        _, not_done = wait(futures, timeout=timeout)
+        return not not_done
+
+    def shutdown(self, timeout=None):
+        self.flush(timeout)
+        self._pool.shutdown(wait=False)
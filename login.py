@@ -1,6 +1,8 @@
 # login.py
 # Nếu không có tham số dòng lệnh -> khởi GUI từ login_modern.py
 # Nếu có tham số -> chạy CLI yêu cầu -i/--image
+#   python login.py -i anh.jpg                  # 1 ảnh (lp_image, qua plate_daemon)
+#   python login.py batch result/plate -o out.jsonl [--workers 4 --resume]   # hàng loạt (lp_batch)
 
 import sys
 import argparse
@@ -19,11 +21,16 @@ def run_gui():
         sys.exit(1)
 
 def run_cli(argv):
-    parser = argparse.ArgumentParser(description="CLI mode: xử lý ảnh với -i/--image")
+    if argv and argv[0] == "batch":
+        import lp_batch
+        sys.exit(lp_batch.main(argv[1:]))
+    parser = argparse.ArgumentParser(description="CLI mode: xử lý ảnh với -i/--image (hàng loạt: login.py batch ...)")
     parser.add_argument("-i", "--image", required=True, help="Path to image")
+    parser.add_argument("--show", action="store_true", help="mở cửa sổ xem ảnh đã vẽ kết quả")
     args = parser.parse_args(argv)
-    # Thay bằng logic xử lý ảnh cũ của bạn
-    print("CLI mode, image:", args.image)
+    import lp_image
+    plates = lp_image.process_image(args.image, show=args.show)
+    print("Detected plates:", plates)
 
 if __name__ == "__main__":
     # Nếu chạy không có tham số -> mở GUI
@@ -6,14 +6,23 @@
 #  python login_modern.py
 
 import sys
-import traceback
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QLabel, QLineEdit,
     QPushButton, QVBoxLayout, QHBoxLayout, QMessageBox, QCheckBox,
     QFrame, QSpacerItem, QSizePolicy, QGraphicsDropShadowEffect
 )
 from PyQt6.QtGui import QFont, QCursor, QColor
-from PyQt6.QtCore import Qt, QPropertyAnimation, QEasingCurve
+from PyQt6.QtCore import Qt, QPropertyAnimation, QEasingCurve, QTimer
+
+import model_registry
+
+def _print_exc():
+    # traceback kéo theo linecache/tokenize; chỉ import khi thật sự có lỗi
+    import traceback
+    traceback.print_exc()
+
+
+MODEL_STATUS_MS = 300  # chu kỳ cập nhật trạng thái nạp model
 
 # Demo credentials (thay bằng auth thực trong production)
 VALID_CREDENTIALS = {
@@ -31,6 +40,10 @@ class ModernLoginWindow(QMainWindow):
         self._init_ui()
         self._apply_animations()
 
+        # nạp model + import GUI trong nền ngay khi màn đăng nhập hiện lên
+        self._model_timer = QTimer(self)
+        self._model_timer.timeout.connect(self._update_model_status)
+
     def _init_ui(self):
         central = QWidget()
         central_layout = QVBoxLayout()
@@ -117,6 +130,12 @@ class ModernLoginWindow(QMainWindow):
 
         card_layout.addLayout(btn_row)
 
+        # Trạng thái nạp model (chạy nền, không chặn đăng nhập)
+        self.model_status = QLabel("")
+        self.model_status.setObjectName("footer")
+        self.model_status.setAlignment(Qt.AlignmentFlag.AlignLeft)
+        card_layout.addWidget(self.model_status)
+
         # Center the card
         central_layout.addStretch()
         h = QHBoxLayout()
@@ -215,6 +234,30 @@ class ModernLoginWindow(QMainWindow):
         anim.start()
         self._fade_anim = anim
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        # lần đầu hoặc sau khi đăng xuất (pool cũ đã dừng cùng cửa sổ chính)
+        model_registry.registry().start()
+        self._update_model_status()
+        self._model_timer.start(MODEL_STATUS_MS)
+
+    def closeEvent(self, event):
+        # thoát từ màn đăng nhập: dừng các pool chưa có cửa sổ nào nhận
+        model_registry.registry().shutdown()
+        super().closeEvent(event)
+
+    def _update_model_status(self):
+        st = model_registry.registry().status()
+        names = {"plate": "Biển số", "face": "Khuôn mặt"}
+        marks = {model_registry.READY: "sẵn sàng", model_registry.LOADING: "đang nạp...",
+                 model_registry.ERROR: "lỗi", model_registry.OFF: "tắt"}
+        parts = [f"{names[k]}: {marks.get(st.get(k), '-')}" for k in ("plate", "face")]
+        self.model_status.setText("Model — " + " · ".join(parts) + f"  ({st['elapsed']:.0f}s)")
+        errors = [f"{k}: {v}" for k, v in st["errors"].items()]
+        self.model_status.setToolTip("\n".join(errors))
+        if model_registry.registry().is_settled():
+            self._model_timer.stop()
+
     def _toggle_show_password(self):
         if self.password_input.echoMode() == QLineEdit.EchoMode.Password:
             self.password_input.setEchoMode(QLineEdit.EchoMode.Normal)
@@ -246,10 +289,14 @@ class ModernLoginWindow(QMainWindow):
             target_module = "login_user_gui"
             target_class = "MainWindow"
 
+        reg = model_registry.registry()
+        if target_module != model_registry.GUI_MODULE:
+            reg.shutdown()  # màn admin không dùng model
         try:
-            module = __import__(target_module)
+            # thường đã được import sẵn trong nền từ lúc hiện màn đăng nhập
+            module = reg.module(target_module)
         except Exception as e:
-            traceback.print_exc()
+            _print_exc()
             QMessageBox.warning(self, "Lỗi import", f"Không thể import {target_module}.py:\n{e}")
             module = None
 
@@ -265,11 +312,12 @@ class ModernLoginWindow(QMainWindow):
                 main_win.setWindowTitle("Admin" if username.lower() == "admin" else "Trang người dùng")
                 main_win.show()
                 self._main_window_ref = main_win
+                self._model_timer.stop()
                 # ẩn login
                 self.hide()
                 return
             except Exception as e:
-                traceback.print_exc()
+                _print_exc()
                 QMessageBox.warning(self, "Lỗi mở GUI", f"Lỗi khi mở {target_class}:\n{e}")
 
         # Fallback: cửa sổ đơn giản
@@ -286,7 +334,7 @@ class ModernLoginWindow(QMainWindow):
             self._main_window_ref = main
             self.hide()
         except Exception as e:
-            traceback.print_exc()
+            _print_exc()
             QMessageBox.critical(self, "Lỗi", f"Không thể mở cửa sổ chính: {e}")
 
 if __name__ == "__main__":
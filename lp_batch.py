@@ -0,0 +1,280 @@
+# lp_batch.py
+# Đọc biển số hàng loạt, không giao diện: thư mục / glob -> JSON Lines hoặc CSV.
+# - Pool process (spawn); mỗi worker nạp YOLO detect + OCR đúng 1 lần trong initializer
+# - Ảnh được đẩy vào pool dạng stream, kết quả ghi ngay từng dòng (flush) kèm thời gian đọc/nhận diện
+# - --resume: bỏ qua các ảnh đã có trong file kết quả (chạy tiếp sau khi bị ngắt)
+#
+#   python lp_batch.py result/plate -o plate_v62.jsonl --workers 4
+#   python lp_batch.py "archive/2026-09-*/plate/*.jpg" -o out.csv --resume
+#   python login.py batch result/plate -o out.jsonl          # cùng lệnh qua login.py
+
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import argparse
+import multiprocessing as mp
+
+import plate_reader
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+CSV_FIELDS = ["path", "plates", "boxes", "read_ms", "infer_ms", "error", "worker"]
+# mỗi worker chạy 1 luồng native, song song hoá bằng số process
+NATIVE_THREAD_ENV = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+LOAD_ERROR_PREFIXES = ("YOLO load failed", "helper/")  # lỗi nạp model, không phải lỗi của ảnh
+
+
+def default_workers():
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def iter_images(inputs, recursive=True):
+    """Đường dẫn ảnh (theo thứ tự ổn định) từ danh sách thư mục / file / glob."""
+    for item in inputs:
+        if os.path.isdir(item):
+            if recursive:
+                for root, dirs, files in os.walk(item):
+                    dirs.sort()
+                    for name in sorted(files):
+                        if name.lower().endswith(IMAGE_EXTS):
+                            yield os.path.join(root, name)
+            else:
+                for name in sorted(os.listdir(item)):
+                    path = os.path.join(item, name)
+                    if name.lower().endswith(IMAGE_EXTS) and os.path.isfile(path):
+                        yield path
+        elif os.path.isfile(item):
+            yield item
+        else:
+            for path in sorted(glob.iglob(item, recursive=True)):
+                if path.lower().endswith(IMAGE_EXTS) and os.path.isfile(path):
+                    yield path
+
+
+# ------------------- worker -------------------
+_models = None
+_load_err = None
+
+
+def _init_worker(det_path, ocr_path, ocr_conf):
+    """Initializer của pool: nạp model 1 lần cho process này (lỗi được trả kèm từng ảnh)."""
+    global _models, _load_err
+    if not plate_reader.HELPER_OK:
+        _load_err = "helper/utils_rotate not found"
+        return
+    try:
+        _models = plate_reader.load_models(det_path, ocr_path, ocr_conf)
+    except Exception as e:
+        _load_err = f"YOLO load failed: {e}"
+
+
+def process_one(path):
+    """Kết quả của 1 ảnh (dict), không ném lỗi."""
+    import cv2
+    res = {"path": path, "plates": [], "boxes": [], "read_ms": None, "infer_ms": None,
+           "error": None, "worker": os.getpid()}
+    if _load_err is not None:
+        res["error"] = _load_err
+        return res
+    t0 = time.perf_counter()
+    img = cv2.imread(path)
+    res["read_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    if img is None:
+        res["error"] = "Image not found or unreadable"
+        return res
+    t1 = time.perf_counter()
+    try:
+        found = plate_reader.read_all_plates(_models[0], _models[1], img)
+    except Exception as e:
+        res["error"] = f"Plate detect error: {e}"
+        return res
+    finally:
+        res["infer_ms"] = round((time.perf_counter() - t1) * 1000, 2)
+    res["plates"] = [text for text, _ in found]
+    res["boxes"] = [list(box) if box else None for _, box in found]
+    return res
+
+
+# ------------------- output -------------------
+def _output_format(path):
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def _trim_partial_line(path):
+    """Bị ngắt giữa lúc ghi -> dòng cuối dở dang; cắt về newline cuối cùng trước khi ghi tiếp."""
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        pos = size - 1
+        while pos > 0:
+            step = min(65536, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            idx = chunk.rfind(b"\n")
+            if idx >= 0:
+                f.truncate(pos - step + idx + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+
+def resume_key(path):
+    """Khoá so khớp khi --resume: đường dẫn tương đối / tuyệt đối / symlink tới cùng ảnh là một."""
+    return os.path.normcase(os.path.realpath(path))
+
+
+def _is_load_error(error):
+    return bool(error) and error.startswith(LOAD_ERROR_PREFIXES)
+
+
+def load_done(path, retry_errors=False):
+    """
+    Tập resume_key của ảnh đã có trong file kết quả (bỏ các dòng lỗi nếu retry_errors;
+    dòng lỗi nạp model luôn bị bỏ — ảnh đó chưa thực sự được xử lý).
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    _trim_partial_line(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        if _output_format(path) == "csv":
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            if row.get("error") and (retry_errors or _is_load_error(row["error"])):
+                continue
+            done.add(resume_key(row["path"]))
+    return done
+
+
+class ResultWriter:
+    def __init__(self, path, append):
+        self.fmt = _output_format(path)
+        new = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        self._f = open(path, "a" if append else "w", newline="", encoding="utf-8")
+        self._csv = None
+        if self.fmt == "csv":
+            self._csv = csv.DictWriter(self._f, fieldnames=CSV_FIELDS)
+            if new:
+                self._csv.writeheader()
+
+    def write(self, res):
+        if self._csv is not None:
+            row = dict(res)
+            row["plates"] = ";".join(res["plates"])
+            row["boxes"] = json.dumps(res["boxes"])
+            row["error"] = res["error"] or ""
+            self._csv.writerow(row)
+        else:
+            self._f.write(json.dumps(res, ensure_ascii=False) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+# ------------------- run -------------------
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def run_batch(inputs, output, workers=None, resume=False, retry_errors=False, recursive=True,
+              det_path=plate_reader.YOLO_DET_PATH, ocr_path=plate_reader.YOLO_OCR_PATH,
+              ocr_conf=plate_reader.YOLO_OCR_CONF, chunksize=4, progress=None):
+    """
+    Xử lý mọi ảnh trong inputs, ghi kết quả ra output. workers=0: chạy ngay trong process này.
+    progress(done, ok, errors) được gọi sau mỗi ảnh. Trả dict thống kê.
+    """
+    workers = default_workers() if workers is None else int(workers)
+    done = load_done(output, retry_errors) if resume else set()
+    paths = (p for p in iter_images(inputs, recursive) if resume_key(p) not in done)
+    writer = ResultWriter(output, append=resume)
+    stats = {"processed": 0, "ok": 0, "errors": 0, "skipped": len(done), "plates": 0}
+    infer_ms = []
+    t0 = time.perf_counter()
+    pool = None
+    try:
+        if workers <= 0:
+            _init_worker(det_path, ocr_path, ocr_conf)
+            results = map(process_one, paths)
+        else:
+            for name in NATIVE_THREAD_ENV:
+                os.environ.setdefault(name, "1")  # process con spawn thừa hưởng
+            ctx = mp.get_context("spawn")
+            pool = ctx.Pool(workers, initializer=_init_worker, initargs=(det_path, ocr_path, ocr_conf))
+            results = pool.imap_unordered(process_one, paths, chunksize=max(1, int(chunksize)))
+        for res in results:
+            if _is_load_error(res["error"]):
+                # model không nạp được: dừng trước khi ghi, --resume sau đó vẫn xử lý lại ảnh này
+                raise RuntimeError(res["error"])
+            writer.write(res)
+            stats["processed"] += 1
+            if res["error"]:
+                stats["errors"] += 1
+            else:
+                stats["ok"] += 1
+                stats["plates"] += len(res["plates"])
+                infer_ms.append(res["infer_ms"])
+            if progress:
+                progress(stats["processed"], stats["ok"], stats["errors"])
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    wall = time.perf_counter() - t0
+    stats["wall_s"] = round(wall, 2)
+    stats["images_per_s"] = round(stats["processed"] / wall, 2) if wall > 0 else 0.0
+    stats["infer_p50_ms"] = round(_percentile(infer_ms, 0.50), 1)
+    stats["infer_p95_ms"] = round(_percentile(infer_ms, 0.95), 1)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đọc biển số hàng loạt (thư mục / glob) -> JSONL hoặc CSV")
+    parser.add_argument("inputs", nargs="+", help="thư mục, file ảnh hoặc glob (đặt trong ngoặc kép)")
+    parser.add_argument("-o", "--output", required=True, help="file kết quả .jsonl hoặc .csv")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help=f"số process (mặc định {default_workers()}; 0 = không dùng pool)")
+    parser.add_argument("--resume", action="store_true", help="bỏ qua ảnh đã có trong file kết quả")
+    parser.add_argument("--retry-errors", action="store_true", help="khi --resume: xử lý lại các ảnh bị lỗi")
+    parser.add_argument("--no-recursive", dest="recursive", action="store_false")
+    parser.add_argument("--chunksize", type=int, default=4)
+    parser.add_argument("--det", default=plate_reader.YOLO_DET_PATH)
+    parser.add_argument("--ocr", default=plate_reader.YOLO_OCR_PATH)
+    parser.add_argument("--ocr-conf", type=float, default=plate_reader.YOLO_OCR_CONF)
+    args = parser.parse_args(argv)
+
+    def progress(n, ok, err):
+        if n % 50 == 0:
+            print(f"\r{n} ảnh ({ok} ok, {err} lỗi)", end="", file=sys.stderr, flush=True)
+
+    try:
+        stats = run_batch(args.inputs, args.output, workers=args.workers, resume=args.resume,
+                          retry_errors=args.retry_errors, recursive=args.recursive,
+                          det_path=args.det, ocr_path=args.ocr, ocr_conf=args.ocr_conf,
+                          chunksize=args.chunksize, progress=progress)
+    except KeyboardInterrupt:
+        print("\nĐã dừng; chạy lại với --resume để tiếp tục", file=sys.stderr)
+        return 130
+    except RuntimeError as e:
+        print("\nLỗi:", e, file=sys.stderr)
+        return 2
+    print(file=sys.stderr)
+    print(json.dumps(stats, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
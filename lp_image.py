@@ -1,71 +1,65 @@
 # python
-# lp_image.py (fixed)
-from PIL import Image
-import cv2
-import torch
-import math
-import function.utils_rotate as utils_rotate
-from IPython.display import display
-import os
-import time
+# lp_image.py
+# CLI đọc biển số trên 1 ảnh. Mặc định gửi ảnh cho plate_daemon (model nạp sẵn, tự khởi động
+# daemon nếu chưa chạy) nên chạy hàng nghìn lệnh liên tiếp không phải nạp lại model mỗi lần.
+#   python lp_image.py -i anh.jpg [--no-show]
+#   python lp_image.py -i anh.jpg --no-daemon     # nạp model trong process này (không cache)
 import argparse
-import function.helper as helper
 
-def process_image(image_path):
-    # lazy-load models so import doesn't trigger heavy operations
-    yolo_LP_detect = torch.hub.load('yolov5', 'custom', path='model/LP_detector.pt', force_reload=True, source='local')
-    yolo_license_plate = torch.hub.load('yolov5', 'custom', path='model/LP_ocr.pt', force_reload=True, source='local')
-    yolo_license_plate.conf = 0.60
+import plate_daemon
+import plate_reader
 
+
+def _read_local(img):
+    yolo_LP_detect, yolo_license_plate = plate_reader.load_models()
+    return plate_reader.read_all_plates(yolo_LP_detect, yolo_license_plate, img)
+
+
+def _annotate(img, found):
+    import cv2
+    for lp, box in found:
+        if box is None:
+            cv2.putText(img, lp, (7, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (36,255,12), 2)
+            continue
+        x1, y1, x2, y2 = box
+        cv2.rectangle(img, (x1, y1), (x2, y2), color=(0,0,225), thickness=2)
+        cv2.putText(img, lp, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (36,255,12), 2)
+
+
+def process_image(image_path, show=True, use_daemon=True, address=None):
+    """Trả tập biển số đọc được. use_daemon: nhờ plate_daemon (khởi động nếu cần) thay vì nạp model."""
+    import cv2
     img = cv2.imread(image_path)
     if img is None:
         raise FileNotFoundError(f"Image not found: {image_path}")
 
-    plates = yolo_LP_detect(img, size=640)
-    list_plates = plates.pandas().xyxy[0].values.tolist()
-    list_read_plates = set()
-
-    if len(list_plates) == 0:
-        lp = helper.read_plate(yolo_license_plate, img)
-        if lp != "unknown":
-            cv2.putText(img, lp, (7, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (36,255,12), 2)
-            list_read_plates.add(lp)
-    else:
-        for plate in list_plates:
-            flag = 0
-            x = int(plate[0])  # xmin
-            y = int(plate[1])  # ymin
-            w = int(plate[2] - plate[0])
-            h = int(plate[3] - plate[1])
-            crop_img = img[y:y+h, x:x+w]
-            cv2.rectangle(img, (int(plate[0]),int(plate[1])), (int(plate[2]),int(plate[3])), color=(0,0,225), thickness=2)
-            # avoid writing to disk unnecessarily
-            for cc in range(0,2):
-                for ct in range(0,2):
-                    lp = helper.read_plate(yolo_license_plate, utils_rotate.deskew(crop_img, cc, ct))
-                    if lp != "unknown":
-                        list_read_plates.add(lp)
-                        cv2.putText(img, lp, (int(plate[0]), int(plate[1]-10)), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (36,255,12), 2)
-                        flag = 1
-                        break
-                if flag == 1:
-                    break
+    found = None
+    if use_daemon and plate_daemon.spawn(address):
+        with plate_daemon.PlateClient(address) as client:
+            found = client.read(image_path)
+    if found is None:
+        found = _read_local(img)
 
-    cv2.imshow('frame', img)
-    cv2.waitKey()
-    cv2.destroyAllWindows()
-    return list_read_plates
+    if show:
+        _annotate(img, found)
+        cv2.imshow('frame', img)
+        cv2.waitKey()
+        cv2.destroyAllWindows()
+    return {lp for lp, _ in found}
 
 def main(argv=None):
     parser = argparse.ArgumentParser(description='Process license plate image')
     parser.add_argument('-i', '--image', required=True, help='path to input image')
+    parser.add_argument('--no-show', dest='show', action='store_false', help='không mở cửa sổ xem kết quả')
+    parser.add_argument('--no-daemon', dest='daemon', action='store_false',
+                        help='nạp model ngay trong lệnh này thay vì dùng plate_daemon')
     args = parser.parse_args(argv)
     try:
-        plates = process_image(args.image)
+        plates = process_image(args.image, show=args.show, use_daemon=args.daemon)
         print("Detected plates:", plates)
     except Exception as e:
         print("Error:", e)
         raise
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
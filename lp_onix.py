@@ -1,19 +1,23 @@
 import warnings
 warnings.filterwarnings("ignore")
 
+import argparse
 import cv2
 import numpy as np
 import time
-import onnxruntime as ort
 import function.utils_rotate as utils_rotate
 import function.helper_onix as helper  # mày có viết helper_onix chưa?
 
-# ========= LOAD ONNX ========= #
-det_sess = ort.InferenceSession("model/LP_detector_nano_61.onnx", providers=["CPUExecutionProvider"])
-ocr_sess = ort.InferenceSession("model/LP_ocr_nano_62.onnx", providers=["CPUExecutionProvider"])
+DET_ONNX_PATH = "model/LP_detector_nano_61.onnx"
+OCR_ONNX_PATH = "model/LP_ocr_nano_62.onnx"
 
-input_name_det = det_sess.get_inputs()[0].name
-input_name_ocr = ocr_sess.get_inputs()[0].name
+# ========= LOAD ONNX ========= #
+def load_sessions(det_path=DET_ONNX_PATH, ocr_path=OCR_ONNX_PATH):
+    """Tạo 2 InferenceSession (detector, OCR). onnxruntime chỉ import khi gọi hàm này."""
+    import onnxruntime as ort
+    det_sess = ort.InferenceSession(det_path, providers=["CPUExecutionProvider"])
+    ocr_sess = ort.InferenceSession(ocr_path, providers=["CPUExecutionProvider"])
+    return det_sess, ocr_sess
 
 # ========= NMS ========= #
 def non_max_suppression(boxes, confs, iou_thres=0.4):
@@ -48,15 +52,18 @@ def non_max_suppression(boxes, confs, iou_thres=0.4):
     return keep
 
 # ========= YOLO ONNX DETECTION ========= #
-def yolo_onnx_detect(sess, img, input_name, conf_thres=0.5):
-    h0, w0 = img.shape[:2]
-    img_resized = cv2.resize(img, (640, 640))
+DET_INPUT_SIZE = 640
+
+
+def onnx_preprocess(img, size=DET_INPUT_SIZE):
+    """BGR -> blob (1, 3, size, size) float32 RGB [0, 1]."""
+    img_resized = cv2.resize(img, (size, size))
     blob = img_resized[:, :, ::-1].transpose(2,0,1)
-    blob = np.ascontiguousarray(blob/255.0, dtype=np.float32)[None]
+    return np.ascontiguousarray(blob/255.0, dtype=np.float32)[None]
 
-    outputs = sess.run(None, {input_name: blob})[0]  # (1, 25200, 6)
-    outputs = outputs[0]  # (25200, 6)
 
+def onnx_decode(outputs, w0, h0, conf_thres=0.5, size=DET_INPUT_SIZE):
+    """Output (25200, 6) của detector -> (boxes [x1, y1, x2, y2] theo ảnh gốc, confs)."""
     boxes = []
     confs = []
     for det in outputs:
@@ -64,62 +71,81 @@ def yolo_onnx_detect(sess, img, input_name, conf_thres=0.5):
         if conf < conf_thres:
             continue
         # scale bbox về size gốc
-        x1 = max(0, min(int(x1/640*w0), w0-1))
-        y1 = max(0, min(int(y1/640*h0), h0-1))
-        x2 = max(0, min(int(x2/640*w0), w0-1))
-        y2 = max(0, min(int(y2/640*h0), h0-1))
+        x1 = max(0, min(int(x1/size*w0), w0-1))
+        y1 = max(0, min(int(y1/size*h0), h0-1))
+        x2 = max(0, min(int(x2/size*w0), w0-1))
+        y2 = max(0, min(int(y2/size*h0), h0-1))
         if x2 - x1 < 5 or y2 - y1 < 5:
             continue
         boxes.append([x1, y1, x2, y2])
         confs.append(conf)
+    return boxes, confs
 
+
+def yolo_onnx_detect(sess, img, input_name, conf_thres=0.5):
+    h0, w0 = img.shape[:2]
+    blob = onnx_preprocess(img)
+    outputs = sess.run(None, {input_name: blob})[0]  # (1, 25200, 6)
+    boxes, confs = onnx_decode(outputs[0], w0, h0, conf_thres)
     keep = non_max_suppression(boxes, confs)
     return [boxes[i] for i in keep]
 
 # ========= MAIN LOOP ========= #
-vid = cv2.VideoCapture(2)
-captured = False
-
-while True:
-    ret, frame = vid.read()
-    if not ret:
-        break
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nhận diện biển số từ camera (ONNX)")
+    parser.add_argument("--camera", type=int, default=2, help="chỉ số camera cho cv2.VideoCapture")
+    args = parser.parse_args(argv)
 
-    cv2.imshow("Live Cam", frame)
+    det_sess, ocr_sess = load_sessions()
+    input_name_det = det_sess.get_inputs()[0].name
 
-    plates = yolo_onnx_detect(det_sess, frame, input_name_det, conf_thres=0.3)
+    vid = cv2.VideoCapture(args.camera)
+    captured = False
 
+    while True:
+        ret, frame = vid.read()
+        if not ret:
+            break
 
-    for (x1, y1, x2, y2) in plates:
-        crop_img = frame[y1:y2, x1:x2]
-        if crop_img.size == 0:
-            continue
-
-        lp = "unknown"
-        for cc in range(2):
-            for ct in range(2):
-                plate_img = utils_rotate.deskew(crop_img, cc, ct)
-                if plate_img is None or plate_img.size == 0:
-                    continue
-                lp = helper.read_plate_onnx(ocr_sess, plate_img)
-                if lp != "unknown":
-                    filename = f"{lp}_{time.strftime('%Y%m%d_%H%M%S')}.jpg"
-                    cv2.imwrite(filename, crop_img)
-                    cv2.imshow("Captured Plate", crop_img)
-                    print("BIỂN SỐ:", lp)
-                    captured = True
+        cv2.imshow("Live Cam", frame)
+
+        plates = yolo_onnx_detect(det_sess, frame, input_name_det, conf_thres=0.3)
+
+
+        for (x1, y1, x2, y2) in plates:
+            crop_img = frame[y1:y2, x1:x2]
+            if crop_img.size == 0:
+                continue
+
+            lp = "unknown"
+            for cc in range(2):
+                for ct in range(2):
+                    plate_img = utils_rotate.deskew(crop_img, cc, ct)
+                    if plate_img is None or plate_img.size == 0:
+                        continue
+                    lp = helper.read_plate_onnx(ocr_sess, plate_img)
+                    if lp != "unknown":
+                        filename = f"{lp}_{time.strftime('%Y%m%d_%H%M%S')}.jpg"
+                        cv2.imwrite(filename, crop_img)
+                        cv2.imshow("Captured Plate", crop_img)
+                        print("BIỂN SỐ:", lp)
+                        captured = True
+                        break
+                if captured:
                     break
             if captured:
                 break
+
         if captured:
+            cv2.waitKey(0)
+            break
+
+        if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
-    if captured:
-        cv2.waitKey(0)
-        break
+    vid.release()
+    cv2.destroyAllWindows()
 
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
 
-vid.release()
-cv2.destroyAllWindows()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# metrics.py
+# Đo thời gian từng chặng của pipeline đang chạy (YOLO, deskew, OCR, ghi JPEG, SQLite...).
+# - span("stage") / observe("stage", giây): ghi vào histogram của chặng (~1 µs mỗi lần)
+# - Mỗi chặng giữ bucket cộng dồn (xuất Prometheus) + cửa sổ WINDOW mẫu gần nhất (p50/p95/p99 trên panel)
+# - Worker process không ghi trực tiếp: gửi dict timings kèm kết quả, process GUI gọi observe_many()
+# - Tắt hẳn bằng SPMS_METRICS=0 (span trả về context rỗng dùng chung)
+# Xuất Prometheus text format: write_prometheus(path) hoặc serve_http(port) (chỉ nghe 127.0.0.1).
+
+import os
+import time
+import bisect
+import threading
+from collections import deque
+
+ENABLED = os.environ.get("SPMS_METRICS", "1") != "0"
+METRIC_NAME = "spms_stage_seconds"
+# giây; đủ rộng cho cả SQLite (~0.1 ms) lẫn YOLO trên CPU yếu (vài giây)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WINDOW = 512
+
+
+class StageHistogram:
+    __slots__ = ("counts", "count", "sum", "max", "recent")
+
+    def __init__(self, window=WINDOW):
+        self.counts = [0] * (len(BUCKETS) + 1)  # ô cuối: > bucket lớn nhất
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.recent.append(seconds)
+
+
+class _Span:
+    __slots__ = ("metrics", "stage", "t0")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.t0)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def _pct(sorted_vals, q):
+    return sorted_vals[min(len(sorted_vals) - 1, int(round(q * (len(sorted_vals) - 1))))]
+
+
+class Metrics:
+    def __init__(self, window=WINDOW, enabled=ENABLED):
+        self.window = int(window)
+        self.enabled = bool(enabled)
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._gauges = {}  # tên -> (giá trị, help)
+        self.started_at = time.time()
+
+    def observe(self, stage, seconds):
+        if not self.enabled or seconds is None:
+            return
+        with self._lock:
+            h = self._stages.get(stage)
+            if h is None:
+                h = self._stages[stage] = StageHistogram(self.window)
+            h.observe(seconds)
+
+    def observe_many(self, timings):
+        """timings: {stage: giây} (thường gửi về từ worker process)."""
+        if not self.enabled or not timings:
+            return
+        for stage, seconds in timings.items():
+            self.observe(stage, seconds)
+
+    def span(self, stage):
+        """with metrics.span("db_insert"): ... — đo thời gian khối lệnh."""
+        return _Span(self, stage) if self.enabled else _NOOP
+
+    def set_gauge(self, name, value, help_text=""):
+        with self._lock:
+            self._gauges[name] = (value, help_text)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        """[{stage, count, mean/p50/p95/p99/max (ms)}] theo tên chặng; percentile tính trên WINDOW mẫu gần nhất."""
+        with self._lock:
+            items = [(name, h.count, h.sum, h.max, list(h.recent)) for name, h in self._stages.items()]
+        rows = []
+        for name, count, total, mx, recent in sorted(items):
+            recent.sort()
+            rows.append({"stage": name, "count": count,
+                         "mean_ms": total / count * 1000 if count else 0.0,
+                         "p50_ms": _pct(recent, 0.50) * 1000 if recent else 0.0,
+                         "p95_ms": _pct(recent, 0.95) * 1000 if recent else 0.0,
+                         "p99_ms": _pct(recent, 0.99) * 1000 if recent else 0.0,
+                         "max_ms": mx * 1000})
+        return rows
+
+    def to_prometheus(self):
+        with self._lock:
+            items = sorted((name, list(h.counts), h.count, h.sum) for name, h in self._stages.items())
+            gauges = sorted(self._gauges.items())
+        out = [f"# HELP {METRIC_NAME} Thời gian xử lý từng chặng pipeline (giây)",
+               f"# TYPE {METRIC_NAME} histogram"]
+        for name, counts, count, total in items:
+            cum = 0
+            for le, c in zip(BUCKETS, counts):
+                cum += c
+                out.append(f'{METRIC_NAME}_bucket{{stage="{name}",le="{le}"}} {cum}')
+            out.append(f'{METRIC_NAME}_bucket{{stage="{name}",le="+Inf"}} {count}')
+            out.append(f'{METRIC_NAME}_sum{{stage="{name}"}} {total:.6f}')
+            out.append(f'{METRIC_NAME}_count{{stage="{name}"}} {count}')
+        for name, (value, help_text) in gauges:
+            if help_text:
+                out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} gauge")
+            out.append(f"{name} {value}")
+        return "\n".join(out) + "\n"
+
+    def write_prometheus(self, path):
+        """Ghi file (ghi tạm rồi đổi tên) cho node_exporter textfile collector hoặc đọc tay."""
+        tmp = path + ".part"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def serve_http(self, port, host="127.0.0.1"):
+        """GET /metrics trên thread nền. Trả server (gọi shutdown() khi tắt)."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, int(port)), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+METRICS = Metrics()
+
+
+def span(stage):
+    return METRICS.span(stage)
+
+
+def observe(stage, seconds):
+    METRICS.observe(stage, seconds)
+
+
+def observe_many(timings):
+    METRICS.observe_many(timings)
+
+
+def add_timing(timings, stage, t0):
+    """Cộng thời gian từ t0 (perf_counter) vào timings[stage]; timings None -> bỏ qua. Dùng trong worker."""
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - t0)
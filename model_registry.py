@@ -0,0 +1,190 @@
+# model_registry.py
+# Nạp model ngay khi cửa sổ đăng nhập hiện lên, không đợi tới lần chụp đầu tiên:
+# - Thread nền import trước module GUI (cv2, numpy, PyQt6 widgets...) để bấm Đăng nhập không bị khựng
+# - Khởi động PlatePool (YOLO detect + OCR) và FacePool (InsightFace); mỗi worker nạp model
+#   rồi chạy thử 1 khung giả (warm-up) trước khi báo sẵn sàng
+# - status() cho màn đăng nhập hiển thị tiến độ; MainWindow nhận lại pool đang nóng qua take()
+# Registry không import Qt, có thể dùng lại từ CLI/benchmark.
+
+import time
+import importlib
+import threading
+
+GUI_MODULE = "login_user_gui"
+PREFETCH_MODULES = ("login_user_gui", "admin_gui")
+
+# trạng thái từng thành phần
+OFF = "off"          # không dùng (thiếu torch, ...)
+LOADING = "loading"
+READY = "ready"
+ERROR = "error"
+
+
+class ModelRegistry:
+    """
+    Giữ các pool model của tiến trình cho tới khi cửa sổ chính nhận lấy.
+    start() gọi nhiều lần không sao; sau khi pool đã bị take() thì lần start() kế tiếp tạo pool mới
+    (ví dụ đăng xuất rồi đăng nhập lại).
+    """
+
+    def __init__(self, gui_module=GUI_MODULE, prefetch=PREFETCH_MODULES):
+        self.gui_module = gui_module
+        self.prefetch = tuple(prefetch)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()  # của lượt start() hiện tại; shutdown() đặt cờ, không join
+        self._pools = {}     # "plate"/"face" -> pool chưa ai nhận
+        self._state = {}     # "plate"/"face"/"gui" -> OFF/LOADING/READY/ERROR
+        self._errors = {}
+        self._modules = {}
+        self._t_start = None
+
+    # ---------- khởi động ----------
+    def start(self, num_lanes=None):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and not self._stop.is_set():
+                return self
+            # thread cũ đã bị shutdown() (có thể vẫn đang chạy nốt): giữ cờ riêng của nó, lượt mới cờ mới
+            self._stop = threading.Event()
+            self._t_start = time.perf_counter()
+            self._state.update({"gui": LOADING, "plate": LOADING, "face": LOADING})
+            self._thread = threading.Thread(target=self._run, args=(num_lanes, self._stop),
+                                            name="model-registry", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self, num_lanes, stop):
+        for name in self.prefetch:
+            try:
+                self._modules[name] = importlib.import_module(name)
+            except Exception as e:
+                self._errors[name] = str(e)
+                print(f"[ModelRegistry] import {name} lỗi:", e)
+        gui = self._modules.get(self.gui_module)
+        if gui is None:
+            self._set("gui", ERROR, self._errors.get(self.gui_module))
+            self._set("plate", ERROR, "không import được module GUI")
+            self._set("face", ERROR, "không import được module GUI")
+            return
+        if stop.is_set():
+            return
+        self._set("gui", READY)
+        gui.prepare_runtime()
+        n_lanes = num_lanes or gui.NUM_LANES
+        self._start_pool("plate", lambda: gui.make_plate_pool(n_lanes), stop)
+        self._start_pool("face", lambda: gui.make_face_pool(n_lanes), stop)
+
+    def _start_pool(self, kind, factory, stop):
+        with self._lock:
+            if kind in self._pools or stop.is_set():
+                return
+        try:
+            pool = factory()
+        except Exception as e:
+            self._set(kind, ERROR, str(e))
+            return
+        if pool is None:
+            self._set(kind, OFF)
+            return
+        try:
+            pool.start()
+        except Exception as e:
+            self._set(kind, ERROR, str(e))
+            return
+        with self._lock:
+            if not stop.is_set():
+                self._pools[kind] = pool
+                return
+        pool.stop()  # shutdown() chạy trong lúc đang khởi động pool này
+
+    def _set(self, kind, state, err=None):
+        with self._lock:
+            self._state[kind] = state
+            if err:
+                self._errors[kind] = err
+
+    # ---------- trạng thái ----------
+    def _refresh(self):
+        with self._lock:
+            pools = dict(self._pools)
+        face = pools.get("face")
+        if face is not None:
+            face.poll()  # chưa có làn nào gửi khung -> chỉ nhận thông báo ready
+        for kind, pool in pools.items():
+            if pool.ready:
+                self._set(kind, READY)
+            elif pool.failed:
+                self._set(kind, ERROR, pool.load_error)
+
+    def status(self):
+        """{"gui"/"plate"/"face": OFF|LOADING|READY|ERROR, "errors": {...}, "elapsed": giây}."""
+        self._refresh()
+        with self._lock:
+            st = dict(self._state)
+            st["errors"] = dict(self._errors)
+        st["elapsed"] = time.perf_counter() - self._t_start if self._t_start else 0.0
+        return st
+
+    def is_ready(self):
+        st = self.status()
+        return all(st.get(k) in (READY, OFF) for k in ("gui", "plate", "face"))
+
+    def is_settled(self):
+        """Không còn thành phần nào đang nạp (sẵn sàng, tắt hoặc lỗi)."""
+        st = self.status()
+        return all(st.get(k) in (READY, OFF, ERROR) for k in ("gui", "plate", "face"))
+
+    # ---------- dùng ----------
+    def module(self, name, timeout=None):
+        """Module đã import trước; nếu thread nền còn đang import thì chờ, không thì import ngay."""
+        t = self._thread
+        if (t is not None and t.is_alive() and not self._stop.is_set()
+                and name in self.prefetch and name not in self._modules):
+            t.join(timeout)
+        mod = self._modules.get(name)
+        if mod is None:
+            mod = importlib.import_module(name)
+            self._modules[name] = mod
+        return mod
+
+    def take(self, kind):
+        """
+        Nhận pool "plate"/"face" (đang nạp hoặc đã nóng); registry không giữ nữa, người nhận lo stop().
+        None nếu pool không có (tắt, lỗi khởi động hoặc thread nền chưa tạo xong).
+        """
+        t = self._thread
+        if t is not None and t.is_alive() and not self._stop.is_set():
+            t.join()  # pool.start() chỉ tốn thời gian spawn, không chờ nạp model
+        with self._lock:
+            pool = self._pools.pop(kind, None)
+            if pool is not None:
+                self._state[kind] = LOADING if not pool.ready else READY
+        return pool
+
+    def shutdown(self):
+        """
+        Dừng các pool chưa ai nhận (ví dụ đăng nhập admin: không cần model). Không join thread nền
+        (gọi từ GUI thread): chỉ đặt cờ dừng, pool nào thread tạo xong sau đó thì thread tự dừng.
+        """
+        with self._lock:
+            self._stop.set()
+            pools = list(self._pools.values())
+            self._pools.clear()
+            for kind in ("plate", "face"):
+                self._state[kind] = OFF
+        for pool in pools:
+            try:
+                pool.stop()
+            except Exception:
+                pass
+
+
+_registry = None
+
+
+def registry():
+    """Registry dùng chung của tiến trình."""
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
@@ -0,0 +1,84 @@
+# occupancy.py
+# Danh sách xe đang trong bãi giữ trong bộ nhớ, lấy từ bảng sessions (phiên đang mở).
+# - warm(): nạp lại toàn bộ bằng 1 câu truy vấn (lúc khởi động / khi cần đồng bộ lại)
+# - apply(): cập nhật sau mỗi lần ghi event thành công
+# - sync(): gọi định kỳ; nạp lại khi DB bị ghi từ kết nối / process khác (màn admin sửa, xoá,
+#   hoàn tác event; máy vận hành khác) hoặc sessions bị dựng lại trong process này
+# Dự đoán trên panel ghép cặp tra next_status()/entry() tại đây, không truy vấn DB;
+# trạng thái thật do db.record_event quyết định lúc ghi.
+
+import threading
+
+import db
+
+SQL_OPEN_SESSIONS = """
+    SELECT s.plate_text, s.entry_event_id, s.time_in, e.face_image_path, e.plate_image_path
+    FROM sessions AS s
+    LEFT JOIN events AS e ON e.id = s.entry_event_id
+    WHERE s.is_open = 1
+"""
+
+
+class OccupancyCache:
+    """plate -> {"event_id", "time_in", "face", "plate"} của lượt Vào đang mở."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inside = {}
+        self._version = None
+
+    @staticmethod
+    def _db_version(conn):
+        # data_version chỉ đổi khi kết nối KHÁC commit: lượt ghi của chính GUI (đã apply) không làm nạp lại
+        return conn.execute("PRAGMA data_version").fetchone()[0], db.sessions_revision()
+
+    def warm(self):
+        conn = db.get_conn()
+        version = self._db_version(conn)
+        rows = conn.execute(SQL_OPEN_SESSIONS).fetchall()
+        inside = {
+            plate_text: {"event_id": ev_id, "time_in": time_in, "face": face, "plate": plate}
+            for plate_text, ev_id, time_in, face, plate in rows
+        }
+        with self._lock:
+            self._inside = inside
+            self._version = version
+        return len(inside)
+
+    def sync(self):
+        """Nạp lại nếu DB đã đổi từ lần warm() trước. Trả True nếu đã nạp lại."""
+        if self._db_version(db.get_conn()) == self._version:
+            return False
+        self.warm()
+        return True
+
+    def is_inside(self, plate_text):
+        with self._lock:
+            return plate_text in self._inside
+
+    def next_status(self, plate_text):
+        """Trạng thái của lượt kế tiếp: xe đang trong bãi -> Ra, ngược lại -> Vào."""
+        return "Ra" if self.is_inside(plate_text) else "Vào"
+
+    def entry(self, plate_text):
+        """(time_in, face, plate) của lượt Vào đang mở, hoặc None."""
+        with self._lock:
+            e = self._inside.get(plate_text)
+        return (e["time_in"], e["face"], e["plate"]) if e else None
+
+    def apply(self, plate_text, status, event_id, now, face_path=None, plate_path=None):
+        """Gọi sau khi event đã commit (cùng quy tắc với db._apply_session)."""
+        with self._lock:
+            if status == "Vào":
+                self._inside[plate_text] = {"event_id": event_id, "time_in": now,
+                                            "face": face_path, "plate": plate_path}
+            else:
+                self._inside.pop(plate_text, None)
+
+    def plates(self):
+        with self._lock:
+            return list(self._inside)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._inside)
@@ -0,0 +1,353 @@
+# plate_daemon.py
+# Dịch vụ đọc biển số chạy nền cho CLI: nạp YOLO detect + OCR đúng 1 lần rồi phục vụ nhiều
+# yêu cầu qua socket cục bộ (Unix socket; Windows dùng TCP 127.0.0.1).
+# lp_image.py là client mỏng: mỗi lệnh chỉ gửi đường dẫn ảnh, không nạp lại model.
+#
+#   python plate_daemon.py                 # chạy tiền cảnh (Ctrl+C để dừng)
+#   python plate_daemon.py --idle-timeout 600
+#   python plate_daemon.py --stop | --ping
+#
+# Giao thức: mỗi dòng 1 JSON.
+#   {"op": "read", "image": "/abs/path.jpg"} -> {"ok": true, "plates": [{"text", "box"}], "elapsed": s}
+#   {"op": "ping"} / {"op": "stats"} / {"op": "shutdown"}
+#   lỗi -> {"ok": false, "err": "..."}
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import socketserver
+
+import plate_reader
+
+HAS_UNIX_SOCKET = hasattr(socket, "AF_UNIX") and sys.platform != "win32"
+DEFAULT_TCP_PORT = 47631
+IDLE_TIMEOUT_S = 900      # không có yêu cầu trong khoảng này -> tự thoát (0 = chạy mãi)
+CONNECT_TIMEOUT_S = 2.0
+START_TIMEOUT_S = 120.0   # chờ daemon nạp xong model khi client tự khởi động nó
+# mã thoát của serve(): spawn() chỉ chờ tiếp khi EXIT_BUSY (daemon khác giữ địa chỉ)
+EXIT_BUSY = 1
+EXIT_LOAD_FAILED = 2
+
+
+def _parse_address(text):
+    if not text:
+        return None
+    if ":" in text and not text.startswith("/"):
+        host, port = text.rsplit(":", 1)
+        return (host, int(port))
+    return text
+
+
+def default_address():
+    """Địa chỉ mặc định: biến môi trường SPMS_PLATE_DAEMON, hoặc socket theo user trong thư mục tạm."""
+    env = _parse_address(os.environ.get("SPMS_PLATE_DAEMON"))
+    if env:
+        return env
+    if HAS_UNIX_SOCKET:
+        return os.path.join(tempfile.gettempdir(), f"spms-plate-{os.getuid()}.sock")
+    return ("127.0.0.1", DEFAULT_TCP_PORT)
+
+
+def _family(address):
+    return socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+
+
+# ------------------- Server -------------------
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                req = json.loads(line)
+                resp = self.server.dispatch(req)
+            except Exception as e:
+                resp = {"ok": False, "err": str(e)}
+            self.wfile.write((json.dumps(resp, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            if self.server.stopping:
+                break
+
+
+class _ServerMixin:
+    daemon_threads = True
+    # Windows: SO_REUSEADDR cho phép 2 process cùng bind 1 cổng -> không bật
+    allow_reuse_address = sys.platform != "win32"
+
+    def setup_models(self, det_path, ocr_path, ocr_conf, idle_timeout):
+        t0 = time.perf_counter()
+        self.yolo_detect, self.yolo_ocr = plate_reader.load_models(det_path, ocr_path, ocr_conf)
+        plate_reader.warmup(self.yolo_detect, self.yolo_ocr)
+        self.load_seconds = time.perf_counter() - t0
+        self.idle_timeout = float(idle_timeout)
+        self.started_at = time.time()
+        self.last_request = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.stopping = False
+        self._infer_lock = threading.Lock()  # model torch không dùng song song được
+
+    def dispatch(self, req):
+        op = req.get("op")
+        self.last_request = time.time()
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if op == "stats":
+            return {"ok": True, "pid": os.getpid(), "requests": self.requests, "errors": self.errors,
+                    "busy_s": round(self.busy_seconds, 3), "load_s": round(self.load_seconds, 3),
+                    "uptime_s": round(time.time() - self.started_at, 1)}
+        if op == "shutdown":
+            self.stopping = True
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {"ok": True}
+        if op == "read":
+            return self._read(req.get("image"))
+        return {"ok": False, "err": f"op không hợp lệ: {op!r}"}
+
+    def _read(self, path):
+        import cv2
+        self.requests += 1
+        img = cv2.imread(path) if path else None
+        if img is None:
+            self.errors += 1
+            return {"ok": False, "err": f"Image not found: {path}"}
+        with self._infer_lock:
+            t0 = time.perf_counter()
+            try:
+                found = plate_reader.read_all_plates(self.yolo_detect, self.yolo_ocr, img)
+            except Exception as e:
+                self.errors += 1
+                return {"ok": False, "err": f"Plate detect error: {e}"}
+            finally:
+                elapsed = time.perf_counter() - t0
+                self.busy_seconds += elapsed
+        return {"ok": True, "elapsed": elapsed,
+                "plates": [{"text": text, "box": list(box) if box else None} for text, box in found]}
+
+    def watch_idle(self):
+        while not self.stopping:
+            time.sleep(1.0)
+            if self.idle_timeout > 0 and time.time() - self.last_request > self.idle_timeout:
+                print("[plate_daemon] rảnh quá lâu, thoát")
+                self.stopping = True
+                self.shutdown()
+                return
+
+
+if HAS_UNIX_SOCKET:
+    class _UnixServer(_ServerMixin, socketserver.ThreadingUnixStreamServer):
+        pass
+
+
+class _TCPServer(_ServerMixin, socketserver.ThreadingTCPServer):
+    pass
+
+
+def _lock_socket_path(address):
+    """
+    Unix socket: khoá độc quyền <address>.lock suốt đời daemon, lấy TRƯỚC khi xoá socket cũ —
+    hai lần spawn() cùng lúc không thể xoá socket của nhau. Trả file đã khoá, None nếu process khác giữ.
+    Daemon xoá file khoá khi thoát: khoá được nhưng file trên đĩa đã là file khác (bị xoá / tạo lại
+    giữa lúc open và flock) thì mở lại.
+    """
+    import fcntl
+    path = address + ".lock"
+    for _ in range(3):
+        f = open(path, "a")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return None
+        try:
+            if os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                return f
+        except FileNotFoundError:
+            pass
+        f.close()
+    return None
+
+
+def _unlock_socket_path(address, lock):
+    # xoá khi còn giữ khoá: process đang chờ trên file cũ sẽ thấy inode lệch và mở lại
+    try:
+        os.remove(address + ".lock")
+    except OSError:
+        pass
+    lock.close()
+
+
+def serve(address=None, det_path=plate_reader.YOLO_DET_PATH, ocr_path=plate_reader.YOLO_OCR_PATH,
+          ocr_conf=plate_reader.YOLO_OCR_CONF, idle_timeout=IDLE_TIMEOUT_S):
+    """
+    Nạp model rồi phục vụ tới khi shutdown / hết idle_timeout.
+    Trả EXIT_BUSY nếu đã có daemon khác giữ địa chỉ, EXIT_LOAD_FAILED nếu không nạp được model.
+    """
+    address = address or default_address()
+    if ping(address):
+        print("[plate_daemon] đã có daemon đang chạy tại", address)
+        return EXIT_BUSY
+    if not plate_reader.HELPER_OK:
+        print("[plate_daemon] helper/utils_rotate not found")
+        return EXIT_LOAD_FAILED
+    lock = None
+    if isinstance(address, str):
+        lock = _lock_socket_path(address)
+        if lock is None:
+            print("[plate_daemon] daemon khác đang chạy / đang nạp model tại", address)
+            return EXIT_BUSY
+        try:
+            os.remove(address)  # socket cũ của daemon đã chết (đang giữ khoá nên không phải của ai khác)
+        except FileNotFoundError:
+            pass
+        server = _UnixServer(address, _Handler, bind_and_activate=False)
+    else:
+        server = _TCPServer(address, _Handler, bind_and_activate=False)
+    try:
+        # bind + listen TRƯỚC khi nạp model: process đến sau thua ngay ở đây, không nạp model vô ích.
+        # Chỉ accept sau khi nạp xong -> client kết nối sớm sẽ chờ trong backlog (ping hết hạn = chưa sẵn sàng)
+        try:
+            server.server_bind()
+            server.server_activate()
+        except OSError as e:
+            print(f"[plate_daemon] không bind được {address}: {e}")
+            return EXIT_BUSY
+        if isinstance(address, str):
+            os.chmod(address, 0o600)
+        try:
+            server.setup_models(det_path, ocr_path, ocr_conf, idle_timeout)
+        except Exception as e:
+            print("[plate_daemon] không nạp được model:", e)
+            return EXIT_LOAD_FAILED
+        print(f"[plate_daemon] sẵn sàng tại {address} (nạp model {server.load_seconds:.1f}s, pid {os.getpid()})",
+              flush=True)
+        threading.Thread(target=server.watch_idle, name="plate-daemon-idle", daemon=True).start()
+        try:
+            server.serve_forever(poll_interval=0.5)
+        except KeyboardInterrupt:
+            pass
+    finally:
+        server.server_close()
+        if lock is not None:
+            try:
+                os.remove(address)
+            except OSError:
+                pass
+            _unlock_socket_path(address, lock)
+    return 0
+
+
+# ------------------- Client -------------------
+class PlateClient:
+    """Kết nối tới daemon, giữ kết nối cho nhiều yêu cầu liên tiếp."""
+
+    def __init__(self, address=None, timeout=None):
+        self.address = address or default_address()
+        self._sock = socket.socket(_family(self.address), socket.SOCK_STREAM)
+        self._sock.settimeout(CONNECT_TIMEOUT_S)
+        try:
+            self._sock.connect(self.address)
+        except OSError:
+            self._sock.close()
+            raise
+        self._sock.settimeout(timeout)
+        self._rfile = self._sock.makefile("rb")
+
+    def request(self, req):
+        self._sock.sendall((json.dumps(req, ensure_ascii=False) + "\n").encode("utf-8"))
+        line = self._rfile.readline()
+        if not line:
+            raise ConnectionError("daemon đóng kết nối")
+        return json.loads(line)
+
+    def read(self, image_path):
+        """[(text, box hoặc None)] của ảnh; ném RuntimeError nếu daemon báo lỗi."""
+        resp = self.request({"op": "read", "image": os.path.abspath(image_path)})
+        if not resp.get("ok"):
+            raise RuntimeError(resp.get("err"))
+        return [(p["text"], tuple(p["box"]) if p["box"] else None) for p in resp["plates"]]
+
+    def close(self):
+        try:
+            self._rfile.close()
+            self._sock.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def ping(address=None):
+    try:
+        with PlateClient(address, timeout=CONNECT_TIMEOUT_S) as c:
+            return bool(c.request({"op": "ping"}).get("ok"))
+    except (OSError, ValueError):
+        return False
+
+
+def spawn(address=None, idle_timeout=IDLE_TIMEOUT_S, wait=START_TIMEOUT_S):
+    """Khởi động daemon nền (tách khỏi terminal) và chờ tới khi nhận kết nối. Trả True nếu sẵn sàng."""
+    address = address or default_address()
+    if ping(address):
+        return True
+    cmd = [sys.executable, os.path.abspath(__file__), "--idle-timeout", str(idle_timeout)]
+    if address != default_address():
+        cmd += ["--address", address if isinstance(address, str) else f"{address[0]}:{address[1]}"]
+    kwargs = {"cwd": os.path.dirname(os.path.abspath(__file__)),
+              "stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    proc = subprocess.Popen(cmd, **kwargs)
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        code = proc.poll()
+        if code is not None and code != EXIT_BUSY:
+            return False  # lỗi nạp model / lỗi khác: không chờ, client tự xử lý
+        # EXIT_BUSY: daemon khác (vd spawn() song song) đã chiếm địa chỉ, có thể vẫn đang nạp model -> chờ nó
+        if ping(address):
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Daemon đọc biển số (giữ model nạp sẵn cho CLI)")
+    parser.add_argument("--address", default=None, help="đường dẫn Unix socket hoặc host:port")
+    parser.add_argument("--det", default=plate_reader.YOLO_DET_PATH)
+    parser.add_argument("--ocr", default=plate_reader.YOLO_OCR_PATH)
+    parser.add_argument("--ocr-conf", type=float, default=plate_reader.YOLO_OCR_CONF)
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT_S,
+                        help="tự thoát sau số giây không có yêu cầu (0 = không bao giờ)")
+    parser.add_argument("--ping", action="store_true", help="kiểm tra daemon có đang chạy")
+    parser.add_argument("--stats", action="store_true", help="in thống kê của daemon đang chạy")
+    parser.add_argument("--stop", action="store_true", help="dừng daemon đang chạy")
+    args = parser.parse_args(argv)
+    address = _parse_address(args.address) or default_address()
+
+    if args.ping or args.stats or args.stop:
+        op = "ping" if args.ping else "stats" if args.stats else "shutdown"
+        try:
+            with PlateClient(address, timeout=CONNECT_TIMEOUT_S) as c:
+                print(json.dumps(c.request({"op": op}), ensure_ascii=False))
+            return 0
+        except OSError:
+            print("Không có daemon tại", address)
+            return 1
+    return serve(address, args.det, args.ocr, args.ocr_conf, args.idle_timeout)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
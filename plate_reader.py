@@ -0,0 +1,225 @@
+# plate_reader.py
+# Pipeline đọc biển số dùng chung cho worker GUI, CLI và công cụ đánh giá:
+#   YOLO detect -> crop biển tốt nhất -> deskew 2x2 (cc, ct) -> OCR (helper.read_plate)
+# torch chỉ được import khi nạp model, nên import module này rất nhẹ.
+# Các hàm nhận timings (dict, tuỳ chọn) để cộng thời gian từng chặng: plate_detect, plate_deskew, plate_ocr.
+# strategy (DeskewStrategy, tuỳ chọn): thứ tự biến thể deskew học theo từng camera, thử ảnh gốc trước
+# khi biển gần như đã thẳng.
+
+import time
+
+from metrics import add_timing
+
+# Try import helper/utils_rotate (support both package & flat files)
+HELPER_OK = True
+try:
+    import function.utils_rotate as utils_rotate
+    import function.helper as helper
+except Exception:
+    try:
+        import utils_rotate
+        import helper
+    except Exception:
+        HELPER_OK = False
+        utils_rotate = None
+        helper = None
+
+YOLO_DET_PATH = "model/LP_detector_nano_61.pt"
+YOLO_OCR_PATH = "model/LP_ocr_nano_62.pt"
+YOLO_OCR_CONF = 0.6
+DET_SIZE = 640
+# biến thể deskew (change_cons, center_thres) theo thứ tự thử; OCR đọc được ở biến thể nào thì dừng
+DESKEW_VARIANTS = ((0, 0), (0, 1), (1, 0), (1, 1))
+NO_DESKEW = "raw"           # OCR thẳng trên crop (DeskewStrategy.level_angle)
+UNKNOWN = "unknown"
+
+
+def variant_name(variant):
+    return variant if isinstance(variant, str) else f"cc{variant[0]}_ct{variant[1]}"
+
+
+class DeskewStrategy:
+    """
+    Thứ tự thử biến thể deskew của một camera, học từ biến thể nào đọc được biển.
+    - adaptive: sau min_samples lượt, xếp biến thể theo số lần đọc được (giảm dần theo decay
+      để theo kịp khi camera bị chỉnh); prune_below > 0: bỏ hẳn biến thể có tỉ lệ thấp hơn ngưỡng
+    - level_angle (độ): đo góc nghiêng 1 lần, |góc| <= level_angle thì OCR ảnh gốc trước và bỏ
+      biến thể (0, 0) (chỉ khác ảnh gốc một phép xoay rất nhỏ)
+    Không thread-safe: mỗi worker giữ strategy riêng cho từng camera.
+    """
+
+    def __init__(self, variants=DESKEW_VARIANTS, adaptive=True, level_angle=None,
+                 min_samples=30, decay=0.995, prune_below=0.0):
+        self.variants = tuple(tuple(v) for v in variants)
+        self.adaptive = bool(adaptive)
+        self.level_angle = None if level_angle is None else float(level_angle)
+        self.min_samples = int(min_samples)
+        self.decay = float(decay)
+        self.prune_below = float(prune_below)
+        self.hits = {v: 0.0 for v in self.variants + (NO_DESKEW,)}
+        self.samples = 0
+        self.misses = 0
+        self.last = None
+
+    def order(self):
+        if not self.adaptive or self.samples < self.min_samples:
+            return self.variants
+        ranked = sorted(self.variants, key=lambda v: (-self.hits[v], self.variants.index(v)))
+        if self.prune_below > 0:
+            total = sum(self.hits[v] for v in self.variants)
+            kept = [v for v in ranked if total > 0 and self.hits[v] >= self.prune_below * total]
+            ranked = kept or ranked[:1]
+        return tuple(ranked)
+
+    def record(self, variant):
+        """variant: biến thể đọc được biển (hoặc NO_DESKEW); None nếu mọi biến thể đều thất bại."""
+        self.last = variant
+        self.samples += 1
+        if variant is None:
+            self.misses += 1
+            return
+        if self.decay < 1.0:
+            for k in self.hits:
+                self.hits[k] *= self.decay
+        self.hits[variant] += 1.0
+
+    def snapshot(self):
+        return {"samples": self.samples, "misses": self.misses,
+                "order": [variant_name(v) for v in self.order()],
+                "hits": {variant_name(v): round(h, 1) for v, h in self.hits.items()}}
+
+
+def load_models(det_path=YOLO_DET_PATH, ocr_path=YOLO_OCR_PATH, ocr_conf=YOLO_OCR_CONF, force_reload=False):
+    """Nạp 2 model YOLOv5 (detector + OCR ký tự) từ repo yolov5 local."""
+    import torch
+    yolo_detect = torch.hub.load('yolov5', 'custom', path=det_path, force_reload=force_reload, source='local')
+    yolo_ocr = torch.hub.load('yolov5', 'custom', path=ocr_path, force_reload=force_reload, source='local')
+    yolo_ocr.conf = ocr_conf
+    return yolo_detect, yolo_ocr
+
+
+def detect_best_plate(yolo_detect, frame, size=DET_SIZE):
+    """Trả bbox (x1, y1, x2, y2) đã clamp của biển có conf cao nhất, hoặc None."""
+    h0, w0 = frame.shape[:2]
+    results = yolo_detect(frame, size=size)
+    dets = results.xyxy[0]
+    if dets is None or len(dets) == 0:
+        return None
+    det_best = max(dets.tolist(), key=lambda x: x[4])
+    x1, y1, x2, y2, conf, cls = det_best
+    x1 = int(x1); y1 = int(y1); x2 = int(x2); y2 = int(y2)
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(w0, x2), min(h0, y2)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2, y2
+
+
+def _angle_key(angle):
+    """Góc xoay thực tế của biến thể: 0 nếu deskew bỏ qua (góc quá nhỏ), làm tròn 0.1° nếu không."""
+    return 0.0 if abs(angle) < utils_rotate.SKEW_MIN_ANGLE else round(angle, 1)
+
+
+def read_plate_crop(yolo_ocr, crop, timings=None, strategy=None):
+    """
+    Thử lần lượt các biến thể deskew tới khi OCR đọc được. Trả "unknown" nếu thất bại.
+    strategy None -> DESKEW_VARIANTS theo thứ tự cố định; có strategy thì theo strategy.order() và
+    ghi lại biến thể đọc được. Các biến thể ra cùng góc xoay cho cùng 1 ảnh nên chỉ OCR 1 lần.
+    """
+    plate_text = UNKNOWN
+    variants = DESKEW_VARIANTS if strategy is None else strategy.order()
+    angles = {}    # (cc, ct) -> góc đã đo trên crop này
+    tried = set()  # góc xoay đã OCR
+    if strategy is not None and strategy.level_angle is not None:
+        t0 = time.perf_counter()
+        angle = angles[(0, 0)] = utils_rotate.skew_angle(crop, 0, 0)
+        add_timing(timings, "plate_deskew", t0)
+        if abs(angle) <= strategy.level_angle:
+            t0 = time.perf_counter()
+            plate_text = helper.read_plate(yolo_ocr, crop)
+            add_timing(timings, "plate_ocr", t0)
+            if plate_text != UNKNOWN:
+                strategy.record(NO_DESKEW)
+                return plate_text
+            tried.add(0.0)
+            variants = tuple(v for v in variants if v != (0, 0))
+    for cc, ct in variants:
+        t0 = time.perf_counter()
+        angle = angles.get((cc, ct))
+        if angle is None:
+            angle = utils_rotate.skew_angle(crop, cc, ct)
+        key = _angle_key(angle)
+        if key in tried:
+            add_timing(timings, "plate_deskew", t0)
+            continue
+        tried.add(key)
+        img = crop if key == 0.0 else utils_rotate.rotate_image(crop, angle)
+        add_timing(timings, "plate_deskew", t0)
+        t0 = time.perf_counter()
+        plate_text = helper.read_plate(yolo_ocr, img)
+        add_timing(timings, "plate_ocr", t0)
+        if plate_text != UNKNOWN:
+            if strategy is not None:
+                strategy.record((cc, ct))
+            return plate_text
+    if strategy is not None:
+        strategy.record(None)
+    return plate_text
+
+
+def recognize(yolo_detect, yolo_ocr, frame, size=DET_SIZE, timings=None, strategy=None):
+    """
+    Chạy toàn bộ pipeline trên 1 khung hình.
+    Return: (plate_text hoặc None, bbox (x, y, w, h) hoặc None, crop hoặc None)
+    """
+    if frame is None:
+        return None, None, None
+    t0 = time.perf_counter()
+    box = detect_best_plate(yolo_detect, frame, size=size)
+    add_timing(timings, "plate_detect", t0)
+    if box is None:
+        return None, None, None
+    x1, y1, x2, y2 = box
+    crop = frame[y1:y2, x1:x2]
+    plate_text = read_plate_crop(yolo_ocr, crop, timings, strategy)
+    bbox = (x1, y1, x2 - x1, y2 - y1)
+    if plate_text == UNKNOWN:
+        return None, bbox, crop
+    return plate_text, bbox, crop
+
+
+def warmup(yolo_detect, yolo_ocr, size=DET_SIZE, shape=(480, 640)):
+    """
+    Chạy thử detector + OCR trên ảnh giả để khởi tạo kernel/bộ nhớ đệm của torch,
+    nhờ đó lần nhận diện thật đầu tiên nhanh như các lần sau.
+    """
+    import numpy as np
+    frame = np.zeros((shape[0], shape[1], 3), dtype=np.uint8)
+    detect_best_plate(yolo_detect, frame, size=size)
+    # ảnh trống không có biển -> chạy OCR riêng trên 1 crop giả
+    read_plate_crop(yolo_ocr, np.full((60, 200, 3), 255, dtype=np.uint8))
+
+
+def read_all_plates(yolo_detect, yolo_ocr, img, size=DET_SIZE, strategy=None):
+    """
+    Đọc mọi biển trong ảnh (CLI / xử lý lại ảnh khiếu nại).
+    Return: [(plate_text, (x1, y1, x2, y2) hoặc None)] — chỉ các biển đọc được. Không phát hiện
+    được biển nào thì OCR thẳng cả ảnh (ảnh đã là crop biển), khi đó box là None.
+    """
+    h0, w0 = img.shape[:2]
+    dets = yolo_detect(img, size=size).xyxy[0]
+    found = []
+    if dets is None or len(dets) == 0:
+        text = helper.read_plate(yolo_ocr, img)
+        if text != UNKNOWN:
+            found.append((text, None))
+        return found
+    for x1, y1, x2, y2, conf, cls in dets.tolist():
+        x1, y1 = max(0, int(x1)), max(0, int(y1))
+        x2, y2 = min(w0, int(x2)), min(h0, int(y2))
+        if x2 <= x1 or y2 <= y1:
+            continue
+        text = read_plate_crop(yolo_ocr, img[y1:y2, x1:x2], strategy=strategy)
+        if text != UNKNOWN:
+            found.append((text, (x1, y1, x2, y2)))
+    return found
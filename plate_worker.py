@@ -0,0 +1,215 @@
+# plate_worker.py
+# Dịch vụ nhận diện biển số chạy trong process riêng (giống face_worker):
+# - Mỗi worker nạp YOLO detector + OCR đúng 1 lần và giữ model "nóng" suốt phiên
+# - API request/response: submit(frame) -> concurrent.futures.Future
+# - Nhiều worker lấy chung 1 hàng đợi, nên capture của làn 2 không phải chờ làn 1
+# - deskew_options: mỗi worker học thứ tự deskew riêng cho từng camera (plate_reader.DeskewStrategy)
+
+import time
+import queue
+import threading
+import itertools
+import multiprocessing as mp
+from concurrent.futures import Future
+
+import plate_reader
+import metrics
+import profiler
+
+
+def plate_process_main(in_q: mp.Queue, out_q: mp.Queue, det_path, ocr_path, ocr_conf, profile_trigger=None,
+                       deskew_options=None):
+    """
+    Vòng lặp worker. Nhận (req_id, frame, source) từ in_q, trả ("result", req_id, dict) vào out_q.
+    deskew_options (kwargs của DeskewStrategy) -> 1 strategy cho mỗi source; None -> thứ tự cố định.
+    Sau khi nạp model và chạy thử (warm-up) gửi ("ready", None, {"ok": bool, "err": str,
+    "load_s": float}). None -> dừng worker. profile_trigger: xem profiler.watch().
+    """
+    profiler.watch(profile_trigger, "plate")
+    t0 = time.perf_counter()
+    yolo_detect, yolo_ocr, load_err = None, None, None
+    if not plate_reader.HELPER_OK:
+        load_err = "helper/utils_rotate not found"
+    else:
+        try:
+            yolo_detect, yolo_ocr = plate_reader.load_models(det_path, ocr_path, ocr_conf)
+        except Exception as e:
+            load_err = f"YOLO load failed: {e}"
+    if load_err is None:
+        try:
+            plate_reader.warmup(yolo_detect, yolo_ocr)
+        except Exception as e:
+            print("[plate_worker] warm-up lỗi:", e)
+    out_q.put(("ready", None, {"ok": load_err is None, "err": load_err,
+                               "load_s": time.perf_counter() - t0}))
+
+    strategies = {}
+    while True:
+        item = in_q.get()
+        if item is None:
+            break
+        req_id, frame, source = item
+        if load_err is not None:
+            out_q.put(("result", req_id, {"text": None, "bbox": None, "crop": None, "err": load_err}))
+            continue
+        strategy = None
+        if deskew_options is not None:
+            strategy = strategies.get(source)
+            if strategy is None:
+                strategy = strategies[source] = plate_reader.DeskewStrategy(**deskew_options)
+            strategy.last = None
+        t0 = time.perf_counter()
+        timings = {}
+        try:
+            text, bbox, crop = plate_reader.recognize(yolo_detect, yolo_ocr, frame, timings=timings,
+                                                      strategy=strategy)
+            res = {"text": text, "bbox": bbox, "crop": crop}
+        except Exception as e:
+            res = {"text": None, "bbox": None, "crop": None, "err": f"Plate detect error: {e}"}
+        res["elapsed"] = time.perf_counter() - t0
+        res["timings"] = timings
+        if strategy is not None and strategy.last is not None:
+            res["deskew"] = plate_reader.variant_name(strategy.last)
+        out_q.put(("result", req_id, res))
+
+
+class PlatePool:
+    """
+    Pool process nhận diện biển số.
+
+    submit() trả về Future; kết quả là dict {"text", "bbox", "crop", "elapsed", "timings", "deskew"?, "err"?}
+    (deskew: biến thể đọc được biển, vd "cc0_ct1" / "raw").
+    on_result(req_id, result) (nếu có) được gọi từ luồng thu kết quả nền — GUI nên
+    chuyển tiếp qua Qt signal thay vì chạm widget trực tiếp.
+    """
+
+    def __init__(self, n_workers=1, det_path=plate_reader.YOLO_DET_PATH,
+                 ocr_path=plate_reader.YOLO_OCR_PATH, ocr_conf=plate_reader.YOLO_OCR_CONF,
+                 on_result=None, profile_trigger=None, deskew_options=None):
+        self.n_workers = max(1, int(n_workers))
+        self.det_path = det_path
+        self.ocr_path = ocr_path
+        self.ocr_conf = ocr_conf
+        self.on_result = on_result
+        self.profile_trigger = profile_trigger
+        self.deskew_options = deskew_options
+        self.ready_count = 0
+        self.load_error = None
+        self.load_seconds = None
+        self._ids = itertools.count(1)
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._in_q = None
+        self._out_q = None
+        self._procs = []
+        self._collector = None
+        self._running = False
+
+    def start(self):
+        ctx = mp.get_context("spawn")
+        self._in_q = ctx.Queue()
+        self._out_q = ctx.Queue()
+        for _ in range(self.n_workers):
+            p = ctx.Process(
+                target=plate_process_main,
+                args=(self._in_q, self._out_q, self.det_path, self.ocr_path, self.ocr_conf,
+                      self.profile_trigger, self.deskew_options),
+                daemon=True
+            )
+            p.start()
+            self._procs.append(p)
+        self._running = True
+        self._collector = threading.Thread(target=self._collect_loop, name="plate-collector", daemon=True)
+        self._collector.start()
+        return self
+
+    @property
+    def ready(self):
+        """True khi có ít nhất 1 worker đã nạp model và warm-up xong."""
+        return self.ready_count > 0
+
+    @property
+    def failed(self):
+        """True khi mọi worker đều báo lỗi nạp model."""
+        return self.ready_count == 0 and self.load_error is not None
+
+    def pending(self):
+        """Số yêu cầu đã gửi nhưng chưa có kết quả."""
+        with self._lock:
+            return len(self._futures)
+
+    def submit(self, frame, source=None):
+        """
+        Gửi 1 khung hình đi nhận diện. Future có thêm thuộc tính req_id.
+        source: tên camera (vd "lane1.cam2") để worker học thứ tự deskew riêng cho camera đó.
+        """
+        fut = Future()
+        req_id = next(self._ids)
+        fut.req_id = req_id
+        fut.t_submit = time.perf_counter()
+        if self._in_q is None:
+            fut.set_exception(RuntimeError("PlatePool chưa start()"))
+            return fut
+        with self._lock:
+            self._futures[req_id] = fut
+        try:
+            self._in_q.put((req_id, frame, source))
+        except Exception as e:
+            with self._lock:
+                self._futures.pop(req_id, None)
+            fut.set_exception(e)
+        return fut
+
+    def _collect_loop(self):
+        while self._running:
+            try:
+                kind, req_id, res = self._out_q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            except Exception:
+                break
+            if kind == "ready":
+                if res.get("ok"):
+                    self.ready_count += 1
+                    if self.load_seconds is None:
+                        self.load_seconds = res.get("load_s")
+                else:
+                    self.load_error = res.get("err")
+                    print("[PlatePool]", self.load_error)
+                continue
+            with self._lock:
+                fut = self._futures.pop(req_id, None)
+            metrics.observe_many(res.get("timings"))
+            metrics.observe("plate_worker", res.get("elapsed"))
+            if fut is not None:
+                # gồm cả thời gian chờ trong hàng đợi + truyền khung qua process
+                metrics.observe("plate_roundtrip", time.perf_counter() - fut.t_submit)
+            if fut is not None and not fut.done():
+                fut.set_result(res)
+            if self.on_result is not None:
+                try:
+                    self.on_result(req_id, res)
+                except Exception:
+                    pass
+
+    def stop(self):
+        self._running = False
+        for _ in self._procs:
+            try:
+                self._in_q.put_nowait(None)
+            except Exception:
+                pass
+        for p in self._procs:
+            try:
+                p.join(0.5)
+                if p.is_alive():
+                    p.terminate()
+            except Exception:
+                pass
+        self._procs = []
+        with self._lock:
+            pending = list(self._futures.values())
+            self._futures.clear()
+        for fut in pending:
+            if not fut.done():
+                fut.cancel()
@@ -0,0 +1,226 @@
+# profiler.py
+# Profiler lấy mẫu bật lúc chạy (Ctrl+Shift+P trên màn vận hành), không cần cài thêm gì:
+# - Thread lấy mẫu đọc sys._current_frames() mỗi SAMPLE_INTERVAL_S, gộp stack theo từng thread
+#   (thời gian thực: thread đang chờ queue/camera cũng được tính, nằm ở nhánh wait/get)
+# - Worker process (biển số / mặt) theo dõi ProfileTrigger dùng chung; khi GUI yêu cầu thì tự lấy
+#   mẫu và ghi file riêng vào thư mục phiên, GUI gộp lại sau khi hết thời gian
+# - Định dạng "folded stacks" (mỗi dòng: khung;khung;... số_mẫu): mở bằng speedscope.app,
+#   flamegraph.pl hoặc inferno-flamegraph
+#
+#   profiles/<YYYYmmdd_HHMMSS>/profile.folded   gốc stack: "<process>;<thread>;..."
+#   profiles/<YYYYmmdd_HHMMSS>/meta.json        làn/camera, worker, thời lượng, số mẫu
+
+import os
+import sys
+import json
+import glob
+import time
+import platform
+import threading
+import multiprocessing as mp
+from collections import Counter
+
+PROFILE_DIR = os.path.join(os.getcwd(), "profiles")
+SAMPLE_INTERVAL_S = 0.005
+WATCH_INTERVAL_S = 0.25   # worker kiểm tra yêu cầu mới theo chu kỳ này
+MERGE_GRACE_S = 1.5       # chờ worker ghi xong file trước khi gộp
+MERGED_NAME = "profile.folded"
+
+_thread_labels = {}   # ident -> nhãn (camera QThread không có trong threading.enumerate())
+_trigger = None
+_trigger_lock = threading.Lock()
+
+
+def _clean(text):
+    return str(text).replace(";", ",").replace("\n", " ").strip()
+
+
+def register_thread(label, ident=None):
+    """Đặt nhãn cho thread hiện tại (hoặc ident) trong profile, vd "lane1.cam2"."""
+    _thread_labels[threading.get_ident() if ident is None else ident] = _clean(label)
+
+
+def _thread_names():
+    names = {t.ident: _clean(t.name) for t in threading.enumerate()}
+    names.update(_thread_labels)
+    return names
+
+
+def sample(seconds, interval=SAMPLE_INTERVAL_S, root="", stop_event=None):
+    """
+    Lấy mẫu mọi thread của process này trong seconds giây (trừ chính thread lấy mẫu).
+    Trả (Counter{stack_folded: số mẫu}, số lần lấy mẫu).
+    """
+    me = threading.get_ident()
+    names = {}
+    code_names = {}
+    counts = Counter()
+    ticks = 0
+    deadline = time.perf_counter() + float(seconds)
+    next_t = time.perf_counter()
+    while time.perf_counter() < deadline:
+        if stop_event is not None and stop_event.is_set():
+            break
+        frames = sys._current_frames()
+        for ident, frame in frames.items():
+            if ident == me:
+                continue
+            if ident not in names:
+                names = _thread_names()
+                names.setdefault(ident, f"thread-{ident}")
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                name = code_names.get(code)
+                if name is None:
+                    name = code_names[code] = _clean(
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                stack.append(name)
+                frame = frame.f_back
+            stack.append(names[ident])
+            if root:
+                stack.append(root)
+            stack.reverse()
+            counts[";".join(stack)] += 1
+        del frames
+        ticks += 1
+        next_t += interval
+        delay = next_t - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_t = time.perf_counter()  # không đuổi kịp nhịp: bỏ qua, không dồn mẫu
+    return counts, ticks
+
+
+def write_folded(counts, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, n in sorted(counts.items()):
+            f.write(f"{stack} {n}\n")
+
+
+def session_dir(stamp, base_dir=PROFILE_DIR):
+    return os.path.join(base_dir, time.strftime("%Y%m%d_%H%M%S", time.localtime(stamp)))
+
+
+# ------------------- Worker process -------------------
+class ProfileTrigger:
+    """
+    Yêu cầu lấy mẫu dùng chung giữa GUI và worker (shared memory, truyền qua args của Process).
+    Worker so sánh stamp với lần trước: khác -> có phiên mới.
+    """
+
+    def __init__(self, ctx=None, base_dir=PROFILE_DIR, interval=SAMPLE_INTERVAL_S):
+        ctx = ctx or mp.get_context("spawn")
+        self._stamp = ctx.Value("d", 0.0)
+        self._seconds = ctx.Value("d", 0.0, lock=False)
+        self.base_dir = base_dir
+        self.interval = float(interval)
+
+    def request(self, seconds):
+        """Bắt đầu phiên seconds giây cho mọi worker đang theo dõi. Trả stamp (epoch) của phiên."""
+        with self._stamp.get_lock():
+            self._seconds.value = float(seconds)
+            self._stamp.value = time.time()
+            return self._stamp.value
+
+    def current(self):
+        with self._stamp.get_lock():
+            return self._stamp.value, self._seconds.value
+
+
+def _watch_loop(trigger, role):
+    last, _ = trigger.current()  # phiên bắt đầu trước khi worker chạy thì bỏ qua
+    root = f"{role}-{os.getpid()}"
+    while True:
+        time.sleep(WATCH_INTERVAL_S)
+        stamp, seconds = trigger.current()
+        if stamp == last:
+            continue
+        last = stamp
+        remaining = stamp + seconds - time.time()
+        if remaining <= 0:
+            continue
+        try:
+            counts, _ = sample(remaining, trigger.interval, root=root)
+            out_dir = session_dir(stamp, trigger.base_dir)
+            os.makedirs(out_dir, exist_ok=True)
+            write_folded(counts, os.path.join(out_dir, f"{root}.folded"))
+        except Exception as e:
+            print(f"[profiler] {root} lỗi:", e)
+
+
+def watch(trigger, role):
+    """Gọi trong worker process: thread nền chờ yêu cầu lấy mẫu từ GUI. trigger None -> bỏ qua."""
+    if trigger is None:
+        return
+    register_thread(role)
+    threading.Thread(target=_watch_loop, args=(trigger, role), name="profile-watch", daemon=True).start()
+
+
+def worker_trigger():
+    """ProfileTrigger dùng chung của process GUI (tạo lần đầu, truyền cho PlatePool/FacePool)."""
+    global _trigger
+    with _trigger_lock:
+        if _trigger is None:
+            _trigger = ProfileTrigger()
+        return _trigger
+
+
+# ------------------- GUI process -------------------
+class ProfileSession:
+    """
+    Một lần lấy mẫu seconds giây: process này + worker theo trigger. Chạy trên thread nền;
+    GUI kiểm tra done rồi đọc path / error.
+    """
+
+    def __init__(self, seconds, trigger=None, metadata=None, base_dir=PROFILE_DIR,
+                 interval=SAMPLE_INTERVAL_S, root="gui"):
+        self.seconds = float(seconds)
+        self.trigger = trigger
+        self.metadata = metadata or {}
+        self.base_dir = trigger.base_dir if trigger is not None else base_dir
+        self.interval = float(interval)
+        self.root = root
+        self.dir = None
+        self.path = None
+        self.error = None
+        self.done = False
+        self._stop = threading.Event()
+
+    def start(self):
+        stamp = self.trigger.request(self.seconds) if self.trigger is not None else time.time()
+        self.started_at = stamp
+        self.dir = session_dir(stamp, self.base_dir)
+        threading.Thread(target=self._run, name="profile-sampler", daemon=True).start()
+        return self
+
+    def cancel(self):
+        self._stop.set()
+
+    def _run(self):
+        try:
+            counts, ticks = sample(self.seconds, self.interval, root=self.root, stop_event=self._stop)
+            os.makedirs(self.dir, exist_ok=True)
+            own = os.path.join(self.dir, f"{self.root}-{os.getpid()}.folded")
+            write_folded(counts, own)
+            if self.trigger is not None:
+                self._stop.wait(MERGE_GRACE_S)
+            self.path = os.path.join(self.dir, MERGED_NAME)
+            parts = sorted(p for p in glob.glob(os.path.join(self.dir, "*.folded"))
+                           if os.path.basename(p) != MERGED_NAME)
+            with open(self.path, "w", encoding="utf-8") as out:
+                for part in parts:
+                    with open(part, encoding="utf-8") as f:
+                        out.write(f.read())
+            meta = {"started_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started_at)),
+                    "seconds": self.seconds, "interval_ms": self.interval * 1000, "ticks": ticks,
+                    "pid": os.getpid(), "host": platform.node(), "python": platform.python_version(),
+                    "processes": [os.path.basename(p)[:-len(".folded")] for p in parts],
+                    **self.metadata}
+            with open(os.path.join(self.dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.done = True
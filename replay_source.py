@@ -0,0 +1,197 @@
+# replay_source.py
+# Nguồn camera giả lập từ video / chuỗi ảnh đã ghi ở cổng, dùng để load-test toàn bộ
+# pipeline trên máy dev không có camera thật.
+#
+# Cú pháp nguồn (nhập vào ô "Nguồn" của CameraWidget):
+#   replay:<video | thư mục ảnh | glob>[?speed=1&loop=1&fps=25]
+#   - speed=1   : đúng thời gian thực theo FPS của video
+#   - speed=4   : nhanh gấp 4
+#   - speed=0   : nhanh nhất có thể (chỉ bị giới hạn bởi tốc độ xử lý phía sau)
+#   - loop=1    : phát lại từ đầu khi hết
+#   - fps=..    : FPS cho chuỗi ảnh (video lấy FPS trong file)
+# Mỗi CameraWidget mở một ReplaySource riêng nên nhiều làn có thể phát cùng lúc.
+#
+# Đo thông lượng đọc/giải mã thuần:
+#   python replay_source.py videos/gate1.mp4 --speed 0 --lanes 4 --seconds 10
+
+import os
+import sys
+import glob
+import time
+import argparse
+import threading
+from urllib.parse import parse_qs
+
+import cv2
+
+REPLAY_PREFIX = "replay:"
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+DEFAULT_FPS = 25.0
+
+
+def is_replay_source(source):
+    return isinstance(source, str) and source.startswith(REPLAY_PREFIX)
+
+
+def parse_replay_source(source):
+    """'replay:path?speed=2&loop=0' -> (path, {"speed": 2.0, "loop": False, "fps": None})"""
+    spec = source[len(REPLAY_PREFIX):]
+    path, sep, query = spec.rpartition("?")
+    if not sep or "=" not in query:
+        # không có tham số ('?' có thể là ký tự glob)
+        path, query = spec, ""
+    params = {k: v[-1] for k, v in parse_qs(query).items()}
+    opts = {
+        "speed": float(params.get("speed", 1.0)),
+        "loop": params.get("loop", "1") not in ("0", "false", "no"),
+        "fps": float(params["fps"]) if "fps" in params else None,
+    }
+    return path, opts
+
+
+class ReplaySource:
+    """
+    Giả lập cv2.VideoCapture (isOpened / read / release) từ file video hoặc chuỗi ảnh,
+    tự điều tốc theo speed. read() chặn cho tới thời điểm khung kế tiếp.
+    """
+
+    def __init__(self, path, speed=1.0, loop=True, fps=None):
+        self.path = path
+        self.speed = max(0.0, float(speed))
+        self.loop = bool(loop)
+        self.frames_read = 0
+        self.frames_skipped = 0
+        self._cap = None
+        self._images = None
+        self._idx = 0
+        self._fps = fps
+        self._t0 = None
+        self._n = 0  # số khung từ mốc _t0
+        self._open()
+
+    @classmethod
+    def from_source(cls, source):
+        path, opts = parse_replay_source(source)
+        return cls(path, **opts)
+
+    def _open(self):
+        if os.path.isdir(self.path):
+            files = sorted(os.listdir(self.path))
+            self._images = [os.path.join(self.path, f) for f in files if f.lower().endswith(IMAGE_EXTS)]
+        elif any(c in self.path for c in "*?["):
+            self._images = sorted(p for p in glob.glob(self.path) if p.lower().endswith(IMAGE_EXTS))
+        else:
+            self._cap = cv2.VideoCapture(self.path)
+            if self._fps is None and self._cap.isOpened():
+                fps = self._cap.get(cv2.CAP_PROP_FPS)
+                self._fps = fps if fps and fps > 0 else None
+        if self._fps is None:
+            self._fps = DEFAULT_FPS
+
+    @property
+    def fps(self):
+        return self._fps
+
+    def isOpened(self):
+        if self._images is not None:
+            return len(self._images) > 0
+        return self._cap is not None and self._cap.isOpened()
+
+    def _read_raw(self):
+        if self._images is not None:
+            # ảnh hỏng / không giải mã được thì bỏ qua; chỉ trả False khi đã hết danh sách
+            while self._idx < len(self._images):
+                frame = cv2.imread(self._images[self._idx])
+                self._idx += 1
+                if frame is not None:
+                    return True, frame
+                self.frames_skipped += 1
+            return False, None
+        return self._cap.read()
+
+    def _rewind(self):
+        if self._images is not None:
+            self._idx = 0
+        else:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def _pace(self):
+        # giữ nhịp theo đồng hồ tường tính từ mốc _t0, không cộng dồn sai số sleep
+        if self.speed <= 0:
+            return
+        now = time.perf_counter()
+        if self._t0 is None:
+            self._t0 = now
+            self._n = 0
+        due = self._t0 + self._n / (self._fps * self.speed)
+        if due > now:
+            time.sleep(due - now)
+        elif now - due > 1.0:
+            # tụt quá xa (máy quá tải) -> đặt lại mốc thay vì phát dồn
+            self._t0 = now
+            self._n = 0
+        self._n += 1
+
+    def read(self):
+        if not self.isOpened():
+            return False, None
+        ret, frame = self._read_raw()
+        if not ret and self.loop:
+            self._rewind()
+            ret, frame = self._read_raw()
+        if not ret:
+            return False, None
+        self._pace()
+        self.frames_read += 1
+        return True, frame
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+        self._images = None
+
+
+def _bench_lane(source, seconds, results, idx):
+    src = ReplaySource.from_source(source)
+    t0 = time.perf_counter()
+    n = 0
+    while time.perf_counter() - t0 < seconds:
+        ret, _ = src.read()
+        if not ret:
+            break
+        n += 1
+    results[idx] = n / max(1e-6, time.perf_counter() - t0)
+    src.release()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo thông lượng nguồn replay (không GUI)")
+    parser.add_argument("path", help="video, thư mục ảnh hoặc glob")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = thời gian thực, 0 = nhanh nhất")
+    parser.add_argument("--fps", type=float, default=None, help="FPS cho chuỗi ảnh")
+    parser.add_argument("--lanes", type=int, default=1, help="số nguồn phát song song")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    source = f"{REPLAY_PREFIX}{args.path}?speed={args.speed}&loop=1"
+    if args.fps:
+        source += f"&fps={args.fps}"
+    if not ReplaySource.from_source(source).isOpened():
+        print("Không mở được nguồn:", args.path)
+        return 1
+    results = [0.0] * args.lanes
+    threads = [threading.Thread(target=_bench_lane, args=(source, args.seconds, results, i))
+               for i in range(args.lanes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for i, fps in enumerate(results):
+        print(f"Làn {i + 1}: {fps:.1f} fps")
+    print(f"Tổng: {sum(results):.1f} fps")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+# thumbnails.py
+# Cache thumbnail dùng chung cho màn quản trị và màn vận hành.
+# - Cache LRU trong bộ nhớ: QImage đã giải mã, khoá (path, w, h), giới hạn theo dung lượng
+# - Ảnh chưa có trong cache được giải mã trên QThreadPool, GUI chỉ vẽ lại khi có signal ready
+# - Ưu tiên đọc thumbnail trên đĩa (image_store.thumb_path_for); ảnh cũ chưa có thumbnail
+#   thì tạo lười ở lần đọc đầu tiên
+# - QImageReader.setScaledSize để bộ giải mã JPEG thu nhỏ ngay khi đọc (không giải mã full-size)
+# - Ảnh lỗi / chưa có trên đĩa (ImageStore ghi nền chưa xong) không vào cache, chỉ nhớ FAILED_TTL_S
+#   giây rồi thử lại; kiểm tra tồn tại file nằm trong job giải mã, không chạy trên GUI thread
+
+import os
+import time
+from collections import OrderedDict
+
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader, QPixmap
+
+from image_store import THUMB_SIZE, THUMB_QUALITY, thumb_path_for
+
+FAILED_TTL_S = 3.0
+
+
+def read_scaled(path, w, h):
+    """Đọc ảnh đã thu nhỏ vừa khung w x h (giữ tỉ lệ). QImage rỗng nếu lỗi."""
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and (size.width() > w or size.height() > h):
+        reader.setScaledSize(size.scaled(w, h, Qt.AspectRatioMode.KeepAspectRatio))
+    img = reader.read()
+    return img if img is not None else QImage()
+
+
+def _save_thumb(img, tpath):
+    try:
+        os.makedirs(os.path.dirname(tpath), exist_ok=True)
+        tmp = tpath + ".part"
+        if img.save(tmp, "JPG", THUMB_QUALITY):
+            os.replace(tmp, tpath)
+    except Exception:
+        pass
+
+
+def load_thumbnail(path, w, h):
+    """Giải mã ảnh cho khung w x h; chạy được trên thread nền (chỉ dùng QImage)."""
+    if not path or not os.path.exists(path):
+        return QImage()
+    small = w <= THUMB_SIZE[0] and h <= THUMB_SIZE[1]
+    if not small:
+        return read_scaled(path, w, h)
+    tpath = thumb_path_for(path)
+    if os.path.exists(tpath):
+        img = read_scaled(tpath, w, h)
+        if not img.isNull():
+            return img
+    img = read_scaled(path, *THUMB_SIZE)
+    if img.isNull():
+        return img
+    _save_thumb(img, tpath)
+    if img.width() > w or img.height() > h:
+        img = img.scaled(w, h, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+    return img
+
+
+class _Signals(QObject):
+    done = pyqtSignal(object, QImage, bool)  # key (path, w, h), ảnh, file không tồn tại
+
+
+class _DecodeJob(QRunnable):
+    def __init__(self, key, signals):
+        super().__init__()
+        self.key = key
+        self.signals = signals
+
+    def run(self):
+        path, w, h = self.key
+        try:
+            img = load_thumbnail(path, w, h)
+        except Exception:
+            img = QImage()
+        missing = img.isNull() and not os.path.exists(path)
+        self.signals.done.emit(self.key, img, missing)
+
+
+class ThumbnailCache(QObject):
+    """
+    get(path, w, h) trả QImage nếu đã có trong cache (QImage rỗng nếu vừa lỗi, xem missing()),
+    ngược lại trả None và xếp lịch giải mã; khi xong phát ready(path, w, h).
+    Mọi truy cập cache đều ở GUI thread.
+    """
+
+    ready = pyqtSignal(str, int, int)
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_threads=2, parent=None):
+        super().__init__(parent)
+        self.max_bytes = int(max_bytes)
+        self._cache = OrderedDict()  # (path, w, h) -> QImage
+        self._bytes = 0
+        self._pending = set()
+        self._failed = {}  # key -> (hết hạn theo time.monotonic(), file không tồn tại)
+        self._labels = {}  # key -> {QLabel: (empty_text, error_text)} chờ ảnh
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max(1, int(max_threads)))
+        self._signals = _Signals()
+        self._signals.done.connect(self._on_done)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, w, h):
+        key = (path, int(w), int(h))
+        img = self._cache.get(key)
+        if img is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return img
+        failed = self._failed.get(key)
+        if failed is not None:
+            if failed[0] > time.monotonic():
+                return QImage()
+            del self._failed[key]
+        self.misses += 1
+        if key not in self._pending:
+            self._pending.add(key)
+            self._pool.start(_DecodeJob(key, self._signals))
+        return None
+
+    def missing(self, path, w, h):
+        """True nếu lần giải mã gần nhất của (path, w, h) lỗi vì file không tồn tại."""
+        failed = self._failed.get((path, int(w), int(h)))
+        return failed is not None and failed[1]
+
+    def _on_done(self, key, img, missing):
+        self._pending.discard(key)
+        if img.isNull():
+            now = time.monotonic()
+            if len(self._failed) > 256:
+                self._failed = {k: v for k, v in self._failed.items() if v[0] > now}
+            self._failed[key] = (now + FAILED_TTL_S, missing)
+        else:
+            self._failed.pop(key, None)
+            self._put(key, img)
+        for label, (empty_text, error_text) in self._labels.pop(key, {}).items():
+            try:
+                if label.property("thumb_key") == list(key):
+                    self._apply(label, img, empty_text if missing else error_text)
+            except RuntimeError:
+                pass  # label đã bị huỷ
+        self.ready.emit(*key)
+
+    def _put(self, key, img):
+        old = self._cache.pop(key, None)
+        if old is not None:
+            self._bytes -= old.sizeInBytes()
+        self._cache[key] = img
+        self._bytes += img.sizeInBytes()
+        while self._bytes > self.max_bytes and len(self._cache) > 1:
+            _, dropped = self._cache.popitem(last=False)
+            self._bytes -= dropped.sizeInBytes()
+
+    def invalidate(self, path):
+        for key in [k for k in self._cache if k[0] == path]:
+            self._bytes -= self._cache.pop(key).sizeInBytes()
+        for key in [k for k in self._failed if k[0] == path]:
+            del self._failed[key]
+
+    @staticmethod
+    def _apply(label, img, error_text=""):
+        if img.isNull():
+            label.setPixmap(QPixmap())
+            label.setText(error_text)
+        else:
+            label.setPixmap(QPixmap.fromImage(img))
+            label.setText("")
+
+    def bind_label(self, label, path, w=None, h=None, empty_text="", error_text="Lỗi ảnh"):
+        """
+        Hiển thị ảnh path vừa khung label (hoặc w x h). Nếu chưa có trong cache: giữ ảnh cũ khi
+        cùng path (đang resize), xoá khi khác path, rồi đặt ảnh khi giải mã xong.
+        File không tồn tại -> empty_text, giải mã lỗi -> error_text.
+        """
+        if not path:
+            label.setProperty("thumb_key", None)
+            label.setPixmap(QPixmap())
+            label.setText(empty_text)
+            return
+        w = max(10, int(w if w is not None else label.width()))
+        h = max(10, int(h if h is not None else label.height()))
+        key = (path, w, h)
+        prev = label.property("thumb_key")
+        label.setProperty("thumb_key", list(key))
+        img = self.get(path, w, h)
+        if img is not None:
+            self._apply(label, img, empty_text if self.missing(path, w, h) else error_text)
+            return
+        if not prev or prev[0] != path:
+            label.setPixmap(QPixmap())
+            label.setText("")
+        self._labels.setdefault(key, {})[label] = (empty_text, error_text)
+
+    def stats(self):
+        return {"items": len(self._cache), "bytes": self._bytes, "pending": len(self._pending),
+                "failed": len(self._failed),
+                "hits": self.hits, "misses": self.misses}
+
+
+_cache = None
+
+
+def thumbnail_cache():
+    """Cache dùng chung của tiến trình (tạo khi cần, sau khi đã có QApplication)."""
+    global _cache
+    if _cache is None:
+        _cache = ThumbnailCache()
+    return _cache
@@ -0,0 +1,319 @@
+# training/evaluate_plates.py
+# Đánh giá model biển số end-to-end trên bộ ảnh có nhãn, đúng pipeline đang chạy ở cổng:
+#   detect (LP_detection.yaml, nc=1) -> crop -> plate_reader.read_plate_crop (Letter_detect.yaml, nc=36)
+# Vòng deskew là của plate_reader (DeskewStrategy: thứ tự biến thể, bỏ góc trùng, lối tắt biển thẳng),
+# không cài lại ở đây, nên số đo khớp với code chạy thật. Phân tích thêm (bỏ qua bằng --quick):
+# mỗi biến thể chạy riêng (strategy 1 biến thể) và vòng lặp khi bỏ từng biến thể (strategy thiếu 1 biến thể).
+#
+#   python training/evaluate_plates.py data/plates_val/labels.csv
+#   python training/evaluate_plates.py data/plates_val --det-size 640 480 --det-conf 0.25 0.4 --json eval.json
+#   python training/evaluate_plates.py data/plate_crops --crops          # ảnh đã là crop biển: bỏ qua detect
+#   python training/evaluate_plates.py data/plates_val --adaptive --level-angle 1.0   # như màn vận hành
+#
+# Nhãn: CSV (cột path, plate) hoặc JSONL ({"path": ..., "plate": ...}), đường dẫn tương đối theo file nhãn;
+# thư mục ảnh -> nhãn lấy từ tên file (30A12345.jpg, 51F-123.45_2.jpg: phần trước "_").
+# So khớp sau khi bỏ ký tự ngoài 0-9A-Z ("51F-123.45" == "51F12345").
+#
+# Báo cáo cho từng cấu hình (det size x det conf x OCR conf); mỗi cấu hình 1 strategy xuyên suốt bộ ảnh
+# (như 1 camera):
+#   exact / char acc     đúng cả biển / độ chính xác ký tự (1 - khoảng cách sửa / độ dài nhãn)
+#   pipeline ms          detect + deskew + OCR của read_plate_crop
+#   chọn                 biến thể đọc được biển (raw = lối tắt biển thẳng)
+#   oracle               có ít nhất 1 biến thể (chạy riêng) đọc đúng
+#   theo biến thể        chạy riêng: đọc được, đúng, đúng duy nhất, ms deskew + OCR
+#   bỏ biến thể          exact và độ trễ trung bình khi strategy không có biến thể đó
+
+import os
+import re
+import sys
+import csv
+import json
+import time
+import argparse
+import itertools
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import plate_reader
+from lp_batch import iter_images
+
+UNKNOWN = "unknown"
+
+
+# ------------------- dataset -------------------
+def normalize_plate(text):
+    return re.sub(r"[^0-9A-Z]", "", (text or "").upper())
+
+
+def _label_from_name(path):
+    return os.path.splitext(os.path.basename(path))[0].split("_")[0]
+
+
+def load_dataset(source, limit=None):
+    """[(đường dẫn ảnh, nhãn)] từ file nhãn CSV / JSONL hoặc thư mục ảnh (nhãn theo tên file)."""
+    items = []
+    if os.path.isdir(source):
+        items = [(p, _label_from_name(p)) for p in iter_images([source])]
+    else:
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, newline="", encoding="utf-8") as f:
+            if source.lower().endswith(".csv"):
+                rows = csv.DictReader(f)
+            else:
+                rows = (json.loads(line) for line in f if line.strip())
+            for row in rows:
+                path = row.get("path") or row.get("image")
+                label = row.get("plate") or row.get("text") or ""
+                if path:
+                    items.append((path if os.path.isabs(path) else os.path.join(base, path), label))
+    return items[:limit] if limit else items
+
+
+def edit_distance(a, b):
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+def char_accuracy(pred, label):
+    if not label:
+        return 1.0 if not pred else 0.0
+    return max(0.0, 1.0 - edit_distance(pred, label) / len(label))
+
+
+# ------------------- chạy -------------------
+class Strategies:
+    """Strategy của 1 cấu hình: đường chính + (nếu full) từng biến thể riêng và vòng thiếu từng biến thể."""
+
+    def __init__(self, adaptive=False, level_angle=None, full=True):
+        variants = plate_reader.DESKEW_VARIANTS
+        self.main = plate_reader.DeskewStrategy(variants, adaptive=adaptive, level_angle=level_angle)
+        self.solo, self.drop = [], []
+        if full:
+            self.solo = [plate_reader.DeskewStrategy((v,), adaptive=False) for v in variants]
+            self.drop = [plate_reader.DeskewStrategy(tuple(u for u in variants if u != v),
+                                                     adaptive=adaptive, level_angle=level_angle)
+                         for v in variants]
+
+
+def read_crop(yolo_ocr, crop, strategy):
+    """read_plate_crop như worker: {"text", "deskew_ms", "ocr_ms", "variant"}."""
+    timings = {}
+    text = plate_reader.read_plate_crop(yolo_ocr, crop, timings, strategy)
+    return {"text": text,
+            "deskew_ms": timings.get("plate_deskew", 0.0) * 1000, "ocr_ms": timings.get("plate_ocr", 0.0) * 1000,
+            "variant": plate_reader.variant_name(strategy.last) if strategy.last is not None else None}
+
+
+def evaluate_image(models, img, crops_mode, det_size, strategies):
+    """Kết quả 1 ảnh: detect + read_plate_crop theo strategy chính (và từng biến thể / bỏ biến thể)."""
+    yolo_detect, yolo_ocr = models
+    res = {"det_ms": 0.0, "detected": True, "main": None, "variants": [], "drop": []}
+    if crops_mode:
+        crop = img
+    else:
+        t0 = time.perf_counter()
+        box = plate_reader.detect_best_plate(yolo_detect, img, size=det_size)
+        res["det_ms"] = (time.perf_counter() - t0) * 1000
+        if box is None:
+            res["detected"] = False
+            return res
+        x1, y1, x2, y2 = box
+        crop = img[y1:y2, x1:x2]
+    res["main"] = read_crop(yolo_ocr, crop, strategies.main)
+    res["variants"] = [read_crop(yolo_ocr, crop, st) for st in strategies.solo]
+    res["drop"] = [read_crop(yolo_ocr, crop, st) for st in strategies.drop]
+    return res
+
+
+def _ms(r):
+    return r["deskew_ms"] + r["ocr_ms"]
+
+
+def _pct(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def summarize(results, labels, strategies):
+    n = len(results)
+    variants = plate_reader.DESKEW_VARIANTS
+    labels = [normalize_plate(lb) for lb in labels]
+    exact = chars = oracle = detected = 0
+    latency, det_ms = [], []
+    deskew_ms = ocr_ms = 0.0
+    chosen = {}
+    per_variant = [{"readable": 0, "exact": 0, "only": 0, "deskew_ms": 0.0, "ocr_ms": 0.0} for _ in variants]
+    drop = [{"exact": 0, "ms": 0.0} for _ in variants]
+    for res, label in zip(results, labels):
+        main = res["main"]
+        text = main["text"] if main else UNKNOWN
+        pred = normalize_plate(text) if text != UNKNOWN else ""
+        latency.append(res["det_ms"] + (_ms(main) if main else 0.0))
+        exact += pred == label
+        chars += char_accuracy(pred, label)
+        for i, d in enumerate(res["drop"] or [None] * len(strategies.drop)):
+            drop[i]["ms"] += res["det_ms"] + (_ms(d) if d else 0.0)
+            drop[i]["exact"] += bool(d) and d["text"] != UNKNOWN and normalize_plate(d["text"]) == label
+        if not res["detected"]:
+            continue
+        detected += 1
+        det_ms.append(res["det_ms"])
+        deskew_ms += main["deskew_ms"]
+        ocr_ms += main["ocr_ms"]
+        if main["variant"]:
+            chosen[main["variant"]] = chosen.get(main["variant"], 0) + 1
+        correct = [v["text"] != UNKNOWN and normalize_plate(v["text"]) == label for v in res["variants"]]
+        oracle += any(correct)
+        for i, v in enumerate(res["variants"]):
+            st = per_variant[i]
+            st["readable"] += v["text"] != UNKNOWN
+            st["exact"] += correct[i]
+            st["only"] += correct[i] and sum(correct) == 1
+            st["deskew_ms"] += v["deskew_ms"]
+            st["ocr_ms"] += v["ocr_ms"]
+    out = {"images": n, "detected": detected,
+           "exact": exact / n if n else 0.0, "char_acc": chars / n if n else 0.0,
+           "det_p50_ms": _pct(det_ms, 0.50), "det_p95_ms": _pct(det_ms, 0.95),
+           "latency_p50_ms": _pct(latency, 0.50), "latency_p95_ms": _pct(latency, 0.95),
+           "latency_mean_ms": sum(latency) / n if n else 0.0,
+           "deskew_mean_ms": deskew_ms / detected if detected else 0.0,
+           "ocr_mean_ms": ocr_ms / detected if detected else 0.0,
+           "chosen": chosen, "strategy": strategies.main.snapshot(), "variants": {}}
+    if strategies.solo:
+        out["oracle"] = oracle / n if n else 0.0
+        for i, v in enumerate(variants):
+            st = per_variant[i]
+            out["variants"][plate_reader.variant_name(v)] = {
+                "readable": st["readable"] / detected if detected else 0.0,
+                "exact": st["exact"] / detected if detected else 0.0,
+                "only": st["only"],
+                "deskew_ms": st["deskew_ms"] / detected if detected else 0.0,
+                "ocr_ms": st["ocr_ms"] / detected if detected else 0.0,
+                "drop_exact": drop[i]["exact"] / n if n else 0.0,
+                "drop_latency_mean_ms": drop[i]["ms"] / n if n else 0.0,
+            }
+    return out
+
+
+def run(dataset, models, configs, crops_mode=False, details=None, progress=None,
+        adaptive=False, level_angle=None, full=True):
+    """
+    Chạy mọi cấu hình; configs: [(det_size, det_conf, ocr_conf)]. Trả [{config, summary}].
+    adaptive / level_angle: như DeskewStrategy của worker; full=False chỉ chạy đường chính.
+    """
+    import cv2
+    yolo_detect, yolo_ocr = models
+    images = []
+    for path, label in dataset:
+        img = cv2.imread(path)
+        if img is None:
+            print("[WARN] không đọc được ảnh:", path, file=sys.stderr)
+            continue
+        images.append((path, label, img))
+    reports = []
+    for det_size, det_conf, ocr_conf in configs:
+        yolo_detect.conf = det_conf
+        yolo_ocr.conf = ocr_conf
+        strategies = Strategies(adaptive, level_angle, full)
+        results = []
+        for k, (path, label, img) in enumerate(images, 1):
+            res = evaluate_image(models, img, crops_mode, det_size, strategies)
+            results.append(res)
+            if details is not None:
+                details.write(json.dumps({"det_size": det_size, "det_conf": det_conf, "ocr_conf": ocr_conf,
+                                          "path": path, "label": label, **res}, ensure_ascii=False) + "\n")
+            if progress:
+                progress(k, len(images))
+        config = {"det_size": det_size, "det_conf": det_conf, "ocr_conf": ocr_conf,
+                  "adaptive": adaptive, "level_angle": level_angle}
+        reports.append({"config": config,
+                        "summary": summarize(results, [lb for _, lb, _ in images], strategies)})
+    return reports
+
+
+def print_report(report, crops_mode):
+    c, s = report["config"], report["summary"]
+    name = f"OCR conf {c['ocr_conf']}" if crops_mode else \
+        f"det size {c['det_size']} · det conf {c['det_conf']} · OCR conf {c['ocr_conf']}"
+    print(f"\n== {name}")
+    oracle = f"  oracle {s['oracle']:.1%}" if "oracle" in s else ""
+    print(f"ảnh {s['images']}  phát hiện {s['detected']}  exact {s['exact']:.1%}  char acc {s['char_acc']:.1%}"
+          + oracle)
+    if not crops_mode:
+        print(f"detect p50 {s['det_p50_ms']:.1f} ms  p95 {s['det_p95_ms']:.1f} ms")
+    print(f"pipeline p50 {s['latency_p50_ms']:.1f} ms  p95 {s['latency_p95_ms']:.1f} ms"
+          f"  mean {s['latency_mean_ms']:.1f} ms (deskew {s['deskew_mean_ms']:.2f} + OCR {s['ocr_mean_ms']:.2f})")
+    chosen = "  ".join(f"{k} {v}" for k, v in sorted(s["chosen"].items())) or "-"
+    print(f"chọn: {chosen}  ·  thứ tự cuối: {' > '.join(s['strategy']['order'])}")
+    if not s["variants"]:
+        return
+    print(f"{'biến thể':10s} {'đọc được':>9s} {'đúng':>7s} {'duy nhất':>9s}"
+          f" {'deskew ms':>10s} {'OCR ms':>8s} {'bỏ: exact':>10s} {'bỏ: ms':>8s}")
+    for name, v in s["variants"].items():
+        print(f"{name:10s} {v['readable']:9.1%} {v['exact']:7.1%} {v['only']:9d}"
+              f" {v['deskew_ms']:10.2f} {v['ocr_ms']:8.2f} {v['drop_exact']:10.1%} {v['drop_latency_mean_ms']:8.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đánh giá độ chính xác / tốc độ model biển số trên bộ ảnh có nhãn")
+    parser.add_argument("dataset", help="file nhãn .csv / .jsonl hoặc thư mục ảnh (nhãn theo tên file)")
+    parser.add_argument("--crops", action="store_true", help="ảnh đã là crop biển: bỏ qua detector")
+    parser.add_argument("--det", default=plate_reader.YOLO_DET_PATH)
+    parser.add_argument("--ocr", default=plate_reader.YOLO_OCR_PATH)
+    parser.add_argument("--det-size", type=int, nargs="+", default=[plate_reader.DET_SIZE])
+    parser.add_argument("--det-conf", type=float, nargs="+", default=[0.25])
+    parser.add_argument("--ocr-conf", type=float, nargs="+", default=[plate_reader.YOLO_OCR_CONF])
+    parser.add_argument("--adaptive", action="store_true", help="DeskewStrategy học thứ tự biến thể (như màn vận hành)")
+    parser.add_argument("--level-angle", type=float, default=None,
+                        help="lối tắt biển thẳng: |góc| <= giá trị này thì OCR ảnh gốc trước (độ)")
+    parser.add_argument("--quick", action="store_true", help="chỉ chạy đường chính, bỏ phân tích theo biến thể")
+    parser.add_argument("--limit", type=int, default=None, help="chỉ lấy N ảnh đầu")
+    parser.add_argument("--json", default=None, help="ghi báo cáo ra file JSON")
+    parser.add_argument("--details", default=None, help="ghi kết quả từng ảnh ra file JSONL")
+    args = parser.parse_args(argv)
+
+    if not plate_reader.HELPER_OK:
+        print("Lỗi: helper/utils_rotate not found", file=sys.stderr)
+        return 2
+    dataset = load_dataset(args.dataset, args.limit)
+    if not dataset:
+        print("Lỗi: không có ảnh nào trong", args.dataset, file=sys.stderr)
+        return 2
+    models = plate_reader.load_models(args.det, args.ocr)
+    plate_reader.warmup(*models)
+    det_sizes = [0] if args.crops else args.det_size
+    det_confs = [0.0] if args.crops else args.det_conf
+    configs = list(itertools.product(det_sizes, det_confs, args.ocr_conf))
+
+    def progress(k, n):
+        if k % 20 == 0 or k == n:
+            print(f"\r{k}/{n}", end="", file=sys.stderr, flush=True)
+
+    details = open(args.details, "w", encoding="utf-8") if args.details else None
+    try:
+        reports = run(dataset, models, configs, crops_mode=args.crops, details=details, progress=progress,
+                      adaptive=args.adaptive, level_angle=args.level_angle, full=not args.quick)
+    finally:
+        if details is not None:
+            details.close()
+    print(file=sys.stderr)
+    for report in reports:
+        print_report(report, args.crops)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"dataset": args.dataset, "det": args.det, "ocr": args.ocr, "crops": args.crops,
+                       "reports": reports}, f, ensure_ascii=False, indent=2)
+        print("\nĐã ghi", args.json)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())